@@ -1,118 +1,272 @@
-import time
+﻿import io
+import json
+import platform
 import random
-from bitpacking.crossing import BitPackingCrossing
-from bitpacking.noncrossing import BitPackingNonCrossing
-from bitpacking.overflow import BitPackerOverflow
-
-
-BITS_PER_INT = 32           
-BANDWIDTH = 10_000_000      
-
-def bitsize(bp):
-    if hasattr(bp, "k"):
-        return bp.k * bp.n
-    elif hasattr(bp, "kprime"):
-        return bp.kprime * bp.n
-    elif hasattr(bp, "kprime_bits"):
-        return bp.kprime_bits * bp.n
-    else:
-        return bp.n * 32 
-    
-
-def benchmark_one(data, mode):
-    """Mesure les performances pour un mode donné"""
-    n = len(data)
-    start = time.perf_counter()
+import sys
+import time
+import multiprocessing as mp
 
-    
-    if mode == "crossing":
-        bp = BitPackingCrossing.from_list(data)
-    elif mode == "non_crossing":
-        bp = BitPackingNonCrossing.from_list(data)
-    elif mode == "overflow":
-        bp = BitPackerOverflow.from_list(data)
-    else:
-        raise ValueError("Mode inconnu")
+import click
 
-    t_comp = (time.perf_counter() - start) * 1000  # ms
+from bitpacking.factory import CompressorFactory, HEADER_SIZE, HEADER_REF_SIZE
+from bitpacking.blocked import BitPackingBlocked
+from bitpacking.overflow import BitPackingOverflow
+from bitpacking.pfor import BitPackingPFOR
+from bitpacking.overflow_rank import BitPackingOverflowRank
+from bitpacking.stream import write_blocks
+from bitpacking.vectorized import HAVE_NUMPY
 
-    start = time.perf_counter()
-    _ = bp.to_list()
-    t_decomp = (time.perf_counter() - start) * 1000  # ms
+try:
+    import resource
+except ImportError:  # Windows : pas de ru_maxrss
+    resource = None
 
 
-    start = time.perf_counter()
-    _ = bp.get(len(data)//2)
-    t_get = (time.perf_counter() - start) * 1000  # ms
-
-    raw_bits = n * BITS_PER_INT
-    comp_bits = bitsize(bp)
-    gain = 100 * (1 - comp_bits / raw_bits)
-
-   
-    if raw_bits == comp_bits:
-        t_seuil = None
-        print("\n⚠️  Aucun gain de compression détecté (comp_bits = raw_bits).")
-    else:
-        t_seuil = (t_comp + t_decomp) / (raw_bits - comp_bits)
-        print(f"\nLatence seuil t_seuil : {t_seuil:.8f} ms/bit")
-        print(f"Si la latence réseau > {t_seuil:.8f} ms/bit, la compression devient avantageuse.")
-
-
-    print(f"\n=== Mode : {mode} ===")
-    print(f"n = {n} entiers")
-    print(f"Gain : {gain:.2f} %")
-    print(f"Tcomp : {t_comp:.4f} ms")
-    print(f"Tdecomp : {t_decomp:.4f} ms")
-    print(f"Tget : {t_get:.6f} ms")
-
-    if raw_bits == comp_bits:
-        print("⚠️  Aucun gain de compression détecté (comp_bits = raw_bits).")
-        print("Latence seuil t_seuil : Non définie.")
-    else:
-        t_seuil = (t_comp + t_decomp) / (raw_bits - comp_bits)
-        print(f"Latence seuil t_seuil : {t_seuil:.8f} ms/bit")
-        print(f"Si la latence réseau > {t_seuil:.8f} ms/bit, la compression devient avantageuse.")
+BITS_PER_INT = 32
+GET_SAMPLES = 1000
+# reference versionnee : tailles exactes (controlees par les tests) et debits indicatifs
+BASELINE = "bench/baseline.json"
+BASELINE_SIZES = "1000,10000"
+
+
+# --- jeux de donnees (reproductibles : un Random par (seed, type, n)) ---
+
+def _zipf(rng, n):
+    # loi de puissance : beaucoup de petites valeurs, une longue queue
+    return [min(int(rng.paretovariate(1.2)) - 1, (1 << 31) - 1) for _ in range(n)]
+
+
+def _outliers(rng, n):
+    return [rng.randint(0, 255) if rng.random() >= 0.01 else rng.randint(0, (1 << 30) - 1)
+            for _ in range(n)]
+
+
+DISTRIBUTIONS = {
+    "croissante": lambda rng, n: list(range(n)),
+    "aleatoire": lambda rng, n: [rng.randint(0, 4095) for _ in range(n)],
+    "melange": lambda rng, n: [rng.choice([0, 1, 2, 3, 1024, 2048, 4095]) for _ in range(n)],
+    "petites": lambda rng, n: [rng.randint(0, 15) for _ in range(n)],
+    "zipf": _zipf,
+    "outliers": _outliers,
+    # plage etroite loin de 0, puis valeurs des deux signes
+    "decalee": lambda rng, n: [1_000_000 + rng.randint(0, 100) for _ in range(n)],
+    "signees": lambda rng, n: [rng.randint(-2048, 2047) for _ in range(n)],
+}
+
+
+def make_data(dist, n, seed):
+    return DISTRIBUTIONS[dist](random.Random(f"{seed}-{dist}-{n}"), n)
+
+
+# --- modes : construction + taille exacte du binaire produit ---
+
+def _bpk_size(bp):
+    head = HEADER_REF_SIZE if bp.base or bp.zigzag else HEADER_SIZE
+    return head + 4 * len(bp.words)
+
+
+def _blocked_size(bp):
+    buf = io.BytesIO()
+    write_blocks(buf, bp.mode, bp.block_size, bp.blocks)
+    return len(buf.getvalue())
+
+
+MODES = {
+    "crossing": (lambda d: CompressorFactory.create_from_list("crossing", d), _bpk_size),
+    "non_crossing": (lambda d: CompressorFactory.create_from_list("non_crossing", d), _bpk_size),
+    "vertical": (lambda d: CompressorFactory.create_from_list("vertical", d), _bpk_size),
+    "overflow": (BitPackingOverflow.from_list, lambda bp: len(bp.blob)),
+    "pfor": (BitPackingPFOR.from_list, lambda bp: len(bp.blob)),
+    "overflow_rank": (BitPackingOverflowRank.from_list, lambda bp: len(bp.blob)),
+    "blocked": (BitPackingBlocked.from_list, _blocked_size),
+    "delta": (lambda d: CompressorFactory.create_from_list("delta", d), lambda bp: len(bp.blob)),
+    "delta2": (lambda d: CompressorFactory.create_from_list("delta2", d), lambda bp: len(bp.blob)),
+    "auto": (lambda d: CompressorFactory.create_from_list("auto", d), lambda bp: len(bp.blob)),
+}
+
 
+# --- mesures ---
+
+def _percentile(sorted_vals, q):
+    # rang le plus proche : suffisant pour quelques repetitions
+    idx = min(len(sorted_vals) - 1, max(0, round(q * (len(sorted_vals) - 1))))
+    return sorted_vals[idx]
+
+
+def _summary(rates):
+    rates = sorted(rates)
     return {
-        "mode": mode,
-        "gain": gain,
-        "t_comp": t_comp,
-        "t_decomp": t_decomp,
-        "t_get": t_get,
-        "t_seuil": t_seuil if raw_bits != comp_bits else None,
+        "median": _percentile(rates, 0.5),
+        "p10": _percentile(rates, 0.1),
+        "p90": _percentile(rates, 0.9),
     }
 
 
+def _timed(fn):
+    start = time.perf_counter()
+    out = fn()
+    return time.perf_counter() - start, out
+
+
+def run_case(mode, dist, n, seed=0, repeat=5, warmup=1):
+    """Mesure un (mode, type de donnees, n) ; debits en valeurs (ou get) par seconde."""
+    build, size_of = MODES[mode]
+    data = make_data(dist, n, seed)
+    rng = random.Random(f"{seed}-get-{n}")
+    indices = [rng.randrange(n) for _ in range(GET_SAMPLES)] if n else []
+
+    comp, decomp, get = [], [], []
+    bp = None
+    for r in range(warmup + repeat):
+        t_c, bp = _timed(lambda: build(data))
+        t_d, out = _timed(bp.to_list)
+        if out != data:
+            raise AssertionError(f"{mode}/{dist}/{n}: roundtrip mismatch")
+        t_g, _ = _timed(lambda: [bp.get(i) for i in indices])
+        if r >= warmup:
+            comp.append(n / t_c if t_c else float("inf"))
+            decomp.append(n / t_d if t_d else float("inf"))
+            get.append(len(indices) / t_g if t_g else float("inf"))
+
+    size = size_of(bp)
+    raw = n * BITS_PER_INT // 8
     return {
         "mode": mode,
-        "gain": gain,
-        "t_comp": t_comp,
-        "t_decomp": t_decomp,
-        "t_get": t_get,
-        "t_seuil": t_seuil,
+        "dist": dist,
+        "n": n,
+        "bytes": size,
+        "bits_per_value": 8 * size / n if n else 0.0,
+        "gain_pct": 100 * (1 - size / raw) if n else 0.0,
+        "compress": _summary(comp),
+        "decompress": _summary(decomp),
+        "get": _summary(get),
+        "peak_rss_kb": _peak_rss_kb(),
     }
 
 
-print("=== BENCHMARK BITPACKING 2025 ===")
+def _peak_rss_kb():
+    if resource is None:
+        return None
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # macOS renvoie des octets, Linux des kilo-octets
+    return rss // 1024 if sys.platform == "darwin" else rss
+
+
+def _case_worker(args, queue):
+    try:
+        queue.put(run_case(*args))
+    except Exception as e:  # remonte l'erreur au parent
+        queue.put({"error": repr(e)})
 
-mode = input("Choisissez le mode (crossing / non_crossing / overflow) : ").strip()
-dtype = input("Type de données (croissante / aleatoire / melange / petites) : ").strip()
-N = int(input("Combien d'entiers voulez-vous tester ? (ex: 100, 1000, 10000) : "))
 
+def run_isolated(*args):
+    # un processus neuf par cas : le pic RSS ne melange pas les cas
+    ctx = mp.get_context("spawn")
+    queue = ctx.Queue()
+    proc = ctx.Process(target=_case_worker, args=(args, queue))
+    proc.start()
+    result = queue.get()
+    proc.join()
+    if "error" in result:
+        raise RuntimeError(result["error"])
+    return result
+
+
+# --- comparaison avec une reference ---
+
+def compare(results, baseline, tolerance):
+    """(regressions, alertes) : la taille est deterministe et bloque ; le debit, mesure sur une
+    autre machine, n'est qu'une alerte quand la mediane chute de plus de tolerance."""
+    ref = {(r["mode"], r["dist"], r["n"]): r for r in baseline["results"]}
+    regressions, warnings = [], []
+    for r in results:
+        old = ref.get((r["mode"], r["dist"], r["n"]))
+        if old is None:
+            continue
+        case = f"{r['mode']}/{r['dist']}/{r['n']}"
+        if r["bytes"] > old["bytes"]:
+            regressions.append(f"{case}: bytes {old['bytes']} -> {r['bytes']} "
+                               f"({old['bits_per_value']:.2f} -> {r['bits_per_value']:.2f} bits/v)")
+        for phase in ("compress", "decompress", "get"):
+            before, after = old[phase]["median"], r[phase]["median"]
+            if after < before * (1 - tolerance):
+                warnings.append(f"{case}: {phase} {before:.0f}/s -> {after:.0f}/s")
+    return regressions, warnings
+
+
+def _csv(value):
+    return [v.strip() for v in value.split(",") if v.strip()]
+
+
+@click.command()
+@click.option("--modes", default=",".join(MODES), show_default=True, help="Comma-separated modes")
+@click.option("--dists", default=",".join(DISTRIBUTIONS), show_default=True, help="Comma-separated data types")
+@click.option("--sizes", default="1000,10000,100000", show_default=True, help="Comma-separated n (up to 10^7)")
+@click.option("--seed", default=0, show_default=True, type=int)
+@click.option("--repeat", default=5, show_default=True, type=int, help="Timed runs per case")
+@click.option("--warmup", default=1, show_default=True, type=int, help="Untimed runs per case")
+@click.option("--json", "json_path", default=None, help="Write results to this JSON file")
+@click.option("--baseline", default=None,
+              help=f"Compare against a previous JSON run (committed one: {BASELINE})")
+@click.option("--tolerance", default=0.5, show_default=True, type=float,
+              help="Relative drop of median throughput reported as a warning")
+@click.option("--speed-gate", is_flag=True,
+              help="Also fail on throughput warnings (same machine as the baseline only)")
+@click.option("--no-isolate", is_flag=True, help="Run all cases in this process")
+def main(modes, dists, sizes, seed, repeat, warmup, json_path, baseline, tolerance, speed_gate,
+         no_isolate):
+    """Benchmark non interactif : modes x types de donnees x tailles."""
+    modes, dists = _csv(modes), _csv(dists)
+    sizes = [int(float(s)) for s in _csv(sizes)]
+    for m in modes:
+        if m not in MODES:
+            raise click.BadParameter(f"unknown mode {m}", param_hint="--modes")
+    for d in dists:
+        if d not in DISTRIBUTIONS:
+            raise click.BadParameter(f"unknown data type {d}", param_hint="--dists")
+
+    runner = run_case if no_isolate else run_isolated
+    results = []
+    click.echo(f"{'mode':<14}{'data':<12}{'n':>10}{'bytes':>12}{'bits/v':>8}"
+               f"{'comp/s':>12}{'decomp/s':>12}{'get/s':>12}{'rss KB':>10}")
+    for n in sizes:
+        for d in dists:
+            for m in modes:
+                r = runner(m, d, n, seed, repeat, warmup)
+                results.append(r)
+                click.echo(f"{m:<14}{d:<12}{n:>10}{r['bytes']:>12}{r['bits_per_value']:>8.2f}"
+                           f"{r['compress']['median']:>12.0f}{r['decompress']['median']:>12.0f}"
+                           f"{r['get']['median']:>12.0f}{r['peak_rss_kb'] or 0:>10}")
+
+    report = {
+        "meta": {
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "numpy": HAVE_NUMPY,
+            "seed": seed,
+            "repeat": repeat,
+            "warmup": warmup,
+        },
+        "results": results,
+    }
+    if json_path:
+        with open(json_path, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
 
-if dtype == "croissante":
-    data = list(range(N))
-elif dtype == "aleatoire":
-    data = [random.randint(0, 4095) for _ in range(N)]
-elif dtype == "melange":
-    data = [random.choice([0, 1, 2, 3, 1024, 2048, 4095]) for _ in range(N)]
-elif dtype == "petites":
-    data = [random.randint(0, 15) for _ in range(N)]
-else:
-    print("❌ Type de données invalide.")
-    exit()
+    if baseline:
+        with open(baseline, "r", encoding="utf-8") as f:
+            ref = json.load(f)
+        if ref["meta"]["seed"] != seed:
+            raise click.ClickException(f"Baseline was made with --seed {ref['meta']['seed']}")
+        regressions, warnings = compare(results, ref, tolerance)
+        for line in warnings:
+            click.echo(f"WARNING {line}", err=True)
+        for line in regressions:
+            click.echo(f"REGRESSION {line}", err=True)
+        if regressions or (speed_gate and warnings):
+            sys.exit(1)
+        click.echo("OK: no regression against baseline")
 
 
-benchmark_one(data, mode)
-print("\nFin du benchmark ✅")
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,141 @@
+﻿from __future__ import annotations
+import mmap
+from operator import index as as_index
+from typing import Iterable, List
+
+# au-dela de cet ecart, deux indices tries sont lus separement plutot qu'en un seul passage
+RUN_GAP = 16
+
+
+class BatchAccessMixin:
+    """get_many, __getitem__ (entier ou slice) et __len__ pour un packer qui a n et get.
+
+    Un packer peut fournir _decode_run(start, count) pour decoder une plage
+    contigue en un seul passage sur les mots ; par defaut on retombe sur get.
+    """
+
+    def __len__(self) -> int:
+        return self.n
+
+    def __getitem__(self, key):
+        if isinstance(key, slice):
+            return self.get_many(range(*key.indices(self.n)))
+        i = as_index(key)
+        if i < 0:
+            i += self.n
+        return self.get(i)
+
+    def _decode_run(self, start: int, count: int) -> List[int]:
+        get = self.get
+        return [get(i) for i in range(start, start + count)]
+
+    def get_many(self, indices: Iterable[int]) -> List[int]:
+        if isinstance(indices, range) and indices.step > 0 and len(indices) > 1:
+            start, stop, step = indices.start, indices[-1] + 1, indices.step
+            if step <= RUN_GAP:
+                self._check(start, stop - 1)
+                return self._decode_run(start, stop - start)[::step]
+
+        out: List[int] = []
+        idx = list(indices)
+        a = 0
+        while a < len(idx):
+            # plus longue suite croissante d'indices voisins : decodee en une fois
+            b = a + 1
+            while b < len(idx) and 0 <= idx[b] - idx[b - 1] <= RUN_GAP:
+                b += 1
+            first, last = idx[a], idx[b - 1]
+            if b - a == 1:
+                out.append(self.get(first))
+            else:
+                self._check(first, last)
+                run = self._decode_run(first, last - first + 1)
+                out.extend(run[i - first] for i in idx[a:b])
+            a = b
+        return out
+
+    def _check(self, first: int, last: int) -> None:
+        if first < 0 or last >= self.n:
+            raise IndexError("index out of range")
+
+
+def has_magic(path: str, magic: bytes) -> bool:
+    with open(path, "rb") as f:
+        return f.read(len(magic)) == magic
+
+
+class MappedBlobReader(BatchAccessMixin):
+    """Lecteur sur un binaire (bytes, memoryview ou mmap via open) avec close / with.
+
+    Une sous-classe se construit depuis le binaire et liste dans _views() ses vues et
+    sous-lecteurs (release ou close) : close() les libere tous, puis ferme le mmap.
+    """
+
+    _mm = None
+    _closed = False
+
+    @classmethod
+    def open(cls, path: str, *args):
+        with open(path, "rb") as f:
+            mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        try:
+            reader = cls(mm, *args)
+        except ValueError:
+            mm.close()
+            raise
+        reader._mm = mm
+        return reader
+
+    def _views(self) -> Iterable:
+        return ()
+
+    def to_list(self) -> List[int]:
+        return self._decode_run(0, self.n)
+
+    def close(self) -> None:
+        if self._closed:
+            return
+        self._closed = True
+        # un mmap ne se ferme qu'une fois toutes ses vues liberees
+        for v in self._views():
+            if hasattr(v, "release"):
+                v.release()
+            elif v is not None:
+                v.close()
+        if self._mm is not None:
+            self._mm.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+
+class BlobPacker(BatchAccessMixin):
+    """Packer sur un binaire autodescriptif en memoire : lecture par reader_cls, save / load."""
+
+    reader_cls = MappedBlobReader
+
+    def __init__(self, blob: bytes):
+        self.blob = blob
+        self._reader = self.reader_cls(blob)
+        self.n = self._reader.n
+
+    def get(self, i: int) -> int:
+        return self._reader.get(i)
+
+    def _decode_run(self, start: int, count: int) -> List[int]:
+        return self._reader._decode_run(start, count)
+
+    def to_list(self) -> List[int]:
+        return self._reader.to_list()
+
+    def save(self, path: str) -> None:
+        with open(path, "wb") as f:
+            f.write(self.blob)
+
+    @classmethod
+    def load(cls, path: str):
+        with open(path, "rb") as f:
+            return cls(f.read())
@@ -0,0 +1,127 @@
+﻿from __future__ import annotations
+import asyncio
+from concurrent.futures import Executor
+from operator import index as as_index
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from .reader import open_reader
+
+# mmap : lecture tout de suite dans la boucle (page en cache : moins cher qu'un tour de boucle) ;
+# executor : lectures groupees dans un thread (disque lent, defauts de page bloquants)
+BACKENDS = ("mmap", "executor")
+
+
+class AsyncReader:
+    """get / get_many pour des coroutines concurrentes sur un fichier ouvert une fois.
+
+    En executor, les demandes arrivees pendant un meme tour de boucle (ou pendant
+    la lecture precedente) sont fusionnees : un seul get_many dans le thread, sur
+    les indices tries, qui decode les indices voisins en une seule plage.
+    """
+
+    def __init__(self, reader, backend: str = "mmap", executor: Optional[Executor] = None):
+        if backend not in BACKENDS:
+            raise ValueError(f"Unknown backend: {backend!r} (expected one of {', '.join(BACKENDS)})")
+        self._reader = reader
+        self.n = reader.n
+        self.backend = backend
+        self._executor = executor
+        self._pending: List[Tuple[List[int], asyncio.Future]] = []
+        self._scheduled = False
+        self._inflight: Optional[asyncio.Future] = None
+        # demandes recues et lectures groupees effectuees
+        self.requests = self.batches = 0
+
+    @classmethod
+    async def open(cls, path: str, backend: str = "mmap", executor: Optional[Executor] = None,
+                   cache: int = 0) -> "AsyncReader":
+        # l'ouverture (en-tete, mmap) ne bloque pas la boucle
+        loop = asyncio.get_running_loop()
+        reader = await loop.run_in_executor(executor, open_reader, path, cache)
+        return cls(reader, backend, executor)
+
+    def _check(self, indices: List[int]) -> None:
+        for i in indices:
+            if not 0 <= i < self.n:
+                raise IndexError("index out of range")
+
+    def _submit(self, indices: List[int]) -> asyncio.Future:
+        self._check(indices)
+        loop = asyncio.get_running_loop()
+        fut = loop.create_future()
+        self._pending.append((indices, fut))
+        self.requests += 1
+        if not self._scheduled:
+            self._scheduled = True
+            loop.call_soon(self._flush)
+        return fut
+
+    async def get(self, i: int) -> int:
+        i = as_index(i)
+        if self.backend == "mmap":
+            self._check([i])
+            self.requests += 1
+            self.batches += 1
+            return self._reader.get(i)
+        return (await self._submit([i]))[0]
+
+    async def get_many(self, indices: Iterable[int]) -> List[int]:
+        idx = [as_index(i) for i in indices]
+        if not idx:
+            return []
+        if self.backend == "mmap":
+            self._check(idx)
+            self.requests += 1
+            self.batches += 1
+            return self._reader.get_many(idx)
+        return await self._submit(idx)
+
+    def _lookup(self, batch) -> Dict[int, int]:
+        uniq = sorted({i for idx, _ in batch for i in idx})
+        return dict(zip(uniq, self._reader.get_many(uniq)))
+
+    def _flush(self) -> None:
+        # une seule lecture en cours ; les nouvelles demandes attendent la suivante
+        batch, self._pending = self._pending, []
+        self.batches += 1
+        loop = asyncio.get_running_loop()
+        self._inflight = loop.run_in_executor(self._executor, self._lookup, batch)
+        self._inflight.add_done_callback(lambda f: self._done(batch, f))
+
+    def _done(self, batch, fut: asyncio.Future) -> None:
+        self._inflight = None
+        if fut.exception() is not None:
+            self._fail(batch, fut.exception())
+        else:
+            self._resolve(batch, fut.result())
+        if self._pending:
+            asyncio.get_running_loop().call_soon(self._flush)
+        else:
+            self._scheduled = False
+
+    @staticmethod
+    def _resolve(batch, table: Dict[int, int]) -> None:
+        for idx, fut in batch:
+            if not fut.done():
+                fut.set_result([table[i] for i in idx])
+
+    @staticmethod
+    def _fail(batch, exc: BaseException) -> None:
+        for _, fut in batch:
+            if not fut.done():
+                fut.set_exception(exc)
+
+    async def close(self) -> None:
+        # on attend la lecture en cours avant de fermer le mmap
+        while self._scheduled:
+            if self._inflight is not None:
+                await asyncio.wait({self._inflight})
+            await asyncio.sleep(0)
+        if hasattr(self._reader, "close"):
+            self._reader.close()
+
+    async def __aenter__(self) -> "AsyncReader":
+        return self
+
+    async def __aexit__(self, *exc) -> None:
+        await self.close()
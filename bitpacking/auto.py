@@ -0,0 +1,241 @@
+﻿from __future__ import annotations
+from typing import Dict, List, Optional, Tuple
+
+from .access import BatchAccessMixin
+from .core import read_bits, restore, choose_reference, zigzag_encode, words_needed
+from .delta import compress_delta, DeltaReader, ORDERS, MAGIC as DELTA_MAGIC
+from .factory import CompressorFactory, dumps_binary, loads_packed, read_header, HEADER_SIZE, HEADER_REF_SIZE
+from .noncrossing import start_bit_of
+from .overflow import BitPackerOverflow, OverflowReader, MAGIC as OVERFLOW_MAGIC
+from .pfor import compress_pfor, PforReader, MAGIC as PFOR_MAGIC
+from .overflow_rank import compress_overflow_rank, RankOverflowReader, MAGIC as RANK_MAGIC
+from .vectorized import HAVE_NUMPY
+from .vertical import read_vertical, words_for
+
+CODECS = ["crossing", "non_crossing", "vertical", "overflow", "pfor", "delta", "delta2", "overflow_rank"]
+# taille connue exactement a partir du min et du max
+FIXED_WIDTH = ("crossing", "non_crossing", "vertical")
+
+# cout de decodage par valeur, relatif au crossing pur Python (mesure sur 2*10^5 valeurs)
+DECODE_COST = {
+    "crossing": 1.0, "non_crossing": 0.8, "vertical": 1.0, "overflow": 1.7,
+    "pfor": 1.1, "delta": 1.4, "delta2": 1.6,
+    # rank : 1.3 a 2 % d'exceptions, plus lent sans exception (crossing gagne alors en taille)
+    "overflow_rank": 1.4,
+}
+if HAVE_NUMPY:
+    DECODE_COST.update(crossing=0.35, vertical=0.2)
+
+# echantillon : des suites contigues (les deltas ont besoin de valeurs voisines)
+SAMPLE_RUNS = 16
+SAMPLE_RUN = 1024
+
+# lecteurs sur place des binaires qui ne sont pas BPK1/BPK2
+READERS = {
+    OVERFLOW_MAGIC: OverflowReader, PFOR_MAGIC: PforReader, DELTA_MAGIC: DeltaReader,
+    RANK_MAGIC: RankOverflowReader,
+}
+
+
+def encode(codec: str, ints: List[int]) -> bytes:
+    """Binaire autodescriptif de ints dans le codec donne."""
+    if codec in FIXED_WIDTH:
+        comp = CompressorFactory.create_from_list(codec, ints)
+        return dumps_binary(codec, comp.k, comp.n, comp.words, comp.base, comp.zigzag)
+    if codec == "overflow":
+        return BitPackerOverflow().compress(ints)
+    if codec == "pfor":
+        return compress_pfor(ints)
+    if codec == "overflow_rank":
+        return compress_overflow_rank(ints)
+    if codec in ORDERS:
+        return compress_delta(ints, ORDERS[codec])
+    raise ValueError(f"Unknown mode: {codec}")
+
+
+def _fixed_size(codec: str, n: int, lo: int, hi: int) -> Optional[int]:
+    if n == 0:
+        return HEADER_SIZE
+    base, zigzag = choose_reference(lo, hi)
+    if zigzag:
+        k = max(zigzag_encode(lo), zigzag_encode(hi)).bit_length()
+    else:
+        k = max(1, (hi - base).bit_length())
+    head = HEADER_REF_SIZE if base or zigzag else HEADER_SIZE
+    if codec == "crossing":
+        return head + 4 * words_needed(n * k)
+    if codec == "non_crossing":
+        return head + 4 * words_needed(start_bit_of(n - 1, k) + k)
+    # vertical : k limite a 32
+    return head + 4 * words_for(n, k) if k <= 32 else None
+
+
+def _sample_runs(ints: List[int]) -> List[List[int]]:
+    n = len(ints)
+    if n <= SAMPLE_RUNS * SAMPLE_RUN:
+        return [ints]
+    step = (n - SAMPLE_RUN) // (SAMPLE_RUNS - 1)
+    return [ints[a : a + SAMPLE_RUN] for a in range(0, step * SAMPLE_RUNS, step)]
+
+
+def estimate_sizes(ints: List[int], codecs: Optional[List[str]] = None) -> Dict[str, int]:
+    """Taille estimee en octets de chaque codec (exacte si l'echantillon couvre tout)."""
+    codecs = codecs or CODECS
+    n = len(ints)
+    lo, hi = (min(ints), max(ints)) if ints else (0, 0)
+    runs = _sample_runs(ints)
+    sampled = sum(map(len, runs))
+    sizes: Dict[str, int] = {}
+    for codec in codecs:
+        try:
+            if codec in FIXED_WIDTH:
+                size = _fixed_size(codec, n, lo, hi)
+            elif len(runs) == 1:
+                size = len(encode(codec, ints))
+            else:
+                # l'en-tete n'est compte qu'une fois, le reste au prorata
+                fixed = len(encode(codec, []))
+                body = sum(len(encode(codec, run)) - fixed for run in runs)
+                size = fixed + body * n // sampled
+        except (ValueError, OverflowError):
+            # valeurs hors de la plage du codec
+            size = None
+        if size is not None:
+            sizes[codec] = size
+    return sizes
+
+
+def score_codecs(ints: List[int], speed_weight: float = 0.0,
+                 codecs: Optional[List[str]] = None) -> List[Tuple[float, str, int]]:
+    """[(score, codec, taille estimee)] tries : 0 = taille seule, 1 = vitesse seule.
+
+    score = (taille / meilleure taille) ** (1 - w) * (cout / meilleur cout) ** w :
+    a w = 0.5, deux fois plus gros compense deux fois plus rapide.
+    """
+    if not 0.0 <= speed_weight <= 1.0:
+        raise ValueError("speed_weight must be in [0, 1]")
+    sizes = estimate_sizes(ints, codecs)
+    if not sizes:
+        raise ValueError("No codec can encode these values")
+    best_size = min(sizes.values()) or 1
+    best_cost = min(DECODE_COST[c] for c in sizes)
+    scored = [((size / best_size) ** (1 - speed_weight) * (DECODE_COST[c] / best_cost) ** speed_weight,
+               c, size)
+              for c, size in sizes.items()]
+    # a score egal, l'ordre de CODECS departage
+    scored.sort(key=lambda s: (s[0], CODECS.index(s[1])))
+    return scored
+
+
+def choose_codec(ints: List[int], speed_weight: float = 0.0,
+                 codecs: Optional[List[str]] = None) -> str:
+    return score_codecs(ints, speed_weight, codecs)[0][1]
+
+
+def compress_auto(ints: List[int], speed_weight: float = 0.0, block_size: Optional[int] = None,
+                  jobs: int = 1) -> bytes:
+    """Codec choisi pour tout le fichier, ou par bloc (conteneur BPSG, codec auto)."""
+    if block_size is None and jobs == 1:
+        return encode(choose_codec(ints, speed_weight), ints)
+    from .parallel import compress_parallel
+    return compress_parallel(ints, "auto", jobs, block_size, speed_weight)
+
+
+def codec_of(data) -> str:
+    """Codec d'un binaire d'apres sa signature (et son en-tete pour BPK, delta et BPSG)."""
+    from .parallel import parse_segments, SEG_MAGIC
+    magic = bytes(data[:4])
+    if magic == SEG_MAGIC:
+        # conteneur segmente : auto si chaque segment a son propre codec
+        return parse_segments(data)[0]
+    reader = READERS.get(magic)
+    if reader is not None:
+        with reader(data) as r:
+            return r.codec
+    return read_header(data)[0]
+
+
+def open_blob(data):
+    """Lecteur sur place (overflow, PFOR, delta) ou compresseur BPK reconstruit."""
+    reader = READERS.get(bytes(data[:4]))
+    if reader is not None:
+        return reader(data)
+    return loads_packed(data)
+
+
+def decode_blob(data) -> List[int]:
+    packer = open_blob(data)
+    vals = packer._decode_run(0, packer.n)
+    if hasattr(packer, "close"):
+        packer.close()
+    return vals
+
+
+def get_blob(data, i: int) -> int:
+    """Valeur i d'un binaire autodescriptif, lue sur place."""
+    reader = READERS.get(bytes(data[:4]))
+    if reader is not None:
+        with reader(data) as r:
+            return r.get(i)
+    mode, k, n, _, base, zigzag, head = read_header(data)
+    if not 0 <= i < n:
+        raise IndexError("index out of range")
+    with memoryview(data)[head:] as words:
+        if mode == "vertical":
+            return restore(read_vertical(words, i, k), base, zigzag)
+        bit = i * k if mode == "crossing" else start_bit_of(i, k)
+        return restore(read_bits(words, bit, k), base, zigzag)
+
+
+def blob_is_signed(data) -> bool:
+    # vrai si une valeur decodee peut etre < 0 (base negative ou zigzag quelque part)
+    magic = bytes(data[:4])
+    if magic == DELTA_MAGIC:
+        with DeltaReader(data) as r:
+            sections = [r._checkpoints, r._deltas, r._res]
+            return any(s.base < 0 or s.zigzag for s in sections if s is not None)
+    reader = READERS.get(magic)
+    if reader is not None:
+        with reader(data) as r:
+            return r.base < 0 or r.zigzag
+    _, _, _, _, base, zigzag, _ = read_header(data)
+    return base < 0 or zigzag
+
+
+class BitPackingAuto(BatchAccessMixin):
+    """Codec choisi au cout ; le binaire garde la signature du codec retenu."""
+
+    def __init__(self, blob: bytes):
+        # import local : parallel encode ses segments auto via ce module
+        from .parallel import SegmentedReader, SEG_MAGIC
+        self.blob = blob
+        if bytes(blob[:4]) == SEG_MAGIC:
+            self.codec = "auto"
+            self._inner = SegmentedReader(blob)
+        else:
+            self.codec = codec_of(blob)
+            self._inner = open_blob(blob)
+        self.n = self._inner.n
+
+    @classmethod
+    def from_list(cls, ints: List[int], speed_weight: float = 0.0,
+                  block_size: Optional[int] = None) -> "BitPackingAuto":
+        return cls(compress_auto(ints, speed_weight, block_size))
+
+    def get(self, i: int) -> int:
+        return self._inner.get(i)
+
+    def _decode_run(self, start: int, count: int) -> List[int]:
+        return self._inner._decode_run(start, count)
+
+    def to_list(self) -> List[int]:
+        return self._decode_run(0, self.n)
+
+    def save(self, path: str) -> None:
+        with open(path, "wb") as f:
+            f.write(self.blob)
+
+    @classmethod
+    def load(cls, path: str) -> "BitPackingAuto":
+        with open(path, "rb") as f:
+            return cls(f.read())
@@ -0,0 +1,68 @@
+﻿from __future__ import annotations
+from typing import List
+
+from .access import BatchAccessMixin
+from .factory import CompressorFactory
+from .stream import (
+    iter_blocks_of, write_blocks, read_stream_header, iter_frames_after_header, packer_from_frame
+)
+
+# petits blocs : un outlier n'elargit que les valeurs de son bloc
+DEFAULT_BLOCK_SIZE = 1024
+
+
+class BitPackingBlocked(BatchAccessMixin):
+
+    def __init__(self, n: int, block_size: int, blocks: list, mode: str = "crossing"):
+        if n < 0 or block_size <= 0:
+            raise ValueError("n must be >= 0 and block_size > 0")
+        if len(blocks) != -(-n // block_size):
+            raise ValueError("block count does not match n and block_size")
+        self.n = n
+        self.block_size = block_size
+        self.blocks = blocks
+        self.mode = mode
+
+    @classmethod
+    def from_list(cls, ints: List[int], block_size: int = DEFAULT_BLOCK_SIZE,
+                  mode: str = "crossing", zigzag: bool = False) -> "BitPackingBlocked":
+        # chaque bloc a son k et sa base : une plage decalee ne coute que son etendue
+        blocks = [CompressorFactory.create_from_list(mode, b, zigzag)
+                  for b in iter_blocks_of(ints, block_size)]
+        return cls(n=len(ints), block_size=block_size, blocks=blocks, mode=mode)
+
+    @property
+    def ks(self) -> List[int]:
+        return [b.k for b in self.blocks]
+
+    def get(self, i: int) -> int:
+        if i < 0 or i >= self.n:
+            raise IndexError("index out of range")
+        return self.blocks[i // self.block_size].get(i % self.block_size)
+
+    def _decode_run(self, start: int, count: int) -> List[int]:
+        out: List[int] = []
+        while count > 0:
+            b, j = divmod(start, self.block_size)
+            take = min(count, self.block_size - j)
+            out.extend(self.blocks[b]._decode_run(j, take))
+            start += take
+            count -= take
+        return out
+
+    def to_list(self) -> List[int]:
+        out: List[int] = []
+        for b in self.blocks:
+            out.extend(b.to_list())
+        return out
+
+    def save(self, path: str) -> None:
+        with open(path, "wb") as f:
+            write_blocks(f, self.mode, self.block_size, self.blocks)
+
+    @classmethod
+    def load(cls, path: str) -> "BitPackingBlocked":
+        with open(path, "rb") as f:
+            mode, block_size, version = read_stream_header(f)
+            blocks = [packer_from_frame(mode, *frame) for frame in iter_frames_after_header(f, version)]
+        return cls(n=sum(b.n for b in blocks), block_size=block_size, blocks=blocks, mode=mode)
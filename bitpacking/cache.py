@@ -0,0 +1,124 @@
+﻿from __future__ import annotations
+import sys
+from array import array
+from collections import OrderedDict
+from typing import Iterable, List
+
+from .access import BatchAccessMixin
+
+# valeurs par bloc decode (blocs alignes : le bloc b couvre [b * BLOCK, (b + 1) * BLOCK))
+BLOCK = 256
+DEFAULT_BUDGET = 4 << 20
+# au-dela, une plage est decodee directement : un balayage ne vide pas le cache
+SCAN_BLOCKS = 8
+
+
+def _store(vals: List[int]):
+    # array 64 bits quand les valeurs tiennent : ~8 octets par valeur au lieu de ~36
+    for typecode in ("q", "Q"):
+        try:
+            block = array(typecode, vals)
+        except OverflowError:
+            continue
+        return block, sys.getsizeof(block)
+    return vals, sys.getsizeof(vals) + sum(map(sys.getsizeof, vals))
+
+
+class CachedReader(BatchAccessMixin):
+    """Cache LRU de blocs decodes devant n'importe quel packer (n, get, _decode_run).
+
+    get et get_many passent par le cache ; budget = octets occupes par les blocs.
+    Apres une modification du packer (append, __setitem__), appeler invalidate().
+    """
+
+    def __init__(self, inner, budget: int = DEFAULT_BUDGET, block: int = BLOCK):
+        if block <= 0:
+            raise ValueError("block must be positive")
+        self._inner = inner
+        self.block = block
+        self.budget = budget
+        self.size = 0
+        self.hits = self.misses = self.evictions = 0
+        self._blocks: OrderedDict = OrderedDict()
+
+    @property
+    def n(self) -> int:
+        return self._inner.n
+
+    def _load(self, b: int):
+        entry = self._blocks.get(b)
+        if entry is not None:
+            self.hits += 1
+            self._blocks.move_to_end(b)
+            return entry[0]
+        self.misses += 1
+        start = b * self.block
+        vals, size = _store(self._inner._decode_run(start, min(self.block, self.n - start)))
+        if size <= self.budget:
+            self._blocks[b] = (vals, size)
+            self.size += size
+            while self.size > self.budget:
+                _, (_, old) = self._blocks.popitem(last=False)
+                self.size -= old
+                self.evictions += 1
+        return vals
+
+    def get(self, i: int) -> int:
+        if i < 0 or i >= self._inner.n:
+            raise IndexError("index out of range")
+        b, r = divmod(i, self.block)
+        # chemin du hit sans appel supplementaire
+        entry = self._blocks.get(b)
+        if entry is None:
+            return self._load(b)[r]
+        self.hits += 1
+        self._blocks.move_to_end(b)
+        return entry[0][r]
+
+    def get_many(self, indices: Iterable[int]) -> List[int]:
+        if isinstance(indices, range):
+            return super().get_many(indices)
+        # un hit coute moins qu'un regroupement en plages : indice par indice
+        get = self.get
+        return [get(i) for i in indices]
+
+    def _decode_run(self, start: int, count: int) -> List[int]:
+        if count <= 0:
+            return []
+        first, last = start // self.block, (start + count - 1) // self.block
+        if last - first >= SCAN_BLOCKS:
+            return self._inner._decode_run(start, count)
+        out: List[int] = []
+        for b in range(first, last + 1):
+            out.extend(self._load(b))
+        a = start - first * self.block
+        return out[a : a + count]
+
+    def to_list(self) -> List[int]:
+        return self._inner._decode_run(0, self.n)
+
+    @property
+    def hit_rate(self) -> float:
+        total = self.hits + self.misses
+        return self.hits / total if total else 0.0
+
+    def stats(self) -> dict:
+        return {
+            "hits": self.hits, "misses": self.misses, "evictions": self.evictions,
+            "blocks": len(self._blocks), "bytes": self.size, "budget": self.budget,
+        }
+
+    def invalidate(self) -> None:
+        self._blocks.clear()
+        self.size = 0
+
+    def close(self) -> None:
+        self.invalidate()
+        if hasattr(self._inner, "close"):
+            self._inner.close()
+
+    def __enter__(self) -> "CachedReader":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
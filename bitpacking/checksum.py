@@ -0,0 +1,53 @@
+﻿from __future__ import annotations
+import sys
+
+try:
+    from crc32c import crc32c as _crc32c_native
+except ImportError:  # crc32c est optionnel : table en pur Python
+    _crc32c_native = None
+
+HAVE_CRC32C = _crc32c_native is not None
+
+# CRC-32C (Castagnoli), polynome reflechi
+POLY = 0x82F63B78
+
+
+def _tables():
+    t0 = []
+    for i in range(256):
+        c = i
+        for _ in range(8):
+            c = (c >> 1) ^ POLY if c & 1 else c >> 1
+        t0.append(c)
+    # slicing-by-8 : la table j fait avancer un octet de j positions
+    tables = [t0]
+    for _ in range(7):
+        prev = tables[-1]
+        tables.append([(prev[i] >> 8) ^ t0[prev[i] & 0xFF] for i in range(256)])
+    return tables
+
+
+_TABLES = _tables()
+
+
+def crc32c_py(data, crc: int = 0) -> int:
+    """CRC-32C en pur Python, 8 octets par tour (environ 10 Mo/s)."""
+    t0, t1, t2, t3, t4, t5, t6, t7 = _TABLES
+    crc ^= 0xFFFFFFFF
+    data = memoryview(data).cast("B")
+    # les mots de 8 octets doivent etre lus en little-endian
+    n8 = len(data) & ~7 if sys.byteorder == "little" else 0
+    for q in data[:n8].cast("Q"):
+        q ^= crc
+        crc = (t7[q & 0xFF] ^ t6[q >> 8 & 0xFF] ^ t5[q >> 16 & 0xFF] ^ t4[q >> 24 & 0xFF]
+               ^ t3[q >> 32 & 0xFF] ^ t2[q >> 40 & 0xFF] ^ t1[q >> 48 & 0xFF] ^ t0[q >> 56])
+    for b in data[n8:]:
+        crc = t0[(crc ^ b) & 0xFF] ^ (crc >> 8)
+    return crc ^ 0xFFFFFFFF
+
+
+def crc32c(data, crc: int = 0) -> int:
+    """CRC-32C de data (bytes, memoryview, mmap), a enchainer via crc."""
+    if _crc32c_native is not None:
+        return _crc32c_native(data, crc)
+    return crc32c_py(data, crc)
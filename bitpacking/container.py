@@ -0,0 +1,438 @@
+﻿from __future__ import annotations
+import struct
+from itertools import chain
+from typing import Callable, Dict, List, Optional, Tuple
+
+from .access import BatchAccessMixin, MappedBlobReader, has_magic
+from .auto import choose_codec
+from .blocked import BitPackingBlocked, DEFAULT_BLOCK_SIZE as BLOCKED_BLOCK_SIZE
+from .checksum import crc32c
+from .core import (
+    read_bits, words_needed, from_unsigned, restore, words_to_bytes, words_from_bytes, BitReader,
+    FLAG_ZIGZAG
+)
+from .delta import DeltaReader, DEFAULT_INTERVAL, _split as _split_delta
+from .factory import CompressorFactory
+from .noncrossing import start_bit_of
+from .overflow import BitPackerOverflow, OverflowReader
+from .overflow_rank import RankOverflowReader, rank_sections
+from .parallel import SegmentedReader, compress_segments, CODECS as SEG_CODECS
+from .pfor import PforReader, pfor_sections, BLOCK as PFOR_BLOCK
+from .vectorized import HAVE_NUMPY
+from .vertical import read_vertical, unpack_vertical, unpack_vertical_numpy, words_for, BLOCK, LANES
+
+MAGIC = b"BPC1"
+VERSION = 1
+# magic, version, flags, id du codec, n (64 bits)
+HEADER_FMT = "<4sBBHQ"
+HEADER_SIZE = struct.calcsize(HEADER_FMT)
+# par section : offset, taille en octets, CRC32C
+ENTRY_FMT = "<QQI"
+ENTRY_SIZE = struct.calcsize(ENTRY_FMT)
+# offset de la table, nb de sections, octets par bloc de CRC (0 = aucun), CRC32C de l'en-tete
+# et de la table, magic de fin
+FOOTER_FMT = "<QHII4s"
+FOOTER_SIZE = struct.calcsize(FOOTER_FMT)
+FOOTER_MAGIC = b"BPCE"
+
+FLAG_BLOCK_CRC = 1
+DEFAULT_CRC_BLOCK = 1 << 16
+
+# nom -> (id, pack(ints) -> sections, open(n, sections) -> lecteur) ; la section 0 porte
+# les parametres du codec
+REGISTRY: Dict[str, Tuple[int, Callable, Callable]] = {}
+_BY_ID: Dict[int, str] = {}
+
+
+def register_codec(name: str, codec_id: int, pack: Callable, open_: Callable) -> None:
+    if codec_id in _BY_ID and _BY_ID[codec_id] != name:
+        raise ValueError(f"Codec id {codec_id} already used by {_BY_ID[codec_id]}")
+    REGISTRY[name] = (codec_id, pack, open_)
+    _BY_ID[codec_id] = name
+
+
+# --- codecs a largeur fixe : k, flags, base puis les mots ---
+FIXED_PARAMS_FMT = "<IBq"
+
+
+def _pack_fixed(mode: str):
+    def pack(ints: List[int]) -> List[bytes]:
+        comp = CompressorFactory.create_from_list(mode, ints)
+        params = struct.pack(FIXED_PARAMS_FMT, comp.k, FLAG_ZIGZAG if comp.zigzag else 0, comp.base)
+        return [params, words_to_bytes(comp.words)]
+    return pack
+
+
+class _FixedView(BatchAccessMixin):
+    # mots crossing / non-crossing / vertical lus sur place
+
+    def __init__(self, mode: str, n: int, sections):
+        if len(sections) != 2:
+            raise ValueError("Corrupted container sections")
+        self.k, flags, self.base = struct.unpack(FIXED_PARAMS_FMT, sections[0])
+        self.mode, self.n, self.zigzag = mode, n, bool(flags & FLAG_ZIGZAG)
+        self._words = sections[1]
+        if mode == "vertical":
+            nwords = words_for(n, self.k)
+        else:
+            nwords = -(-(self._start_bit(n - 1) + self.k) // 32) if n else 0
+        if len(self._words) < 4 * nwords:
+            raise ValueError("Words section too short for n values")
+
+    def _start_bit(self, i: int) -> int:
+        return i * self.k if self.mode == "crossing" else start_bit_of(i, self.k)
+
+    def get(self, i: int) -> int:
+        if not 0 <= i < self.n:
+            raise IndexError("index out of range")
+        if self.mode == "vertical":
+            return restore(read_vertical(self._words, i, self.k), self.base, self.zigzag)
+        return restore(read_bits(self._words, self._start_bit(i), self.k), self.base, self.zigzag)
+
+    def _decode_run(self, start: int, count: int) -> List[int]:
+        if self.mode == "crossing":
+            vals = BitReader(self._words, start * self.k).read_many(count, self.k)
+        elif self.mode == "vertical" and count > 0:
+            # seuls les blocs de la plage sont copies
+            b0, b1 = start // BLOCK, (start + count - 1) // BLOCK + 1
+            size = 4 * LANES * self.k
+            words = words_from_bytes(self._words[b0 * size : b1 * size])
+            if HAVE_NUMPY:
+                vals = unpack_vertical_numpy(words, self.k, 0, b1 - b0).tolist()
+            else:
+                vals = unpack_vertical(words, self.k, 0, b1 - b0)
+            off = start - b0 * BLOCK
+            vals = vals[off : off + count]
+        else:
+            return super()._decode_run(start, count)
+        return from_unsigned(vals, self.base, self.zigzag)
+
+    def close(self) -> None:
+        pass
+
+
+# --- overflow : parametres puis slots et zone overflow ---
+OVERFLOW_PARAMS_FMT = "<BBBBBq"
+
+
+def _pack_overflow(ints: List[int]) -> List[bytes]:
+    packer = BitPackerOverflow()
+    words, over = packer.pack_sections(ints)
+    params = struct.pack(OVERFLOW_PARAMS_FMT, packer.kprime, max(1, packer.idx_bits), packer.slot_w,
+                         max(1, packer.k_over), FLAG_ZIGZAG if packer.zigzag else 0, packer.base)
+    return [params, words_to_bytes(words), words_to_bytes(over)]
+
+
+def _open_overflow(n: int, sections):
+    if len(sections) != 3:
+        raise ValueError("Corrupted container sections")
+    _, _, slot_w, k_over, flags, base = struct.unpack(OVERFLOW_PARAMS_FMT, sections[0])
+    return OverflowReader.from_sections(n, slot_w, k_over, sections[1], sections[2], base,
+                                        bool(flags & FLAG_ZIGZAG))
+
+
+# --- PFOR : bloc, flags, base puis le repertoire des blocs et les mots ---
+def _pack_pfor(ints: List[int]) -> List[bytes]:
+    base, zigzag, directory, data = pfor_sections(ints)
+    params = struct.pack(FIXED_PARAMS_FMT, PFOR_BLOCK, FLAG_ZIGZAG if zigzag else 0, base)
+    return [params, directory, words_to_bytes(data)]
+
+
+def _open_pfor(n: int, sections):
+    if len(sections) == 2 and not sections[0]:
+        return _open_legacy(PforReader, n, sections)
+    if len(sections) != 3:
+        raise ValueError("Corrupted container sections")
+    block, flags, base = struct.unpack(FIXED_PARAMS_FMT, sections[0])
+    return PforReader.from_sections(n, block, base, bool(flags & FLAG_ZIGZAG), sections[1],
+                                    sections[2])
+
+
+# --- delta : ordre, intervalle et (k, flags, base) de chaque partie, puis leurs mots ---
+# (checkpoints, deltas aux checkpoints, residus) ; leurs n se deduisent de n et de l'intervalle
+DELTA_PARAMS_FMT = "<BI" + 3 * FIXED_PARAMS_FMT[1:]
+
+
+def _pack_delta(order: int):
+    def pack(ints: List[int]) -> List[bytes]:
+        parts = [CompressorFactory.create_from_list("crossing", vals)
+                 for vals in _split_delta(ints, order, DEFAULT_INTERVAL)]
+        widths = [(c.k, FLAG_ZIGZAG if c.zigzag else 0, c.base) for c in parts]
+        params = struct.pack(DELTA_PARAMS_FMT, order, DEFAULT_INTERVAL, *chain.from_iterable(widths))
+        return [params] + [words_to_bytes(c.words) for c in parts]
+    return pack
+
+
+def _open_delta(n: int, sections):
+    if len(sections) == 2 and not sections[0]:
+        return _open_legacy(DeltaReader, n, sections)
+    if len(sections) != 4:
+        raise ValueError("Corrupted container sections")
+    order, interval, *flat = struct.unpack(DELTA_PARAMS_FMT, sections[0])
+    widths = [(k, base, bool(flags & FLAG_ZIGZAG)) for k, flags, base in zip(*[iter(flat)] * 3)]
+    return DeltaReader.from_sections(n, order, interval, widths, sections[1:])
+
+
+# --- overflow a rang : k', k_over, flags, base, nb d'exceptions puis index, slots, exceptions ---
+RANK_PARAMS_FMT = "<BBBqQ"
+
+
+def _pack_rank(ints: List[int]) -> List[bytes]:
+    (kprime, k_over, zigzag, base, m), sections = rank_sections(ints)
+    params = struct.pack(RANK_PARAMS_FMT, kprime, k_over, FLAG_ZIGZAG if zigzag else 0, base, m)
+    return [params] + sections
+
+
+def _open_rank(n: int, sections):
+    if len(sections) != 4:
+        raise ValueError("Corrupted container sections")
+    kprime, k_over, flags, base, m = struct.unpack(RANK_PARAMS_FMT, sections[0])
+    return RankOverflowReader.from_sections(n, kprime, k_over, bool(flags & FLAG_ZIGZAG), base, m,
+                                            sections[1:])
+
+
+# --- blocked : taille de bloc, puis (mot de debut, k, flags, base) par bloc et les mots ---
+BLOCKED_PARAMS_FMT = "<I"
+BLOCKED_DIR_FMT = "<QBBq"
+BLOCKED_DIR_SIZE = struct.calcsize(BLOCKED_DIR_FMT)
+
+
+def _pack_blocked(ints: List[int], block_size: int = BLOCKED_BLOCK_SIZE) -> List[bytes]:
+    if not 0 < block_size < (1 << 32):
+        raise ValueError("block_size must be in [1, 2**32)")
+    directory = bytearray()
+    words = bytearray()
+    for comp in BitPackingBlocked.from_list(ints, block_size).blocks:
+        directory += struct.pack(BLOCKED_DIR_FMT, len(words) // 4, comp.k,
+                                 FLAG_ZIGZAG if comp.zigzag else 0, comp.base)
+        words += words_to_bytes(comp.words)
+    return [struct.pack(BLOCKED_PARAMS_FMT, block_size), bytes(directory), bytes(words)]
+
+
+class _BlockedView(BatchAccessMixin):
+    # blocs crossing avec chacun leur k et leur base, lus sur place
+
+    def __init__(self, n: int, sections):
+        if len(sections) != 3:
+            raise ValueError("Corrupted container sections")
+        self.block_size, = struct.unpack(BLOCKED_PARAMS_FMT, sections[0])
+        self.n = n
+        self._dir, self._words = sections[1], sections[2]
+        if not self.block_size or len(self._dir) != -(-n // self.block_size) * BLOCKED_DIR_SIZE:
+            raise ValueError("Corrupted block directory")
+        for b, (woff, k, _, _) in enumerate(struct.iter_unpack(BLOCKED_DIR_FMT, self._dir)):
+            count = min(self.block_size, n - b * self.block_size)
+            if 4 * woff + 4 * words_needed(count * k) > len(self._words):
+                raise ValueError("Words section too short for n values")
+
+    def _entry(self, b: int):
+        woff, k, flags, base = struct.unpack_from(BLOCKED_DIR_FMT, self._dir, b * BLOCKED_DIR_SIZE)
+        return 32 * woff, k, base, bool(flags & FLAG_ZIGZAG)
+
+    def get(self, i: int) -> int:
+        if not 0 <= i < self.n:
+            raise IndexError("index out of range")
+        b, j = divmod(i, self.block_size)
+        start, k, base, zigzag = self._entry(b)
+        return restore(read_bits(self._words, start + j * k, k), base, zigzag)
+
+    def _decode_run(self, start: int, count: int) -> List[int]:
+        out: List[int] = []
+        while count > 0:
+            b, j = divmod(start, self.block_size)
+            take = min(count, self.block_size - j)
+            bit, k, base, zigzag = self._entry(b)
+            out += from_unsigned(BitReader(self._words, bit + j * k).read_many(take, k), base, zigzag)
+            start += take
+            count -= take
+        return out
+
+    def close(self) -> None:
+        pass
+
+
+# --- segmented : codec des segments, puis (n, octets) par segment et leurs binaires ---
+# chaque segment garde l'en-tete de son codec (n sur 32 bits : segment_size < 2**32)
+SEGMENTED_PARAMS_FMT = "<B"
+SEGMENT_ENTRY_FMT = "<QQ"
+
+
+def _pack_segmented(ints: List[int], inner: str = "crossing", jobs: Optional[int] = None,
+                    segment_size: Optional[int] = None, speed_weight: float = 0.0) -> List[bytes]:
+    segs, payloads = compress_segments(ints, inner, jobs, segment_size, speed_weight)
+    sizes = b"".join(struct.pack(SEGMENT_ENTRY_FMT, b - a, len(p)) for (a, b), p in zip(segs, payloads))
+    return [struct.pack(SEGMENTED_PARAMS_FMT, SEG_CODECS.index(inner)), sizes, b"".join(payloads)]
+
+
+def _open_segmented(n: int, sections):
+    if len(sections) != 3 or len(sections[1]) % struct.calcsize(SEGMENT_ENTRY_FMT):
+        raise ValueError("Corrupted container sections")
+    inner, = struct.unpack(SEGMENTED_PARAMS_FMT, sections[0])
+    if inner >= len(SEG_CODECS):
+        raise ValueError("Corrupted container sections")
+    return SegmentedReader.from_sections(SEG_CODECS[inner], n,
+                                         struct.iter_unpack(SEGMENT_ENTRY_FMT, sections[1]), sections[2])
+
+
+def _open_legacy(reader_cls, n: int, sections):
+    # premiers conteneurs PFOR / delta : parametres vides, binaire complet en section 1
+    reader = reader_cls(sections[1])
+    if reader.n != n:
+        raise ValueError("Corrupted container: n mismatch")
+    return reader
+
+
+def _register_builtins() -> None:
+    for codec_id, mode in enumerate(["crossing", "non_crossing", "vertical"]):
+        register_codec(mode, codec_id, _pack_fixed(mode),
+                       lambda n, sections, mode=mode: _FixedView(mode, n, sections))
+    register_codec("overflow", 3, _pack_overflow, _open_overflow)
+    register_codec("pfor", 4, _pack_pfor, _open_pfor)
+    register_codec("delta", 5, _pack_delta(1), _open_delta)
+    register_codec("delta2", 6, _pack_delta(2), _open_delta)
+    register_codec("overflow_rank", 7, _pack_rank, _open_rank)
+    register_codec("blocked", 8, _pack_blocked, _BlockedView)
+    register_codec("segmented", 9, _pack_segmented, _open_segmented)
+
+
+_register_builtins()
+
+
+def _block_crcs(section, block_bytes: int) -> List[int]:
+    with memoryview(section) as view:
+        return [crc32c(view[a : a + block_bytes]) for a in range(0, len(view), block_bytes)]
+
+
+def pack_container(codec: str, ints: List[int], block_crc: bool = False,
+                   block_bytes: int = DEFAULT_CRC_BLOCK, **options) -> bytes:
+    """Conteneur BPC1 : en-tete, sections du codec, table des sections avec CRC32C, pied.
+
+    options : parametres du pack du codec (block_size pour blocked ; inner, jobs,
+    segment_size, speed_weight pour segmented).
+    """
+    if codec == "auto":
+        codec = choose_codec(ints)
+    if codec not in REGISTRY:
+        raise ValueError(f"Unknown mode: {codec}")
+    if block_crc and block_bytes <= 0:
+        raise ValueError("block_bytes must be > 0")
+    codec_id, pack, _ = REGISTRY[codec]
+    sections = pack(ints, **options)
+    head = struct.pack(HEADER_FMT, MAGIC, VERSION, FLAG_BLOCK_CRC if block_crc else 0,
+                       codec_id, len(ints))
+    out = bytearray(head)
+    table = bytearray()
+    for sec in sections:
+        table += struct.pack(ENTRY_FMT, len(out), len(sec), crc32c(sec))
+        out += sec
+    if block_crc:
+        # CRC par bloc de chaque section, a la suite des entrees de la table
+        for sec in sections:
+            crcs = _block_crcs(sec, block_bytes)
+            table += struct.pack(f"<{len(crcs)}I", *crcs)
+    table_off = len(out)
+    out += table
+    check = crc32c(table, crc32c(head))
+    out += struct.pack(FOOTER_FMT, table_off, len(sections), block_bytes if block_crc else 0,
+                       check, FOOTER_MAGIC)
+    return bytes(out)
+
+
+def save_container(path: str, codec: str, ints: List[int], block_crc: bool = False) -> None:
+    with open(path, "wb") as f:
+        f.write(pack_container(codec, ints, block_crc))
+
+
+class ContainerReader(MappedBlobReader):
+    """Lecteur paresseux d'un conteneur BPC1 : en-tete, pied et table lus a l'ouverture,
+    sections lues a la demande, CRC verifies sur demande (section ou bloc par bloc)."""
+
+    def __init__(self, data, verify: bool = False):
+        if len(data) < HEADER_SIZE + FOOTER_SIZE:
+            raise ValueError("File too short or corrupted")
+        magic, version, flags, codec_id, n = struct.unpack_from(HEADER_FMT, data)
+        if magic != MAGIC:
+            raise ValueError("Bad magic")
+        if version != VERSION:
+            raise ValueError(f"Bad version: {version}")
+        table_off, nsec, block_bytes, check, end = struct.unpack_from(
+            FOOTER_FMT, data, len(data) - FOOTER_SIZE)
+        if end != FOOTER_MAGIC:
+            raise ValueError("Missing container footer")
+        table_end = len(data) - FOOTER_SIZE
+        if not HEADER_SIZE <= table_off <= table_end:
+            raise ValueError("Corrupted container footer")
+        # la table est petite : on la copie, seules les sections restent des vues
+        table = bytes(data[table_off:table_end])
+        if crc32c(table, crc32c(bytes(data[:HEADER_SIZE]))) != check:
+            raise ValueError("CRC mismatch in container header or table")
+        if codec_id not in _BY_ID:
+            raise ValueError(f"Unknown codec id: {codec_id}")
+        self.data = data
+        self.codec, self.n, self.flags = _BY_ID[codec_id], n, flags
+        self.block_bytes = block_bytes if flags & FLAG_BLOCK_CRC else 0
+
+        if len(table) < nsec * ENTRY_SIZE:
+            raise ValueError("Corrupted section table")
+        self._entries = [struct.unpack_from(ENTRY_FMT, table, j * ENTRY_SIZE) for j in range(nsec)]
+        pos = nsec * ENTRY_SIZE
+        self._block_crc: List[List[int]] = []
+        for off, size, _ in self._entries:
+            if off < HEADER_SIZE or off + size > table_off:
+                raise ValueError("Corrupted section table")
+            if self.block_bytes:
+                count = -(-size // self.block_bytes)
+                if pos + 4 * count > len(table):
+                    raise ValueError("Corrupted section table")
+                self._block_crc.append(list(struct.unpack_from(f"<{count}I", table, pos)))
+                pos += 4 * count
+        if pos != len(table):
+            raise ValueError("Corrupted section table")
+
+        self._view = memoryview(data)
+        self._sections = [self._view[off : off + size] for off, size, _ in self._entries]
+        self._inner = None
+        try:
+            if verify:
+                self.verify()
+            self._inner = REGISTRY[self.codec][2](n, self._sections)
+        except ValueError:
+            self.close()
+            raise
+
+    @classmethod
+    def open(cls, path: str, verify: bool = False) -> "ContainerReader":
+        return super().open(path, verify)
+
+    def verify_section(self, j: int) -> None:
+        if crc32c(self._sections[j]) != self._entries[j][2]:
+            raise ValueError(f"CRC mismatch in section {j}")
+
+    def corrupt_blocks(self, j: Optional[int] = None) -> List[Tuple[int, int]]:
+        """(section, bloc) dont le CRC ne correspond pas ; sans CRC par bloc, la section entiere."""
+        bad = []
+        for s in range(len(self._sections)) if j is None else [j]:
+            if not self.block_bytes:
+                if crc32c(self._sections[s]) != self._entries[s][2]:
+                    bad.append((s, 0))
+                continue
+            crcs = _block_crcs(self._sections[s], self.block_bytes)
+            bad += [(s, b) for b, (c, want) in enumerate(zip(crcs, self._block_crc[s])) if c != want]
+        return bad
+
+    def verify(self) -> None:
+        for j in range(len(self._sections)):
+            self.verify_section(j)
+
+    def get(self, i: int) -> int:
+        return self._inner.get(i)
+
+    def _decode_run(self, start: int, count: int) -> List[int]:
+        return self._inner._decode_run(start, count)
+
+    def _views(self):
+        return [self._inner, *self._sections, self._view]
+
+
+def is_container_file(path: str) -> bool:
+    return has_magic(path, MAGIC)
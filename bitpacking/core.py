@@ -1,5 +1,58 @@
-﻿WORD_BITS = 32
+﻿import sys
+from array import array
+from functools import lru_cache
+from itertools import chain, islice, starmap
+from operator import lshift
+from typing import Iterable, List, MutableSequence, Tuple
+
+WORD_BITS = 32
 WORD_MASK = 0xFFFFFFFF
+# typecode d'un mot non signe de 32 bits sur la plateforme courante
+WORD_TYPECODE = "I" if array("I").itemsize == 4 else "L"
+
+Words = MutableSequence[int]
+
+# reference stockee dans les en-tetes : flags (bit 0 = zigzag) puis base sur 64 bits signes
+FLAG_ZIGZAG = 1
+INT64_MIN = -(1 << 63)
+INT64_MAX = (1 << 63) - 1
+
+
+def new_words(count: int = 0) -> array:
+    return array(WORD_TYPECODE, bytes(4 * count))
+
+
+def as_words(words: Iterable[int]) -> array:
+    # les mots restent sur 4 octets au lieu d'un int Python par mot
+    if isinstance(words, array) and words.typecode == WORD_TYPECODE:
+        return words
+    return array(WORD_TYPECODE, words)
+
+
+def words_to_bytes(words: array) -> bytes:
+    if sys.byteorder == "big":
+        words = array(WORD_TYPECODE, words)
+        words.byteswap()
+    return words.tobytes()
+
+
+def words_view(words):
+    # octets little-endian des mots, sans copie sur une machine little-endian
+    if not isinstance(words, array):
+        words = as_words(words)
+    if sys.byteorder == "big":
+        return words_to_bytes(words)
+    return memoryview(words).cast("B")
+
+
+def words_from_bytes(data) -> array:
+    if len(data) % 4:
+        raise ValueError("word buffer length must be a multiple of 4")
+    words = array(WORD_TYPECODE)
+    words.frombytes(data)
+    if sys.byteorder == "big":
+        words.byteswap()
+    return words
 
 
 def words_needed(total_bits: int) -> int:
@@ -9,14 +62,14 @@ def words_needed(total_bits: int) -> int:
     return (total_bits + WORD_BITS - 1) // WORD_BITS
 
 
-def _ensure_words_capacity(words: list[int], total_bits: int) -> None:
+def _ensure_words_capacity(words: Words, total_bits: int) -> None:
     
     needed = words_needed(total_bits)
     if needed > len(words):
         words.extend([0] * (needed - len(words)))
 
 
-def pack_bits(words: list[int], start_bit: int, value: int, width: int) -> None:
+def pack_bits(words: Words, start_bit: int, value: int, width: int) -> None:
    
     if width < 0:
         raise ValueError("width must be >= 0")
@@ -47,32 +100,207 @@ def pack_bits(words: list[int], start_bit: int, value: int, width: int) -> None:
         remaining -= chunk
 
 
-def unpack_bits(words: list[int], start_bit: int, width: int) -> int:
-    
+def unpack_bits(words: Words, start_bit: int, width: int) -> int:
+    # mots au-dela de la fin lus comme des zeros
     if width < 0:
         raise ValueError("width must be >= 0")
     if width == 0:
         return 0
+    wi = start_bit >> 5
+    off = start_bit & 31
+    mask = (1 << width) - 1
+    if off + width <= WORD_BITS:
+        return (words[wi] >> off) & mask if wi < len(words) else 0
+    if off + width <= 2 * WORD_BITS and wi + 1 < len(words):
+        return ((words[wi] | words[wi + 1] << WORD_BITS) >> off) & mask
+    v = 0
+    for j, w in enumerate(words[wi : (start_bit + width + WORD_BITS - 1) >> 5]):
+        v |= w << (j << 5)
+    return (v >> off) & mask
 
-    pos = start_bit
-    remaining = width
-    out = 0
-    shift = 0
 
-    while remaining > 0:
-        wi = pos // WORD_BITS
-        bo = pos % WORD_BITS
-        chunk = min(remaining, WORD_BITS - bo)
+def read_bits(buf, start_bit: int, width: int) -> int:
+    # buf : octets little-endian (bytes, memoryview, mmap) d'un flux de mots
+    if width == 0:
+        return 0
+    lo = start_bit >> 3
+    hi = (start_bit + width + 7) >> 3
+    return (int.from_bytes(buf[lo:hi], "little") >> (start_bit & 7)) & ((1 << width) - 1)
 
-        if wi >= len(words):
-            piece = 0
-        else:
-            lowmask = (1 << chunk) - 1
-            piece = (words[wi] >> bo) & lowmask
 
-        out |= (piece << shift)
-        pos += chunk
-        shift += chunk
-        remaining -= chunk
+def zigzag_encode(v: int) -> int:
+    # 0, -1, 1, -2, 2 ... -> 0, 1, 2, 3, 4 ...
+    return v << 1 if v >= 0 else ~(v << 1)
+
+
+def zigzag_decode(u: int) -> int:
+    return (u >> 1) ^ -(u & 1)
+
+
+def _width(x: int) -> int:
+    return max(1, x.bit_length())
+
+
+def choose_reference(lo: int, hi: int, zigzag: bool = False) -> Tuple[int, bool]:
+    """(base, zigzag) qui ramene [lo, hi] a des entiers >= 0 sur le moins de bits."""
+    if zigzag:
+        return 0, True
+    if lo < 0 or _width(hi - lo) < _width(hi):
+        if lo < INT64_MIN:
+            # base hors de l'en-tete : zigzag couvre tous les entiers
+            return 0, True
+        if lo <= INT64_MAX:
+            return lo, False
+    return 0, False
+
+
+def to_unsigned(vals: List[int], base: int, zigzag: bool) -> List[int]:
+    if base:
+        vals = [v - base for v in vals]
+    if zigzag:
+        return [v << 1 if v >= 0 else ~(v << 1) for v in vals]
+    return vals
+
+
+def from_unsigned(vals: List[int], base: int, zigzag: bool) -> List[int]:
+    if zigzag:
+        return [((u >> 1) ^ -(u & 1)) + base for u in vals]
+    if base:
+        return [u + base for u in vals]
+    return vals
+
+
+def restore(u: int, base: int, zigzag: bool) -> int:
+    if zigzag:
+        u = (u >> 1) ^ -(u & 1)
+    return u + base
+
+
+# valeurs traitees par paquet : 32 champs de largeur w remplissent exactement w mots
+GROUP = 32
+# largeurs ou le decodeur genere bat la lecture par grand entier (mesure, CPython 3.11)
+GROUP_WIDTHS = frozenset(range(1, 25)) | {32}
+
+
+def _group_source(k: int) -> str:
+    mask = (1 << k) - 1
+    fields = []
+    for i in range(GROUP):
+        w, off = divmod(i * k, WORD_BITS)
+        expr = f"w{w} >> {off}" if off else f"w{w}"
+        if off + k > WORD_BITS:
+            # la fin du champ est en bas du mot suivant
+            expr = f"{expr} | (w{w + 1} & {(1 << (off + k - WORD_BITS)) - 1}) << {WORD_BITS - off}"
+        elif off + k < WORD_BITS:
+            expr = f"{expr} & {mask}"
+        fields.append(expr)
+    args = ", ".join(f"w{j}" for j in range(k))
+    return f"def unpack_{k}({args}):\n    return ({', '.join(fields)})\n"
+
+
+@lru_cache(maxsize=None)
+def group_decoder(k: int):
+    """(w0, ..., w{k-1}) -> les 32 valeurs de k bits de ces k mots, sans boucle ni test."""
+    if not 1 <= k <= WORD_BITS:
+        raise ValueError("group decoders need 1 <= k <= 32")
+    namespace = {}
+    exec(compile(_group_source(k), f"<unpack_{k}>", "exec"), namespace)
+    return namespace[f"unpack_{k}"]
+
+
+class BitWriter:
+    """Ecrit des champs de largeur fixe bout a bout dans un flux de mots de 32 bits."""
+
+    def __init__(self):
+        self._buf = bytearray()
+        self._acc = 0
+        self._nbits = 0
+
+    def _push(self, bits: int, width: int) -> None:
+        self._acc |= bits << self._nbits
+        self._nbits += width
+        if self._nbits >= WORD_BITS:
+            nw = self._nbits // WORD_BITS
+            nb = nw * WORD_BITS
+            self._buf += (self._acc & ((1 << nb) - 1)).to_bytes(4 * nw, "little")
+            self._acc >>= nb
+            self._nbits -= nb
+
+    def write(self, value: int, width: int) -> None:
+        if width == 0:
+            return
+        self._push(value & ((1 << width) - 1), width)
+
+    def write_many(self, values: Iterable[int], width: int) -> None:
+        # les valeurs doivent deja tenir sur width bits : un paquet de 32
+        # valeurs devient un seul entier (les champs ne se chevauchent pas)
+        if width == 0:
+            return
+        shifts = range(0, GROUP * width, width)
+        it = iter(values)
+        while True:
+            group = list(islice(it, GROUP))
+            if not group:
+                return
+            self._push(sum(map(lshift, group, shifts)), len(group) * width)
+
+    @property
+    def bit_length(self) -> int:
+        return 8 * len(self._buf) + self._nbits
+
+    def words(self) -> array:
+        data = bytes(self._buf)
+        if self._nbits:
+            data += self._acc.to_bytes(4, "little")
+        return words_from_bytes(data)
+
+
+class BitReader:
+    """Lit des champs de largeur fixe dans un flux de mots (array, liste ou octets LE)."""
+
+    def __init__(self, data, start_bit: int = 0):
+        if isinstance(data, (array, list)):
+            data = words_view(data)
+        self._data = data
+        self.pos = start_bit
+
+    def read(self, width: int) -> int:
+        value = read_bits(self._data, self.pos, width)
+        self.pos += width
+        return value
+
+    def _read_fields(self, pos: int, count: int, width: int) -> List[int]:
+        # un paquet de GROUP champs = un seul entier, decoupe par decalages
+        data = self._data
+        mask = (1 << width) - 1
+        out: List[int] = []
+        end = pos + count * width
+        step = GROUP * width
+        while pos < end:
+            nb = min(step, end - pos)
+            big = int.from_bytes(data[pos >> 3 : (pos + nb + 7) >> 3], "little") >> (pos & 7)
+            out += [(big >> s) & mask for s in range(0, nb, width)]
+            pos += nb
+        return out
 
-    return out
+    def read_many(self, count: int, width: int) -> List[int]:
+        if width == 0:
+            return [0] * count
+        pos = self.pos
+        self.pos = pos + count * width
+        if count >= 2 * GROUP and width in GROUP_WIDTHS and sys.byteorder == "little":
+            # quelques champs jusqu'a un debut de mot, puis des paquets de width mots
+            head = next((i for i in range(GROUP) if (pos + i * width) & 31 == 0), None)
+            if head is not None:
+                groups = (count - head) // GROUP
+                lo = (pos + head * width) >> 3
+                hi = lo + 4 * width * groups
+                if hi <= len(self._data):
+                    out = self._read_fields(pos, head, width)
+                    with memoryview(self._data)[lo:hi].cast(WORD_TYPECODE) as words:
+                        out += chain.from_iterable(starmap(group_decoder(width),
+                                                           zip(*[iter(words)] * width)))
+                    done = head + groups * GROUP
+                    out += self._read_fields(pos + done * width, count - done, width)
+                    return out
+        return self._read_fields(pos, count, width)
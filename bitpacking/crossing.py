@@ -1,17 +1,26 @@
 ﻿from __future__ import annotations
 from typing import List
-from .core import pack_bits, unpack_bits, words_needed, WORD_BITS, WORD_MASK
+from .access import BatchAccessMixin
+from .core import (
+    unpack_bits, new_words, as_words, choose_reference, to_unsigned, from_unsigned, restore,
+    BitReader, BitWriter, Words, WORD_BITS
+)
+from .mutable import MutableMixin
+from .query import QueryMixin
 
-class BitPackingCrossing:
+class BitPackingCrossing(QueryMixin, MutableMixin, BatchAccessMixin):
     
-    def __init__(self, k: int, n: int, words: List[int]):
+    def __init__(self, k: int, n: int, words: Words, base: int = 0, zigzag: bool = False):
         if k < 0:
             raise ValueError("k must be >= 0")
         if n < 0:
             raise ValueError("n must be >= 0")
         self.k = k
         self.n = n
-        self.words = words
+        self.words = as_words(words)
+        # valeur stockee = v - base (puis zigzag) : toujours >= 0
+        self.base = base
+        self.zigzag = zigzag
 
     @staticmethod
     def _compute_k(ints: List[int]) -> int:
@@ -19,23 +28,20 @@ class BitPackingCrossing:
             return 0
         mx = max(ints)
         if mx < 0:
-            raise ValueError("Negative values not supported yet (will be in bonus).")
+            raise ValueError("Negative values need a frame of reference")
         return max(1, mx.bit_length())
 
     @classmethod
-    def from_list(cls, ints: List[int]) -> "BitPackingCrossing":
+    def from_list(cls, ints: List[int], zigzag: bool = False) -> "BitPackingCrossing":
         n = len(ints)
         if n == 0:
-            return cls(k=0, n=0, words=[])
-        k = cls._compute_k(ints)
-        words: List[int] = []
-        for i, x in enumerate(ints):
-            if x < 0:
-                raise ValueError("Negative values not supported yet (will be in bonus).")
-            if x >= (1 << k):
-                raise ValueError(f"value {x} does not fit in k={k} bits")
-            pack_bits(words, start_bit=i * k, value=x, width=k)
-        return cls(k=k, n=n, words=words)
+            return cls(k=0, n=0, words=new_words())
+        base, zigzag = choose_reference(min(ints), max(ints), zigzag)
+        vals = to_unsigned(ints, base, zigzag)
+        k = cls._compute_k(vals)
+        writer = BitWriter()
+        writer.write_many(vals, k)
+        return cls(k=k, n=n, words=writer.words(), base=base, zigzag=zigzag)
 
     def get(self, i: int) -> int:
         if i < 0 or i >= self.n:
@@ -43,7 +49,27 @@ class BitPackingCrossing:
         if self.k == 0:
             # tableau vide
             return 0
-        return unpack_bits(self.words, start_bit=i * self.k, width=self.k)
+        return restore(unpack_bits(self.words, start_bit=i * self.k, width=self.k), self.base, self.zigzag)
+
+    def _decode_run(self, start: int, count: int) -> List[int]:
+        vals = BitReader(self.words, start * self.k).read_many(count, self.k)
+        return from_unsigned(vals, self.base, self.zigzag)
 
     def to_list(self) -> List[int]:
-        return [self.get(i) for i in range(self.n)]
+        return self._decode_run(0, self.n)
+
+    def _layout(self):
+        # champs contigus de k bits depuis le bit 0
+        return 1, self.k, 0
+
+    def _start_bit(self, i: int) -> int:
+        return i * self.k
+
+    def _append_run(self, vals: List[int]) -> None:
+        # le mot entame est relu puis reecrit avec les nouvelles valeurs a la suite
+        w0, off = divmod(self.n * self.k, WORD_BITS)
+        writer = BitWriter()
+        if off:
+            writer.write(self.words[w0], off)
+        writer.write_many(vals, self.k)
+        self.words[w0:] = writer.words()
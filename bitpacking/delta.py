@@ -0,0 +1,221 @@
+﻿from __future__ import annotations
+import struct
+from itertools import accumulate, islice
+from typing import List, Tuple
+
+from .access import BatchAccessMixin, BlobPacker, MappedBlobReader, has_magic
+from .core import read_bits, words_needed, from_unsigned, restore, BitReader
+from .factory import CompressorFactory, dumps_binary, read_header
+from .overflow import BitPackerOverflow, OverflowReader
+
+MAGIC = b"BPD1"
+VERSION = 1
+# magic, version, ordre (1 = delta, 2 = delta de delta), codec des residus, n, intervalle,
+# puis la taille en octets des sections : checkpoints, deltas aux checkpoints, residus
+HEADER_FMT = "<4sBBBQIQQQ"
+HEADER_SIZE = struct.calcsize(HEADER_FMT)
+
+# un checkpoint absolu toutes les 128 valeurs : get(i) somme au plus 127 residus
+DEFAULT_INTERVAL = 128
+INNER_CODECS = ["crossing", "overflow"]
+ORDERS = {"delta": 1, "delta2": 2}
+
+
+def _diffs(vals: List[int]) -> List[int]:
+    return [b - a for a, b in zip(vals, islice(vals, 1, None))]
+
+
+def _split(ints: List[int], order: int, interval: int) -> Tuple[List[int], List[int], List[int]]:
+    """(checkpoints, deltas aux checkpoints, residus hors checkpoints)."""
+    checkpoints = ints[::interval]
+    if order == 1:
+        res = _diffs(ints)
+        deltas: List[int] = []
+    else:
+        d = _diffs(ints)
+        # delta fictif avant la premiere valeur : on reprend le suivant, le residu vaut 0
+        d.insert(0, d[0] if d else 0)
+        deltas = d[::interval]
+        res = _diffs(d)
+    # le residu de i est en res[i - 1] : on retire ceux des checkpoints
+    del res[interval - 1 :: interval]
+    return checkpoints, deltas, res
+
+
+def _pack_crossing(vals: List[int]) -> bytes:
+    comp = CompressorFactory.create_from_list("crossing", vals)
+    return dumps_binary("crossing", comp.k, comp.n, comp.words, comp.base, comp.zigzag)
+
+
+def compress_delta(ints: List[int], order: int = 1, interval: int = DEFAULT_INTERVAL,
+                   inner: str = "crossing") -> bytes:
+    """Residus (delta ou delta de delta) packes + table de checkpoints absolus."""
+    sections = delta_sections(ints, order, interval, inner)
+    head = struct.pack(HEADER_FMT, MAGIC, VERSION, order, INNER_CODECS.index(inner), len(ints),
+                       interval, *map(len, sections))
+    return head + b"".join(sections)
+
+
+def delta_sections(ints: List[int], order: int = 1, interval: int = DEFAULT_INTERVAL,
+                   inner: str = "crossing") -> List[bytes]:
+    """Les trois sections sans l'en-tete BPD1 : checkpoints, deltas aux checkpoints, residus."""
+    if order not in (1, 2):
+        raise ValueError("order must be 1 or 2")
+    if inner not in INNER_CODECS:
+        raise ValueError(f"Unknown mode: {inner}")
+    if not 1 < interval < (1 << 32):
+        raise ValueError("interval must be in [2, 2**32)")
+    checkpoints, deltas, res = _split(ints, order, interval)
+    return [
+        _pack_crossing(checkpoints),
+        _pack_crossing(deltas) if order == 2 else b"",
+        BitPackerOverflow().compress(res) if inner == "overflow" else _pack_crossing(res),
+    ]
+
+
+class _CrossingView(BatchAccessMixin):
+    # section BPK1/BPK2 crossing lue sur place (bytes, memoryview ou mmap)
+
+    def __init__(self, buf):
+        mode, self.k, self.n, wlen, self.base, self.zigzag, off = read_header(buf)
+        if mode != "crossing" or len(buf) < off + 4 * wlen:
+            raise ValueError("Corrupted delta section")
+        self._words = buf[off : off + 4 * wlen]
+
+    @classmethod
+    def from_words(cls, k: int, n: int, base: int, zigzag: bool, words) -> "_CrossingView":
+        # mots seuls, parametres et n (64 bits) venus d'ailleurs (cf. container.py)
+        if len(words) < 4 * words_needed(n * k):
+            raise ValueError("Corrupted delta section")
+        self = cls.__new__(cls)
+        self.k, self.n, self.base, self.zigzag = k, n, base, zigzag
+        self._words = words
+        return self
+
+    def get(self, i: int) -> int:
+        return restore(read_bits(self._words, i * self.k, self.k), self.base, self.zigzag)
+
+    def _decode_run(self, start: int, count: int) -> List[int]:
+        vals = BitReader(self._words, start * self.k).read_many(count, self.k)
+        return from_unsigned(vals, self.base, self.zigzag)
+
+    def close(self) -> None:
+        if isinstance(self._words, memoryview):
+            self._words.release()
+
+
+class DeltaReader(MappedBlobReader):
+    """Lecteur delta : get(i) = checkpoint du bloc + somme d'au plus interval - 1 residus."""
+
+    def __init__(self, blob):
+        if len(blob) < HEADER_SIZE:
+            raise ValueError("File too short or corrupted")
+        magic, version, order, inner, n, interval, *sizes = struct.unpack_from(HEADER_FMT, blob)
+        if magic != MAGIC:
+            raise ValueError("Bad magic/version")
+        if version != VERSION:
+            raise ValueError(f"Bad version: {version}")
+        if order not in (1, 2) or inner >= len(INNER_CODECS) or interval < 2:
+            raise ValueError("Corrupted delta header")
+        if len(blob) < HEADER_SIZE + sum(sizes):
+            raise ValueError("Truncated delta blob")
+        self.blob = blob
+        self._view = memoryview(blob)
+        off = HEADER_SIZE
+        views = []
+        for size in sizes:
+            views.append(self._view[off : off + size])
+            off += size
+        self._sections = views
+        res = OverflowReader(views[2]) if inner == 1 else _CrossingView(views[2])
+        self._attach(n, order, INNER_CODECS[inner], interval, _CrossingView(views[0]),
+                     _CrossingView(views[1]) if order == 2 else None, res)
+
+    @classmethod
+    def from_sections(cls, n: int, order: int, interval: int, widths, sections) -> "DeltaReader":
+        """Lecteur sur les mots des checkpoints, deltas et residus (crossing) deja separes,
+        widths = leurs (k, base, zigzag) ; sans en-tete BPD1 (cf. container.py)."""
+        if order not in (1, 2) or interval < 2 or len(sections) != 3 or len(widths) != 3:
+            raise ValueError("Corrupted delta sections")
+        nblocks = -(-n // interval)
+        counts = [nblocks, nblocks if order == 2 else 0, n - nblocks]
+        parts = [_CrossingView.from_words(k, c, base, zz, words) if j != 1 or order == 2 else None
+                 for j, ((k, base, zz), c, words) in enumerate(zip(widths, counts, sections))]
+        self = cls.__new__(cls)
+        self.blob = None
+        self._view = memoryview(b"")
+        self._sections = []
+        self._attach(n, order, "crossing", interval, *parts)
+        return self
+
+    @property
+    def codec(self) -> str:
+        return "delta" if self.order == 1 else "delta2"
+
+    def _attach(self, n: int, order: int, inner: str, interval: int, checkpoints, deltas,
+                res) -> None:
+        self.n, self.order, self.interval, self.inner = n, order, interval, inner
+        self._checkpoints, self._deltas, self._res = checkpoints, deltas, res
+        nblocks = -(-n // interval)
+        if self._checkpoints.n != nblocks or self._res.n != n - nblocks:
+            raise ValueError("Corrupted delta sections")
+
+    def _block(self, b: int, first: int, res: List[int]) -> List[int]:
+        # valeurs du bloc b a partir du checkpoint, res = ses residus deja decodes
+        if self.order == 1:
+            return list(accumulate(res, initial=first))
+        d = accumulate(res, initial=self._deltas.get(b))
+        next(d)
+        return list(accumulate(d, initial=first))
+
+    def get(self, i: int) -> int:
+        if not 0 <= i < self.n:
+            raise IndexError("index out of range")
+        b, j = divmod(i, self.interval)
+        first = self._checkpoints.get(b)
+        if j == 0:
+            return first
+        res = self._res._decode_run(i - b - j, j)
+        if self.order == 1:
+            return first + sum(res)
+        return self._block(b, first, res)[-1]
+
+    def _decode_run(self, start: int, count: int) -> List[int]:
+        if count <= 0:
+            return []
+        step = self.interval - 1
+        b0 = start // self.interval
+        stop = start + count
+        b1 = (stop - 1) // self.interval
+        # residus contigus de tous les blocs touches : un seul passage
+        r0 = b0 * step
+        res = self._res._decode_run(r0, stop - b1 - 1 - r0)
+        firsts = self._checkpoints._decode_run(b0, b1 - b0 + 1)
+        out: List[int] = []
+        for b, first in enumerate(firsts, b0):
+            lo = (b - b0) * step
+            out += self._block(b, first, res[lo : lo + step])
+        off = start - b0 * self.interval
+        return out[off : off + count]
+
+    def _views(self):
+        return [self._checkpoints, self._deltas, self._res, *self._sections, self._view]
+
+
+class BitPackingDelta(BlobPacker):
+
+    reader_cls = DeltaReader
+
+    def __init__(self, blob: bytes):
+        super().__init__(blob)
+        self.order = self._reader.order
+        self.interval = self._reader.interval
+
+    @classmethod
+    def from_list(cls, ints: List[int], order: int = 1, interval: int = DEFAULT_INTERVAL,
+                  inner: str = "crossing") -> "BitPackingDelta":
+        return cls(compress_delta(ints, order, interval, inner))
+
+
+def is_delta_file(path: str) -> bool:
+    return has_magic(path, MAGIC)
@@ -4,82 +4,170 @@ import struct
 
 from .crossing import BitPackingCrossing
 from .noncrossing import BitPackingNonCrossing
-from .core import WORD_BITS
+from .core import as_words, words_to_bytes, words_from_bytes, Words, FLAG_ZIGZAG
 from .overflow import BitPackingOverflow
+from .vectorized import BitPackingCrossingNumpy, HAVE_NUMPY
+from .vertical import BitPackingVertical
 
 MAGIC = b"BPK1"
 MODE_CROSSING = 0
 MODE_NONCROSS = 1
+MODE_VERTICAL = 2   # blocs de 128 valeurs sur 4 voies (cf. vertical.py)
+HEADER_FMT = "<4sBHI I"
+HEADER_SIZE = struct.calcsize(HEADER_FMT)
+# meme en-tete suivi de la reference : flags puis base (valeur = stockee + base)
+MAGIC_REF = b"BPK2"
+HEADER_REF_FMT = "<4sBHIIBq"
+HEADER_REF_SIZE = struct.calcsize(HEADER_REF_FMT)
 
 
 
 class CompressorFactory:
     @staticmethod
-    def create_from_list(mode: str, ints: List[int]):
+    def create_from_list(mode: str, ints: List[int], zigzag: bool = False):
         if mode == "crossing":
-            return BitPackingCrossing.from_list(ints)
+            if HAVE_NUMPY:
+                return BitPackingCrossingNumpy.from_list(ints, zigzag)
+            return BitPackingCrossing.from_list(ints, zigzag)
         elif mode == "non_crossing":
-            return BitPackingNonCrossing.from_list(ints)
+            return BitPackingNonCrossing.from_list(ints, zigzag)
+        elif mode == "vertical":
+            return BitPackingVertical.from_list(ints, zigzag)
+        elif mode == "blocked":
+            # import local : blocked construit ses blocs via cette fabrique
+            from .blocked import BitPackingBlocked
+            return BitPackingBlocked.from_list(ints, zigzag=zigzag)
+        elif mode in ("delta", "delta2"):
+            # idem : delta range ses checkpoints et residus en crossing
+            from .delta import BitPackingDelta, ORDERS
+            return BitPackingDelta.from_list(ints, order=ORDERS[mode])
+        elif mode == "auto":
+            # codec choisi au cout sur un echantillon (cf. auto.py)
+            from .auto import BitPackingAuto
+            return BitPackingAuto.from_list(ints)
         else:
             raise ValueError(f"Unknown mode: {mode}")
 
     @staticmethod
-    def from_packed_crossing(k: int, n: int, words: List[int]) -> BitPackingCrossing:
-        return BitPackingCrossing(k=k, n=n, words=words)
+    def from_packed_crossing(k: int, n: int, words: Words, base: int = 0,
+                             zigzag: bool = False) -> BitPackingCrossing:
+        if HAVE_NUMPY:
+            return BitPackingCrossingNumpy(k=k, n=n, words=words, base=base, zigzag=zigzag)
+        return BitPackingCrossing(k=k, n=n, words=words, base=base, zigzag=zigzag)
 
     @staticmethod
-    def from_packed_noncross(k: int, n: int, words: List[int]) -> BitPackingNonCrossing:
-        
-        start_bits: List[int] = []
-        pos = 0
-        for _ in range(n):
-            bit_in_word = pos % WORD_BITS
-            if bit_in_word + k > WORD_BITS:
-                pos = ((pos // WORD_BITS) + 1) * WORD_BITS
-            start_bits.append(pos)
-            pos += k
-        return BitPackingNonCrossing(k=k, n=n, words=words, start_bits=start_bits)
+    def from_packed_noncross(k: int, n: int, words: Words, base: int = 0,
+                             zigzag: bool = False) -> BitPackingNonCrossing:
+        # positions calculees a la demande : chargement en O(1)
+        return BitPackingNonCrossing(k=k, n=n, words=words, base=base, zigzag=zigzag)
+
+    @staticmethod
+    def from_packed_vertical(k: int, n: int, words: Words, base: int = 0,
+                             zigzag: bool = False) -> BitPackingVertical:
+        return BitPackingVertical(k=k, n=n, words=words, base=base, zigzag=zigzag)
 
     @staticmethod
     def from_list_overflow(ints: List[int]) -> BitPackingOverflow:
         return BitPackingOverflow.from_list(ints)
 
 
-def save_binary(path: str, mode_str: str, k: int, n: int, words: List[int]) -> None:
+def dumps_binary(mode_str: str, k: int, n: int, words: Words, base: int = 0,
+                 zigzag: bool = False) -> bytes:
     if mode_str == "crossing":
         mode = MODE_CROSSING
     elif mode_str == "non_crossing":
         mode = MODE_NONCROSS
+    elif mode_str == "vertical":
+        mode = MODE_VERTICAL
     else:
         raise ValueError(f"Unknown mode: {mode_str}")
 
     wlen = len(words)
-    
-    header = struct.pack("<4sBHI I", MAGIC, mode, k, n, wlen)
-    body = b"".join(struct.pack("<I", w & 0xFFFFFFFF) for w in words)
+    if base or zigzag:
+        header = struct.pack(HEADER_REF_FMT, MAGIC_REF, mode, k, n, wlen,
+                             FLAG_ZIGZAG if zigzag else 0, base)
+    else:
+        # sans reference on garde l'en-tete BPK1 d'origine
+        header = struct.pack(HEADER_FMT, MAGIC, mode, k, n, wlen)
+    body = words_to_bytes(as_words(words))
+    return header + body
+
+
+def save_binary(path: str, mode_str: str, k: int, n: int, words: Words, base: int = 0,
+                zigzag: bool = False) -> None:
+    data = dumps_binary(mode_str, k, n, words, base, zigzag)
     with open(path, "wb") as f:
-        f.write(header)
-        f.write(body)
+        f.write(data)
 
 
-def load_binary(path: str) -> Tuple[str, int, int, List[int]]:
-    with open(path, "rb") as f:
-        head = f.read(4 + 1 + 2 + 4 + 4)
-        if len(head) < 15:
+def read_header(data) -> Tuple[str, int, int, int, int, bool, int]:
+    """(mode, k, n, wlen, base, zigzag, taille de l'en-tete) d'un binaire BPK1 ou BPK2."""
+    if len(data) < HEADER_SIZE:
+        raise ValueError("File too short or corrupted")
+    magic, mode, k, n, wlen = struct.unpack_from(HEADER_FMT, data)
+    if magic == MAGIC:
+        flags, base, size = 0, 0, HEADER_SIZE
+    elif magic == MAGIC_REF:
+        if len(data) < HEADER_REF_SIZE:
             raise ValueError("File too short or corrupted")
-        magic, mode, k, n, wlen = struct.unpack("<4sBHI I", head)
-        if magic != MAGIC:
-            raise ValueError("Bad magic/version")
-        words_bytes = f.read(wlen * 4)
-        if len(words_bytes) != wlen * 4:
-            raise ValueError("Truncated words section")
-        words = list(struct.unpack("<" + "I"*wlen, words_bytes))
+        flags, base = struct.unpack_from(HEADER_REF_FMT, data)[5:]
+        size = HEADER_REF_SIZE
+    else:
+        raise ValueError("Bad magic/version")
 
     if mode == MODE_CROSSING:
         mode_str = "crossing"
     elif mode == MODE_NONCROSS:
         mode_str = "non_crossing"
+    elif mode == MODE_VERTICAL:
+        mode_str = "vertical"
     else:
         raise ValueError("Unknown mode code")
 
-    return mode_str, k, n, words
+    return mode_str, k, n, wlen, base, bool(flags & FLAG_ZIGZAG), size
+
+
+def _loads(data) -> Tuple[str, int, int, Words, int, bool]:
+    mode_str, k, n, wlen, base, zigzag, off = read_header(data)
+    words_bytes = data[off : off + 4 * wlen]
+    if len(words_bytes) != wlen * 4:
+        raise ValueError("Truncated words section")
+    return mode_str, k, n, words_from_bytes(words_bytes), base, zigzag
+
+
+def loads_binary(data) -> Tuple[str, int, int, List[int]]:
+    mode_str, k, n, words, base, zigzag = _loads(data)
+    if base or zigzag:
+        # les mots seuls ne redonnent pas les valeurs
+        raise ValueError("File has a frame of reference (BPK2): use loads_binary_ref or loads_packed")
+    return mode_str, k, n, list(words)
+
+
+def load_binary(path: str) -> Tuple[str, int, int, List[int]]:
+    with open(path, "rb") as f:
+        return loads_binary(f.read())
+
+
+def loads_binary_ref(data) -> Tuple[str, int, int, Words, int, bool]:
+    """(mode, k, n, mots, base, zigzag) : les arguments de dumps_binary, BPK1 comme BPK2."""
+    return _loads(data)
+
+
+def load_binary_ref(path: str) -> Tuple[str, int, int, Words, int, bool]:
+    with open(path, "rb") as f:
+        return loads_binary_ref(f.read())
+
+
+def loads_packed(data):
+    """Reconstruit le compresseur (crossing, non-crossing ou vertical) avec sa reference."""
+    mode_str, k, n, words, base, zigzag = _loads(data)
+    if mode_str == "crossing":
+        return CompressorFactory.from_packed_crossing(k, n, words, base, zigzag)
+    if mode_str == "vertical":
+        return CompressorFactory.from_packed_vertical(k, n, words, base, zigzag)
+    return CompressorFactory.from_packed_noncross(k, n, words, base, zigzag)
+
+
+def load_packed(path: str):
+    with open(path, "rb") as f:
+        return loads_packed(f.read())
@@ -0,0 +1,78 @@
+﻿from __future__ import annotations
+from operator import index as as_index
+from typing import Iterable, List
+
+from .core import new_words, pack_bits, to_unsigned, zigzag_encode
+
+# largeur maximale donnee par la marge d'elargissement
+MAX_HEADROOM_K = 64
+
+
+class MutableMixin:
+    """append, extend et __setitem__ pour un packer a largeur k fixe.
+
+    Le packer fournit _start_bit(i) et _append_run(vals). Tant que la valeur
+    tient sur k bits (apres la reference), elle est ecrite en place ; sinon
+    tout le tableau est re-packe une seule fois, avec une marge quand k augmente.
+    """
+
+    def _stored(self, value: int) -> int:
+        u = value - self.base
+        return zigzag_encode(u) if self.zigzag else u
+
+    def _fits(self, lo: int, hi: int) -> bool:
+        # k = 0 : tableau vide, sa reference n'est pas encore choisie
+        return self.k > 0 and lo >= 0 and hi >> self.k == 0
+
+    def _repack(self, ints: List[int]) -> None:
+        # nouvelles largeur et reference, choisies par from_list comme a la construction
+        packed = type(self).from_list(ints, self.zigzag)
+        k = packed.k
+        if 0 < self.k < k < MAX_HEADROOM_K:
+            # elargissement : marge de k // 4 bits, sinon un compteur croissant
+            # re-packerait tout le tableau a chaque bit gagne
+            k = max(k, min(MAX_HEADROOM_K, self.k + max(1, self.k // 4)))
+        self.base, self.zigzag = packed.base, packed.zigzag
+        if k == packed.k:
+            self.k, self.n, self.words = packed.k, packed.n, packed.words
+            return
+        self.k, self.n, self.words = k, 0, new_words()
+        self._append_run(to_unsigned(ints, self.base, self.zigzag))
+        self.n = len(ints)
+
+    def append(self, value: int) -> None:
+        u = self._stored(value)
+        if self._fits(u, u):
+            # pack_bits agrandit les mots (croissance amortie de l'array)
+            pack_bits(self.words, self._start_bit(self.n), u, self.k)
+            self.n += 1
+            return
+        vals = self.to_list()
+        vals.append(value)
+        self._repack(vals)
+
+    def extend(self, values: Iterable[int]) -> None:
+        values = list(values)
+        if not values:
+            return
+        us = to_unsigned(values, self.base, self.zigzag)
+        if self._fits(min(us), max(us)):
+            self._append_run(us)
+            self.n += len(us)
+            return
+        # un seul re-packing pour tout le lot
+        self._repack(self.to_list() + values)
+
+    def __setitem__(self, key, value: int) -> None:
+        i = as_index(key)
+        if i < 0:
+            i += self.n
+        if i < 0 or i >= self.n:
+            raise IndexError("index out of range")
+        u = self._stored(value)
+        if self._fits(u, u):
+            pack_bits(self.words, self._start_bit(i), u, self.k)
+            return
+        vals = self.to_list()
+        vals[i] = value
+        self._repack(vals)
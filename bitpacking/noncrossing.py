@@ -1,58 +1,139 @@
 ﻿from __future__ import annotations
-from typing import List
-from .core import pack_bits, unpack_bits, WORD_BITS
+from operator import lshift
+from typing import List, Optional, Sequence
+from .access import BatchAccessMixin
+from .core import (
+    pack_bits, unpack_bits, words_needed, new_words, as_words, choose_reference, to_unsigned,
+    from_unsigned, restore, Words, WORD_BITS
+)
+from .mutable import MutableMixin
+from .query import QueryMixin
 
-class BitPackingNonCrossing:
+
+def start_bit_of(i: int, k: int) -> int:
+    # k fixe : chaque mot contient exactement 32 // k valeurs
+    if k <= WORD_BITS:
+        per = WORD_BITS // k
+        return (i // per) * WORD_BITS + (i % per) * k
+    # k > 32 : chaque valeur commence sur un nouveau mot, la premiere au mot 1
+    return WORD_BITS + i * (k // WORD_BITS + 1) * WORD_BITS
+
+
+class _StartBits:
+    # vue paresseuse : start_bits[i] calcule a la demande, sans tableau de n ints
+
+    def __init__(self, k: int, n: int):
+        self.k = k
+        self.n = n
+
+    def __len__(self) -> int:
+        return self.n
+
+    def __getitem__(self, i):
+        if isinstance(i, slice):
+            return [self[j] for j in range(*i.indices(self.n))]
+        if i < 0:
+            i += self.n
+        if i < 0 or i >= self.n:
+            raise IndexError("index out of range")
+        return start_bit_of(i, self.k)
+
+    def __iter__(self):
+        return (start_bit_of(i, self.k) for i in range(self.n))
+
+
+class BitPackingNonCrossing(QueryMixin, MutableMixin, BatchAccessMixin):
    
-    def __init__(self, k: int, n: int, words: List[int], start_bits: List[int]):
+    def __init__(self, k: int, n: int, words: Words, start_bits: Optional[Sequence[int]] = None,
+                 base: int = 0, zigzag: bool = False):
         if k < 0 or n < 0:
             raise ValueError("k and n must be >= 0")
-        if len(start_bits) != n:
+        if start_bits is not None and len(start_bits) != n:
             raise ValueError("start_bits length must equal n")
         self.k = k
         self.n = n
-        self.words = words
-        self.start_bits = start_bits
+        self.words = as_words(words)
+        self.base = base
+        self.zigzag = zigzag
+
+    @property
+    def start_bits(self) -> _StartBits:
+        return _StartBits(self.k, self.n)
 
     @staticmethod
     def _compute_k(ints: List[int]) -> int:
         if not ints: return 0
         mx = max(ints)
         if mx < 0:
-            raise ValueError("Negative values not supported yet (bonus later).")
+            raise ValueError("Negative values need a frame of reference")
         return max(1, mx.bit_length())
 
     @classmethod
-    def from_list(cls, ints: List[int]) -> "BitPackingNonCrossing":
+    def from_list(cls, ints: List[int], zigzag: bool = False) -> "BitPackingNonCrossing":
         n = len(ints)
         if n == 0:
-            return cls(k=0, n=0, words=[], start_bits=[])
-        k = cls._compute_k(ints)
-        words: List[int] = []
-        start_bits: List[int] = []
-        pos = 0  # position en bits dans le flux
-        for x in ints:
+            return cls(k=0, n=0, words=new_words())
+        base, zigzag = choose_reference(min(ints), max(ints), zigzag)
+        vals = to_unsigned(ints, base, zigzag)
+        k = cls._compute_k(vals)
+        words = new_words(words_needed(start_bit_of(n - 1, k) + k))
+        for i, x in enumerate(vals):
             if x < 0:
-                raise ValueError("Negative values not supported yet (bonus later).")
+                raise ValueError("Negative values need a frame of reference")
             if x >= (1 << k):
                 raise ValueError(f"value {x} does not fit in k={k} bits")
-
-            bit_in_word = pos % WORD_BITS
-            if bit_in_word + k > WORD_BITS:
-                pos = ((pos // WORD_BITS) + 1) * WORD_BITS  
-
-            start_bits.append(pos)
-            pack_bits(words, start_bit=pos, value=x, width=k)
-            pos += k
-        return cls(k=k, n=n, words=words, start_bits=start_bits)
+            pack_bits(words, start_bit=start_bit_of(i, k), value=x, width=k)
+        return cls(k=k, n=n, words=words, base=base, zigzag=zigzag)
 
     def get(self, i: int) -> int:
         if i < 0 or i >= self.n:
             raise IndexError("index out of range")
         if self.k == 0:
             return 0
-        s = self.start_bits[i]
-        return unpack_bits(self.words, start_bit=s, width=self.k)
+        s = start_bit_of(i, self.k)
+        return restore(unpack_bits(self.words, start_bit=s, width=self.k), self.base, self.zigzag)
+
+    def _decode_run(self, start: int, count: int) -> List[int]:
+        k = self.k
+        if k == 0 or k > WORD_BITS:
+            # get() applique deja la reference
+            return super()._decode_run(start, count)
+        # chaque mot porte exactement per valeurs : on decoupe les mots de la plage
+        per = WORD_BITS // k
+        mask = (1 << k) - 1
+        shifts = range(0, per * k, k)
+        w0 = start // per
+        w1 = (start + count - 1) // per + 1
+        vals = [(w >> s) & mask for w in self.words[w0:w1] for s in shifts]
+        off = start - w0 * per
+        return from_unsigned(vals[off : off + count], self.base, self.zigzag)
 
     def to_list(self) -> List[int]:
-        return [self.get(i) for i in range(self.n)]
+        return self._decode_run(0, self.n)
+
+    def _layout(self):
+        # meme disposition que start_bit_of : (champs par groupe, pas du groupe, premier bit)
+        k = self.k
+        if k <= WORD_BITS:
+            return WORD_BITS // k, WORD_BITS, 0
+        return 1, (k // WORD_BITS + 1) * WORD_BITS, WORD_BITS
+
+    def _start_bit(self, i: int) -> int:
+        return start_bit_of(i, self.k)
+
+    def _append_run(self, vals: List[int]) -> None:
+        k = self.k
+        if k > WORD_BITS:
+            for i, x in enumerate(vals, self.n):
+                pack_bits(self.words, start_bit_of(i, k), x, k)
+            return
+        per = WORD_BITS // k
+        shifts = range(0, per * k, k)
+        w0, r = divmod(self.n, per)
+        if r:
+            # on complete d'abord les emplacements libres du dernier mot
+            self.words[w0] |= sum(map(lshift, vals[: per - r], shifts[r:]))
+            vals = vals[per - r :]
+            w0 += 1
+        self.words[w0:] = as_words(sum(map(lshift, vals[a : a + per], shifts))
+                                   for a in range(0, len(vals), per))
@@ -1,236 +1,260 @@
-﻿from typing import List, Tuple
-import math, struct
+﻿from collections import Counter
+from itertools import count
+from typing import List, Tuple
+import struct
+
+from .access import BatchAccessMixin, MappedBlobReader
+from .core import (
+    words_to_bytes, words_from_bytes, read_bits, unpack_bits, to_unsigned, from_unsigned, restore,
+    BitReader, BitWriter, Words, FLAG_ZIGZAG, INT64_MIN, INT64_MAX
+)
+from .query import (
+    QueryMixin, check_op, combine, field_chunks, field_max, field_min, field_sum, flags,
+    ge_flags, popcount, positions
+)
 
 MAGIC = b"BPov"
 VERSION = 1
+# magic, version, n, k', idx_bits, slot_w, k_over, nb mots slots, nb mots overflow
+HEADER_FMT = "<4sBIBBBBII"
+HEADER_SIZE = struct.calcsize(HEADER_FMT)
+EMPTY_HEADER_SIZE = 9   # un tableau vide s'arrete apres n
+# version 2 : meme en-tete suivi de la reference (flags, base)
+VERSION_REF = 2
+HEADER_REF_FMT = HEADER_FMT + "Bq"
+HEADER_REF_SIZE = struct.calcsize(HEADER_REF_FMT)
 
 
 def _bits_needed(x: int) -> int:
     return 1 if x == 0 else x.bit_length()
 
 
-def _choose_kprime(vals: List[int]) -> Tuple[int, int, int, int]:
-    n = len(vals)
-    if n == 0:
-        return 1, 0, 1, 1
-    K = _bits_needed(max(vals))
+def _bitlen_histogram(vals: List[int]) -> List[int]:
+    # hist[b] = nombre de valeurs qui demandent exactement b bits (0 compte pour 1 bit)
+    counts = Counter(map(int.bit_length, vals))
+    hist = [0] * (max(1, max(counts)) + 1)
+    for b, c in counts.items():
+        hist[max(1, b)] += c
+    return hist
+
+
+def _choose_from_histogram(hist: List[int], n: int) -> Tuple[int, int, int, int, int]:
+    K = len(hist) - 1
+    # over[kp] = nombre de valeurs >= 2**kp, par sommes suffixes
+    over = [0] * (K + 1)
+    for kp in range(K - 1, 0, -1):
+        over[kp] = over[kp + 1] + hist[kp + 1]
     best_cost = None
     best = None
     for kprime in range(1, K + 1):
-        thr = 1 << kprime
-        over_vals = [v for v in vals if v >= thr]
-        overflow_count = len(over_vals)
+        overflow_count = over[kprime]
         if overflow_count == 0:
             idx_bits = 0
             k_over = 1
         else:
-            idx_bits = max(1, math.ceil(math.log2(overflow_count)))
-            k_over = _bits_needed(max(over_vals))
+            # ceil(log2(count)) exact, au moins 1 bit
+            idx_bits = max(1, (overflow_count - 1).bit_length())
+            # toute valeur en overflow a au plus K bits et la plus grande en a K
+            k_over = K
         slot_w = 1 + max(kprime, idx_bits)
         cost = n * slot_w + overflow_count * k_over
         if best_cost is None or cost < best_cost:
             best_cost = cost
-            best = (kprime, idx_bits, slot_w, k_over)
+            best = (kprime, idx_bits, slot_w, k_over, overflow_count)
     return best
 
 
-class BitPackerOverflow:
+def _parse_header(blob) -> Tuple[int, int, int, int, int, int, int, int, int, bool]:
+    if bytes(blob[:4]) != MAGIC:
+        raise ValueError("Bad magic")
+    if len(blob) < EMPTY_HEADER_SIZE:
+        raise ValueError("Blob too short or corrupted")
+    version = blob[4]
+    if version not in (VERSION, VERSION_REF):
+        raise ValueError(f"Bad version: {version}")
+    n = struct.unpack_from("<I", blob, 5)[0]
+    if n == 0:
+        return 0, 1, 0, 1, 1, 0, 0, EMPTY_HEADER_SIZE, 0, False
+    size = HEADER_SIZE if version == VERSION else HEADER_REF_SIZE
+    if len(blob) < size:
+        raise ValueError("Blob too short or corrupted")
+    flags, base = 0, 0
+    if version == VERSION_REF:
+        flags, base = struct.unpack_from("<Bq", blob, HEADER_SIZE)
+    _, _, n, kprime, idx_bits, slot_w, k_over, n_words, n_over_words = struct.unpack_from(HEADER_FMT, blob)
+    if len(blob) < size + 4 * (n_words + n_over_words):
+        raise ValueError("Truncated overflow blob")
+    return (n, kprime, idx_bits, slot_w, k_over, n_words, n_over_words, size,
+            base, bool(flags & FLAG_ZIGZAG))
+
+
+def _analyze(vals: List[int]) -> Tuple[int, int, int, int, int]:
+    if not vals:
+        return 1, 0, 1, 1, 0
+    return _choose_from_histogram(_bitlen_histogram(vals), len(vals))
+
+
+def _choose_kprime(vals: List[int]) -> Tuple[int, int, int, int]:
+    return _analyze(vals)[:4]
+
+
+def _cost(analysis: Tuple[int, int, int, int, int], n: int) -> int:
+    _, _, slot_w, k_over, m = analysis
+    return n * slot_w + m * k_over
+
+
+def _ref_cost(analysis: Tuple[int, int, int, int, int], n: int, ref: bool) -> int:
+    # la reference coute l'extension de l'en-tete
+    return _cost(analysis, n) + (8 * (HEADER_REF_SIZE - HEADER_SIZE) if ref else 0)
+
+
+def _choose_reference(arr: List[int], zigzag=None, analyze=_analyze, cost=_ref_cost):
+    """(base, zigzag, valeurs >= 0, analyse) : la variante la moins couteuse en bits.
+
+    analyze(valeurs) et cost(analyse, n, avec reference) : overflow classique par defaut.
+    """
+    lo = min(arr)
+    if zigzag:
+        candidates = [(0, True)]
+    elif lo < 0:
+        # zigzag garde petites les valeurs proches de 0, la base sert les plages decalees
+        candidates = [(0, True)] if zigzag is None else []
+        if INT64_MIN <= lo:
+            candidates.append((lo, False))
+    else:
+        candidates = [(0, False)]
+        if 0 < lo <= INT64_MAX:
+            candidates.append((lo, False))
+    best = None
+    for base, zz in candidates:
+        vals = to_unsigned(arr, base, zz)
+        analysis = analyze(vals)
+        bits = cost(analysis, len(arr), bool(base or zz))
+        if best is None or bits < best[0]:
+            best = (bits, base, zz, vals, analysis)
+    if best is None:
+        raise ValueError("Value below the 64-bit base range: use zigzag")
+    return best[1:]
+
+
+class BitPackerOverflow(BatchAccessMixin):
     
 
-    @staticmethod
-    def _emit_crossing(words: List[int], bitbuf: int, bitlen: int, bits: int, width: int):
-        if width == 0:
-            return words, bitbuf, bitlen
-        bitbuf |= (bits & ((1 << width) - 1)) << bitlen
-        bitlen += width
-        while bitlen >= 32:
-            words.append(bitbuf & 0xFFFFFFFF)
-            bitbuf >>= 32
-            bitlen -= 32
-        return words, bitbuf, bitlen
-
-    def compress(self, arr: List[int]) -> bytes:
-        n = len(arr)
-        if n == 0:
-            return MAGIC + bytes([VERSION]) + struct.pack("<I", 0)
+    def pack_sections(self, arr: List[int], zigzag=None) -> Tuple[Words, Words]:
+        """(mots des slots, mots overflow) ; l'analyse et la reference restent sur self."""
+        # zigzag : None = choisi au cout (valeurs negatives), True/False = impose
+        if not arr:
+            base, zigzag, analysis = 0, False, _analyze(arr)
+        else:
+            base, zigzag, arr, analysis = _choose_reference(arr, zigzag)
+        kprime, idx_bits, slot_w, k_over, m = analysis
+        # garde l'analyse : from_list n'a pas besoin de la refaire
+        self.kprime, self.idx_bits, self.slot_w, self.k_over, self.m = kprime, idx_bits, slot_w, k_over, m
+        self.base, self.zigzag = base, zigzag
+        if not arr:
+            return words_from_bytes(b""), words_from_bytes(b"")
 
-        kprime, idx_bits, slot_w, k_over = _choose_kprime(arr)
         thr = 1 << kprime
 
-        flags: List[int] = []
-        payloads: List[int] = []
-        overflow_values: List[int] = []
-        for v in arr:
-            if v < thr:
-                flags.append(0)
-                payloads.append(v)
-            else:
-                flags.append(1)
-                payloads.append(len(overflow_values))
-                overflow_values.append(v)
-
-        words: List[int] = []
-        bitbuf = 0
-        bitlen = 0
-
-        for f, p in zip(flags, payloads):
-            words, bitbuf, bitlen = self._emit_crossing(words, bitbuf, bitlen, f, 1)
-            used = 1
-            if f == 0:
-                words, bitbuf, bitlen = self._emit_crossing(words, bitbuf, bitlen, p, kprime)
-                used += kprime
-            else:
-                w_idx = max(1, idx_bits)
-                words, bitbuf, bitlen = self._emit_crossing(words, bitbuf, bitlen, p, w_idx)
-                used += w_idx
-            pad = slot_w - used
-            if pad > 0:
-                words, bitbuf, bitlen = self._emit_crossing(words, bitbuf, bitlen, 0, pad)
-
-        if bitlen > 0:
-            words.append(bitbuf)
-
-        over_words: List[int] = []
-        bitbuf = 0
-        bitlen = 0
-        for v in overflow_values:
-            over_words, bitbuf, bitlen = self._emit_crossing(over_words, bitbuf, bitlen, v, max(1, k_over))
-        if bitlen > 0:
-            over_words.append(bitbuf)
+        # un slot = flag (bit 0) puis la valeur ou l'indice overflow, padding nul :
+        # on l'ecrit d'un bloc sur slot_w bits
+        overflow_values = [v for v in arr if v >= thr]
+        if overflow_values:
+            next_idx = count().__next__
+            slots = [v << 1 if v < thr else (next_idx() << 1) | 1 for v in arr]
+        else:
+            slots = [v << 1 for v in arr]
+
+        writer = BitWriter()
+        writer.write_many(slots, slot_w)
+        words = writer.words()
 
+        writer = BitWriter()
+        writer.write_many(overflow_values, max(1, k_over))
+        return words, writer.words()
+
+    def compress(self, arr: List[int], zigzag=None) -> bytes:
+        n = len(arr)
+        words, over_words = self.pack_sections(arr, zigzag)
+        if n == 0:
+            return MAGIC + bytes([VERSION]) + struct.pack("<I", 0)
+        kprime, idx_bits, slot_w, k_over = self.kprime, self.idx_bits, self.slot_w, self.k_over
+        base, zigzag = self.base, self.zigzag
         header = (
             MAGIC
-            + bytes([VERSION])
+            + bytes([VERSION_REF if base or zigzag else VERSION])
             + struct.pack("<I", n)
             + bytes([kprime, max(1, idx_bits), slot_w, max(1, k_over)])
             + struct.pack("<I", len(words))
             + struct.pack("<I", len(over_words))
         )
-        body = b"".join(w.to_bytes(4, "little") for w in words)
-        over = b"".join(w.to_bytes(4, "little") for w in over_words)
+        if base or zigzag:
+            header += struct.pack("<Bq", FLAG_ZIGZAG if zigzag else 0, base)
+        body = words_to_bytes(words)
+        over = words_to_bytes(over_words)
         return header + body + over
 
     def _parse(self, blob: bytes):
-        assert blob[:4] == MAGIC, "Bad magic"
-        version = blob[4]
-        if version != VERSION:
-            raise ValueError(f"Bad version: {version}")
-        off = 5
-        n = struct.unpack_from("<I", blob, off)[0]
-        off += 4
-        kprime = blob[off]
-        off += 1
-        idx_bits = blob[off]
-        off += 1
-        slot_w = blob[off]
-        off += 1
-        k_over = blob[off]
-        off += 1
-        n_words = struct.unpack_from("<I", blob, off)[0]
-        off += 4
-        n_over_words = struct.unpack_from("<I", blob, off)[0]
-        off += 4
+        (n, kprime, idx_bits, slot_w, k_over, n_words, n_over_words, off,
+         base, zigzag) = _parse_header(blob)
         words_bytes = blob[off : off + 4 * n_words]
         off += 4 * n_words
         over_bytes = blob[off : off + 4 * n_over_words]
-        words = [int.from_bytes(words_bytes[i : i + 4], "little") for i in range(0, len(words_bytes), 4)]
-        over_words = [int.from_bytes(over_bytes[i : i + 4], "little") for i in range(0, len(over_bytes), 4)]
+        words = words_from_bytes(words_bytes)
+        over_words = words_from_bytes(over_bytes)
+        self.base, self.zigzag = base, zigzag
         return n, kprime, idx_bits, slot_w, k_over, words, over_words
 
     @staticmethod
-    def _bitread(words: List[int], start_bit: int, width: int) -> int:
-        if width == 0:
-            return 0
-        w_idx = start_bit // 32
-        w_off = start_bit % 32
-        need = width
-        got = 0
-        acc = 0
-        while need > 0:
-            chunk = min(32 - w_off, need)
-            part = (words[w_idx] >> w_off) & ((1 << chunk) - 1)
-            acc |= part << got
-            got += chunk
-            need -= chunk
-            w_idx += 1
-            w_off = 0
-        return acc
+    def _bitread(words: Words, start_bit: int, width: int) -> int:
+        return unpack_bits(words, start_bit, width)
 
     def decompress(self, blob: bytes, n: int | None = None) -> List[int]:
         N, kprime, idx_bits, slot_w, k_over, words, over_words = self._parse(blob)
         if n is None:
             n = N
 
-        flags: List[int] = []
-        payloads: List[int] = []
-        bitpos = 0
-        for _ in range(n):
-            f = self._bitread(words, bitpos, 1)
-            bitpos += 1
-            if f == 0:
-                p = self._bitread(words, bitpos, kprime)
-                used = 1 + kprime
-                bitpos += kprime
-            else:
-                w_idx = max(1, idx_bits)
-                p = self._bitread(words, bitpos, w_idx)
-                used = 1 + w_idx
-                bitpos += w_idx
-            pad = slot_w - used
-            if pad > 0:
-                bitpos += pad
-            flags.append(f)
-            payloads.append(p)
-
-        over_vals: List[int] = []
-        over_count = sum(flags)
-        if over_count > 0:
-            for j in range(over_count):
-                start = j * max(1, k_over)
-                over_vals.append(self._bitread(over_words, start, max(1, k_over)))
-
-        out: List[int] = []
-        for f, p in zip(flags, payloads):
-            if f == 0:
-                out.append(p)
-            else:
-                out.append(over_vals[p])
-        return out
+        # slots lus en bloc : bit 0 = flag, le reste = valeur ou indice overflow
+        slots = BitReader(words).read_many(n, slot_w)
+        over_count = sum(s & 1 for s in slots)
+        over_vals = BitReader(over_words).read_many(over_count, max(1, k_over))
+        vals = [over_vals[s >> 1] if s & 1 else s >> 1 for s in slots]
+        return from_unsigned(vals, self.base, self.zigzag)
 
     def get_blob(self, blob: bytes, i: int) -> int:
-        N, kprime, idx_bits, slot_w, k_over, words, over_words = self._parse(blob)
-        if not (0 <= i < N):
-            raise IndexError("i out of range")
-
-        start = i * slot_w
-        f = self._bitread(words, start, 1)
-        start += 1
-        if f == 0:
-            return self._bitread(words, start, kprime)
-        w_idx = max(1, idx_bits)
-        idx = self._bitread(words, start, w_idx)
-        off = idx * max(1, k_over)
-        return self._bitread(over_words, off, max(1, k_over))
+        # seul l'en-tete est decode : la lecture ne touche que les octets du slot
+        return OverflowReader(blob).get(i)
 
     # --- helpers for tests / compatibility ---
     @classmethod
-    def from_list(cls, arr):
+    def from_list(cls, arr, zigzag=None):
         
         self = cls()
-        self.blob = self.compress(arr)
+        self.blob = self.compress(arr, zigzag)
         self.n = len(arr)
-        kprime, _, _, _ = _choose_kprime(arr)
-        thr = 1 << kprime
-        self.m = sum(1 for v in arr if v >= thr)
         return self
 
     def decompress_self(self):
         
         return self.decompress(self.blob)
 
+    def _reader(self) -> "OverflowReader":
+        # le blob peut etre remplace (cf. cli get) : on ne garde le lecteur que pour ce blob
+        reader = getattr(self, "_cached_reader", None)
+        if reader is None or reader.blob is not self.blob:
+            reader = self._cached_reader = OverflowReader(self.blob)
+        return reader
+
     def get(self, i: int) -> int:
         
-        return self.get_blob(self.blob, i)
+        return self._reader().get(i)
+
+    def get_many(self, indices) -> List[int]:
+        return self._reader().get_many(indices)
+
+    def _decode_run(self, start: int, count: int) -> List[int]:
+        return self._reader()._decode_run(start, count)
+
     def to_list(self):
         
         return self.decompress(self.blob)
@@ -239,6 +263,135 @@ class BitPackerOverflow:
         
         return self.decompress(self.blob)
 
+    def count_where(self, op: str, x: int) -> int:
+        return self._reader().count_where(op, x)
+
+    def select(self, op: str, x: int) -> List[int]:
+        return self._reader().select(op, x)
+
+    def sum(self) -> int:
+        return self._reader().sum()
+
+    def min(self) -> int:
+        return self._reader().min()
+
+    def max(self) -> int:
+        return self._reader().max()
+
+
+
+class OverflowReader(QueryMixin, MappedBlobReader):
+    """Lecteur overflow : en-tete decode une fois, vues sans copie sur les deux sections."""
+
+    codec = "overflow"
+
+    def __init__(self, blob):
+        self.blob = blob
+        (self.n, self.kprime, self.idx_bits, self.slot_w, self.k_over,
+         n_words, n_over_words, off, self.base, self.zigzag) = _parse_header(blob)
+        self._view = memoryview(blob)
+        self._slots = self._view[off : off + 4 * n_words]
+        self._over = self._view[off + 4 * n_words : off + 4 * (n_words + n_over_words)]
+
+    @classmethod
+    def from_sections(cls, n: int, slot_w: int, k_over: int, slots, over, base: int = 0,
+                      zigzag: bool = False) -> "OverflowReader":
+        """Lecteur sur deux sections deja separees (cf. container.py), sans en-tete BPov."""
+        if n and (slot_w < 2 or len(slots) * 8 < n * slot_w):
+            raise ValueError("Truncated overflow sections")
+        self = cls.__new__(cls)
+        self.blob = None
+        self.n, self.slot_w, self.k_over, self.base, self.zigzag = n, slot_w, k_over, base, zigzag
+        self._view = memoryview(b"")
+        self._slots, self._over = memoryview(slots), memoryview(over)
+        return self
+
+    def get(self, i: int) -> int:
+        if not (0 <= i < self.n):
+            raise IndexError("i out of range")
+        slot = read_bits(self._slots, i * self.slot_w, self.slot_w)
+        if not slot & 1:
+            # le padding apres k' bits est nul
+            return restore(slot >> 1, self.base, self.zigzag)
+        return restore(read_bits(self._over, (slot >> 1) * self.k_over, self.k_over), self.base, self.zigzag)
+
+    def _decode_run(self, start: int, count: int) -> List[int]:
+        # slots de la plage lus en bloc, puis seulement les entrees overflow utiles
+        slots = BitReader(self._slots, start * self.slot_w).read_many(count, self.slot_w)
+        over, k_over = self._over, self.k_over
+        vals = [read_bits(over, (s >> 1) * k_over, k_over) if s & 1 else s >> 1 for s in slots]
+        return from_unsigned(vals, self.base, self.zigzag)
+
+    # --- requetes sur les sections packees (cf. query.py) ---
+    # slot = flag (bit 0) puis la valeur u ou l'indice overflow ; en ligne, u >= t ssi slot >= 2t
+
+    def _slot_chunks(self):
+        return field_chunks(self._slots, self.slot_w, self.n)
+
+    def _over_chunks(self, m: int):
+        return field_chunks(self._over, max(1, self.k_over), m)
+
+    def _overflow_count(self) -> int:
+        return sum(popcount(big & g.low) for _, big, g in self._slot_chunks())
+
+    def count_where(self, op: str, x: int) -> int:
+        x = check_op(op, x)
+        if self.zigzag:
+            return super().count_where(op, x)
+        t = x - self.base
+        total = m = 0
+        for _, big, g in self._slot_chunks():
+            over = big & g.low
+            m += popcount(over)
+            inline = (g.low ^ over) << self.slot_w
+            total += popcount(combine(op, t, lambda t: ge_flags(big, g, 2 * t) & inline, inline))
+        return total + sum(popcount(flags(big, g, op, t)) for _, big, g in self._over_chunks(m))
+
+    def select(self, op: str, x: int) -> List[int]:
+        x = check_op(op, x)
+        if self.zigzag:
+            return super().select(op, x)
+        t = x - self.base
+        out: List[int] = []
+        over_pos: List[int] = []
+        for a, big, g in self._slot_chunks():
+            over = big & g.low
+            inline = (g.low ^ over) << self.slot_w
+            out += positions(combine(op, t, lambda t: ge_flags(big, g, 2 * t) & inline, inline), g, a)
+            over_pos += positions(over << self.slot_w, g, a)
+        # l'entree overflow j appartient au j-ieme slot marque
+        for a, big, g in self._over_chunks(len(over_pos)):
+            out += [over_pos[j] for j in positions(flags(big, g, op, t), g, a)]
+        return sorted(out)
+
+    def sum(self) -> int:
+        if self.zigzag:
+            return super().sum()
+        total = m = 0
+        for _, big, g in self._slot_chunks():
+            over = big & g.low
+            m += popcount(over)
+            total += field_sum(big >> 1, g.low ^ over, self.slot_w - 1)
+        total += sum(field_sum(big, g.low, max(1, self.k_over)) for _, big, g in self._over_chunks(m))
+        return total + self.n * self.base
+
+    def _extreme(self, pick, name: str) -> int:
+        if self.n == 0 or self.zigzag:
+            return super()._extreme(pick, name)
+        # toute valeur overflow est >= 2**k' > toute valeur en ligne : le max est
+        # dans la section overflow s'il y en a une, le min dans les slots sinon
+        m = self._overflow_count()
+        if (m > 0) if pick is max else (m == self.n):
+            fn = field_max if pick is max else field_min
+            found = [fn(big, g.low, max(1, self.k_over)) for _, big, g in self._over_chunks(m)]
+        else:
+            fn = field_max if pick is max else field_min
+            found = [fn(big >> 1, g.low ^ (big & g.low), self.slot_w - 1)
+                     for _, big, g in self._slot_chunks()]
+        return pick(v for v in found if v is not None) + self.base
+
+    def _views(self):
+        return [self._slots, self._over, self._view]
 
 
 class BitPackingOverflow(BitPackerOverflow):
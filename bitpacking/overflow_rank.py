@@ -0,0 +1,181 @@
+﻿from __future__ import annotations
+import struct
+from itertools import compress
+from typing import Iterator, List, Tuple
+
+from .access import BlobPacker, MappedBlobReader, has_magic
+from .core import (
+    read_bits, words_needed, from_unsigned, restore, words_to_bytes, BitReader, BitWriter,
+    FLAG_ZIGZAG
+)
+from .overflow import _bitlen_histogram, _choose_reference
+from .query import popcount, _FLAGS
+from .rankselect import RankSelect, build_rank_select, section_sizes, SAMPLE
+
+MAGIC = b"BPrs"
+VERSION = 1
+# magic, version, n, k', k_over, flags, base, nb d'exceptions
+HEADER_FMT = "<4sBQBBBqQ"
+HEADER_SIZE = struct.calcsize(HEADER_FMT)
+
+
+def _choose_widths(vals: List[int]) -> Tuple[int, int, int, int]:
+    """(k', k_over, nb d'exceptions, cout en bits) : les flags ne dependent pas de k'."""
+    if not vals:
+        return 1, 1, 0, 0
+    hist = _bitlen_histogram(vals)
+    K = len(hist) - 1
+    n = len(vals)
+    best = None
+    over = 0    # valeurs qui demandent plus de kp bits
+    for kp in range(K, 0, -1):
+        # slots en ligne a k', exceptions a K bits, un echantillon de select par SAMPLE
+        cost = (n - over) * kp + over * K + 64 * -(-over // SAMPLE)
+        if best is None or cost < best[3]:
+            best = (kp, K, over, cost)
+        over += hist[kp]
+    return best
+
+
+def _widths_cost(widths: Tuple[int, int, int, int], n: int, ref: bool) -> int:
+    # la base est toujours dans l'en-tete BPrs : seul compte le cout des sections
+    return widths[3]
+
+
+def _pack(vals: List[int], k: int) -> bytes:
+    writer = BitWriter()
+    writer.write_many(vals, k)
+    return words_to_bytes(writer.words())
+
+
+def compress_overflow_rank(ints: List[int], zigzag=None) -> bytes:
+    """Overflow sans indice dans les slots : flags a part, exception j = rank1(i)."""
+    (kprime, k_over, zigzag, base, m), sections = rank_sections(ints, zigzag)
+    head = struct.pack(HEADER_FMT, MAGIC, VERSION, len(ints), kprime, k_over,
+                       FLAG_ZIGZAG if zigzag else 0, base, m)
+    return head + b"".join(sections)
+
+
+def rank_sections(ints: List[int], zigzag=None):
+    """((k', k_over, zigzag, base, m), [index rank/select, slots, exceptions]) sans en-tete."""
+    if not ints:
+        return (1, 1, False, 0, 0), [b"", b"", b""]
+    base, zigzag, vals, (kprime, k_over, m, _) = _choose_reference(ints, zigzag, _choose_widths,
+                                                                   _widths_cost)
+    thr = 1 << kprime
+    ones = [i for i, v in enumerate(vals) if v >= thr]
+    inline = [v for v in vals if v < thr] if ones else vals
+    over = [vals[i] for i in ones]
+    return (kprime, k_over, zigzag, base, m), [
+        build_rank_select(len(ints), ones), _pack(inline, kprime), _pack(over, k_over)
+    ]
+
+
+def _sizes(n: int, kprime: int, k_over: int, m: int) -> List[int]:
+    # index rank/select, slots de k' bits, exceptions de k_over bits
+    return [sum(section_sizes(n, m)), 4 * words_needed((n - m) * kprime),
+            4 * words_needed(m * k_over)]
+
+
+class RankOverflowReader(MappedBlobReader):
+    """Lecteur sur place : slots de k' bits indexes par rank0, exceptions par rank1."""
+
+    codec = "overflow_rank"
+
+    def __init__(self, blob):
+        if len(blob) < HEADER_SIZE:
+            raise ValueError("Blob too short or corrupted")
+        magic, version, n, kprime, k_over, flags, base, m = struct.unpack_from(HEADER_FMT, blob)
+        if magic != MAGIC:
+            raise ValueError("Bad magic")
+        if version != VERSION:
+            raise ValueError(f"Bad version: {version}")
+        if m > n or not kprime or not k_over:
+            raise ValueError("Corrupted rank overflow header")
+        sizes = _sizes(n, kprime, k_over, m)
+        if len(blob) < HEADER_SIZE + sum(sizes):
+            raise ValueError("Truncated rank overflow blob")
+        self.blob = blob
+        self._view = memoryview(blob)
+        off = HEADER_SIZE
+        views = []
+        for size in sizes:
+            views.append(self._view[off : off + size])
+            off += size
+        self._attach(n, kprime, k_over, bool(flags & FLAG_ZIGZAG), base, m, views)
+
+    @classmethod
+    def from_sections(cls, n: int, kprime: int, k_over: int, zigzag: bool, base: int, m: int,
+                      sections) -> "RankOverflowReader":
+        """Lecteur sur les trois sections deja separees (cf. container.py), sans en-tete BPrs."""
+        if m > n or not kprime or not k_over or len(sections) != 3:
+            raise ValueError("Corrupted rank overflow sections")
+        sizes = _sizes(n, kprime, k_over, m)
+        if any(len(sec) < size for sec, size in zip(sections, sizes)):
+            raise ValueError("Truncated rank overflow sections")
+        self = cls.__new__(cls)
+        self.blob = None
+        self._view = memoryview(b"")
+        self._attach(n, kprime, k_over, zigzag, base, m,
+                     [memoryview(sec)[:size] for sec, size in zip(sections, sizes)])
+        return self
+
+    def _attach(self, n: int, kprime: int, k_over: int, zigzag: bool, base: int, m: int,
+                views) -> None:
+        self.n, self.kprime, self.k_over, self.m = n, kprime, k_over, m
+        self.base, self.zigzag = base, zigzag
+        self.flags = RankSelect(views[0], n, m)
+        self._slots, self._over = views[1], views[2]
+
+    def get(self, i: int) -> int:
+        if not 0 <= i < self.n:
+            raise IndexError("index out of range")
+        j, exc = self.flags.rank_bit(i)
+        if exc:
+            v = read_bits(self._over, j * self.k_over, self.k_over)
+        else:
+            v = read_bits(self._slots, (i - j) * self.kprime, self.kprime)
+        return restore(v, self.base, self.zigzag)
+
+    def _decode_run(self, start: int, count: int) -> List[int]:
+        if count <= 0:
+            return []
+        j = self.flags.rank1(start)
+        marks = self.flags.read(start, count)
+        nexc = popcount(marks)
+        vals = BitReader(self._slots, (start - j) * self.kprime).read_many(count - nexc, self.kprime)
+        if nexc:
+            over = BitReader(self._over, j * self.k_over).read_many(nexc, self.k_over)
+            flags = format(marks, f"0{count}b")[::-1].encode().translate(_FLAGS)
+            # les valeurs en ligne sont recopiees par tranches entre deux exceptions
+            out: List[int] = []
+            a = 0
+            for r, (p, v) in enumerate(zip(compress(range(count), flags), over)):
+                out += vals[a : p - r]
+                out.append(v)
+                a = p - r
+            out += vals[a:]
+            vals = out
+        return from_unsigned(vals, self.base, self.zigzag)
+
+    def exceptions(self, first: int = 0) -> Iterator[Tuple[int, int]]:
+        """(indice, valeur) des exceptions a partir de la first-ieme, via l'index select."""
+        reader = BitReader(self._over, first * self.k_over)
+        for i in self.flags.iter_ones(first):
+            yield i, restore(reader.read(self.k_over), self.base, self.zigzag)
+
+    def _views(self):
+        return [self.flags, self._slots, self._over, self._view]
+
+
+class BitPackingOverflowRank(BlobPacker):
+
+    reader_cls = RankOverflowReader
+
+    @classmethod
+    def from_list(cls, ints: List[int], zigzag=None) -> "BitPackingOverflowRank":
+        return cls(compress_overflow_rank(ints, zigzag))
+
+
+def is_rank_file(path: str) -> bool:
+    return has_magic(path, MAGIC)
@@ -0,0 +1,295 @@
+﻿from __future__ import annotations
+import os
+import struct
+from array import array
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+from typing import List, Optional, Tuple
+
+from .access import MappedBlobReader, has_magic
+from .auto import compress_auto, decode_blob, get_blob, blob_is_signed
+from .core import read_bits, restore
+from .factory import CompressorFactory, dumps_binary, loads_packed, read_header
+from .noncrossing import start_bit_of
+from .overflow import BitPackerOverflow, OverflowReader
+
+SEG_MAGIC = b"BPSG"
+SEG_VERSION = 1
+SEG_HEAD_FMT = "<4sBBQI"    # magic, version, codec, n total, nb de segments
+SEG_ENTRY_FMT = "<QQ"       # n du segment, taille en octets de son binaire
+SEG_HEAD_SIZE = struct.calcsize(SEG_HEAD_FMT)
+SEG_ENTRY_SIZE = struct.calcsize(SEG_ENTRY_FMT)
+
+# auto : chaque segment garde le codec choisi pour lui (signature de son binaire)
+CODECS = ["crossing", "non_crossing", "overflow", "auto"]
+MIN_SEGMENT = 1 << 16
+# n d'un segment dans l'en-tete de son binaire (BPK, BPov) : 32 bits
+MAX_SEGMENT = (1 << 32) - 1
+# assez de segments par processus pour equilibrer la charge
+SEGMENTS_PER_JOB = 4
+
+
+def _encode(codec: str, values: List[int], speed_weight: float = 0.0) -> bytes:
+    if codec == "auto":
+        return compress_auto(values, speed_weight)
+    if codec == "overflow":
+        return BitPackerOverflow().compress(values)
+    comp = CompressorFactory.create_from_list(codec, values)
+    return dumps_binary(codec, comp.k, comp.n, comp.words, comp.base, comp.zigzag)
+
+
+def _decode(codec: str, payload) -> List[int]:
+    if codec == "auto":
+        return decode_blob(payload)
+    if codec == "overflow":
+        return BitPackerOverflow().decompress(bytes(payload))
+    return loads_packed(payload).to_list()
+
+
+def _as_array(ints: List[int]) -> Optional[array]:
+    # un seul typecode 64 bits pour la memoire partagee ; None si des valeurs < 0
+    # et >= 2**63 se melangent (les segments sont alors encodes dans ce processus)
+    if not isinstance(ints, list):
+        # vue binaire (ndarray, memoryview typee) : copie des octets, sans int Python
+        view = memoryview(ints)
+        vals = array(view.format.lstrip("<=@"), view.tobytes())
+        return vals if vals.itemsize == 8 else array("q" if vals.typecode.islower() else "Q", vals)
+    for typecode in ("Q", "q"):
+        try:
+            return array(typecode, ints)
+        except OverflowError:
+            pass
+    if -(1 << 63) <= min(ints) and max(ints) < 1 << 64:
+        return None
+    raise ValueError("parallel mode needs values in [-2**63, 2**64)")
+
+
+def _values(seg) -> List[int]:
+    # une vue binaire n'est convertie en liste que segment par segment
+    return seg if isinstance(seg, list) else seg.tolist()
+
+
+def _decode_segments(codec: str, data, segs) -> List[int]:
+    out: List[int] = []
+    for _, _, off, size in segs:
+        out.extend(_decode(codec, data[off : off + size]))
+    return out
+
+
+def _is_signed(codec: str, payload) -> bool:
+    # une base negative ou le zigzag peuvent redonner des valeurs < 0
+    if codec == "auto":
+        return blob_is_signed(payload)
+    if codec == "overflow":
+        with OverflowReader(payload) as reader:
+            return reader.base < 0 or reader.zigzag
+    _, _, _, _, base, zigzag, _ = read_header(payload)
+    return base < 0 or zigzag
+
+
+def _to_shared(data: bytes) -> shared_memory.SharedMemory:
+    shm = shared_memory.SharedMemory(create=True, size=max(1, len(data)))
+    shm.buf[: len(data)] = data
+    return shm
+
+
+def _take_shared(name: str, size: int) -> bytes:
+    # le parent recopie puis libere le segment cree par le worker
+    shm = shared_memory.SharedMemory(name=name)
+    try:
+        return bytes(shm.buf[:size])
+    finally:
+        shm.close()
+        shm.unlink()
+
+
+def _compress_worker(in_name: str, start: int, stop: int, codec: str,
+                     typecode: str = "Q", speed_weight: float = 0.0) -> Tuple[str, int]:
+    shm = shared_memory.SharedMemory(name=in_name)
+    try:
+        view = shm.buf[8 * start : 8 * stop]
+        values = view.cast(typecode).tolist()
+        view.release()
+    finally:
+        shm.close()
+    payload = _encode(codec, values, speed_weight)
+    out = _to_shared(payload)
+    out.close()
+    return out.name, len(payload)
+
+
+def _decompress_worker(in_name: str, off: int, size: int, codec: str,
+                       out_name: str, start: int, typecode: str = "Q") -> int:
+    shm = shared_memory.SharedMemory(name=in_name)
+    try:
+        view = shm.buf[off : off + size]
+        values = _decode(codec, view)
+        view.release()
+    finally:
+        shm.close()
+    out = shared_memory.SharedMemory(name=out_name)
+    try:
+        out.buf[8 * start : 8 * (start + len(values))] = array(typecode, values).tobytes()
+    finally:
+        out.close()
+    return len(values)
+
+
+def _segments(n: int, jobs: int, segment_size: Optional[int]) -> List[Tuple[int, int]]:
+    if segment_size is None:
+        segment_size = min(MAX_SEGMENT, max(MIN_SEGMENT, -(-n // (jobs * SEGMENTS_PER_JOB))))
+    if not 0 < segment_size <= MAX_SEGMENT:
+        raise ValueError("segment_size must be in [1, 2**32)")
+    return [(a, min(n, a + segment_size)) for a in range(0, n, segment_size)]
+
+
+def compress_parallel(ints: List[int], codec: str = "crossing", jobs: Optional[int] = None,
+                      segment_size: Optional[int] = None, speed_weight: float = 0.0) -> bytes:
+    """Compresse des segments independants dans un pool de processus (conteneur BPSG)."""
+    segs, payloads = compress_segments(ints, codec, jobs, segment_size, speed_weight)
+    head = struct.pack(SEG_HEAD_FMT, SEG_MAGIC, SEG_VERSION, CODECS.index(codec), len(ints), len(segs))
+    table = b"".join(struct.pack(SEG_ENTRY_FMT, b - a, len(p)) for (a, b), p in zip(segs, payloads))
+    return head + table + b"".join(payloads)
+
+
+def compress_segments(ints: List[int], codec: str = "crossing", jobs: Optional[int] = None,
+                      segment_size: Optional[int] = None,
+                      speed_weight: float = 0.0) -> Tuple[List[Tuple[int, int]], List[bytes]]:
+    """([(debut, fin)], [binaire de chaque segment]) : les segments sans l'en-tete BPSG.
+
+    ints : List[int] ou vue binaire (ndarray, memoryview typee), lue segment par segment.
+    """
+    if codec not in CODECS:
+        raise ValueError(f"Unknown mode: {codec}")
+    jobs = jobs or os.cpu_count() or 1
+    segs = _segments(len(ints), jobs, segment_size)
+
+    packed = None if jobs == 1 or len(segs) <= 1 else _as_array(ints)
+    if packed is None:
+        payloads = [_encode(codec, _values(ints[a:b]), speed_weight) for a, b in segs]
+    else:
+        typecode = packed.typecode
+        shm = _to_shared(packed.tobytes())
+        del packed
+        try:
+            with ProcessPoolExecutor(max_workers=jobs) as pool:
+                futures = [pool.submit(_compress_worker, shm.name, a, b, codec, typecode, speed_weight)
+                           for a, b in segs]
+                payloads = [_take_shared(*f.result()) for f in futures]
+        finally:
+            shm.close()
+            shm.unlink()
+    return segs, payloads
+
+
+def parse_segments(data) -> Tuple[str, int, List[Tuple[int, int, int, int]]]:
+    """Renvoie (codec, n, [(debut, n du segment, offset, taille)])."""
+    if len(data) < SEG_HEAD_SIZE:
+        raise ValueError("File too short or corrupted")
+    magic, version, codec, n, nseg = struct.unpack_from(SEG_HEAD_FMT, data)
+    if magic != SEG_MAGIC:
+        raise ValueError("Bad magic/version")
+    if version != SEG_VERSION:
+        raise ValueError(f"Bad version: {version}")
+    if codec >= len(CODECS):
+        raise ValueError("Unknown mode code")
+    off = SEG_HEAD_SIZE + nseg * SEG_ENTRY_SIZE
+    start = 0
+    segs = []
+    for j in range(nseg):
+        seg_n, size = struct.unpack_from(SEG_ENTRY_FMT, data, SEG_HEAD_SIZE + j * SEG_ENTRY_SIZE)
+        segs.append((start, seg_n, off, size))
+        start += seg_n
+        off += size
+    if start != n or off > len(data):
+        raise ValueError("Corrupted segment table")
+    return CODECS[codec], n, segs
+
+
+def decompress_parallel(data, jobs: Optional[int] = None) -> List[int]:
+    codec, n, segs = parse_segments(data)
+    jobs = jobs or os.cpu_count() or 1
+    if jobs == 1 or len(segs) <= 1:
+        return _decode_segments(codec, data, segs)
+
+    with memoryview(data) as view:
+        signed = any(_is_signed(codec, view[off : off + size]) for _, _, off, size in segs)
+    typecode = "q" if signed else "Q"
+    shm = _to_shared(bytes(data))
+    result = shared_memory.SharedMemory(create=True, size=max(1, 8 * n))
+    try:
+        with ProcessPoolExecutor(max_workers=jobs) as pool:
+            futures = [pool.submit(_decompress_worker, shm.name, off, size, codec, result.name, start,
+                                   typecode)
+                       for start, _, off, size in segs]
+            for f, (_, seg_n, _, _) in zip(futures, segs):
+                if f.result() != seg_n:
+                    raise ValueError("Decompressed length mismatch")
+    except OverflowError:
+        # segment signe et valeurs >= 2**63 : aucun typecode 64 bits commun, on decode en listes
+        return _decode_segments(codec, data, segs)
+    else:
+        view = result.buf[: 8 * n]
+        out = view.cast(typecode).tolist()
+        view.release()
+        return out
+    finally:
+        for s in (shm, result):
+            s.close()
+            s.unlink()
+
+
+class SegmentedReader(MappedBlobReader):
+    """Acces direct dans un conteneur BPSG : la table des segments donne le segment de i."""
+
+    def __init__(self, data):
+        self.codec, self.n, self._segs = parse_segments(data)
+        self._data = data
+
+    @classmethod
+    def from_sections(cls, codec: str, n: int, sizes, payloads) -> "SegmentedReader":
+        """Lecteur sur la table des tailles et les binaires des segments mis bout a bout,
+        sans en-tete BPSG (cf. container.py) ; sizes = (n du segment, octets) par segment."""
+        segs = []
+        start = off = 0
+        for seg_n, size in sizes:
+            segs.append((start, seg_n, off, size))
+            start += seg_n
+            off += size
+        if codec not in CODECS or start != n or off > len(payloads) or any(not s[1] for s in segs):
+            raise ValueError("Corrupted segment sections")
+        self = cls.__new__(cls)
+        self.codec, self.n, self._segs, self._data = codec, n, segs, payloads
+        return self
+
+    def get(self, i: int) -> int:
+        if not 0 <= i < self.n:
+            raise IndexError("index out of range")
+        # segments de meme taille sauf le dernier
+        start, _, off, size = self._segs[i // self._segs[0][1]]
+        j = i - start
+        with memoryview(self._data)[off : off + size] as payload:
+            if self.codec == "auto":
+                return get_blob(payload, j)
+            if self.codec == "overflow":
+                with OverflowReader(payload) as reader:
+                    return reader.get(j)
+            mode, k, _, _, base, zigzag, head = read_header(payload)
+            bit = j * k if mode == "crossing" else start_bit_of(j, k)
+            return restore(read_bits(payload, 8 * head + bit, k), base, zigzag)
+
+    def _decode_run(self, start: int, count: int) -> List[int]:
+        if count <= 0:
+            return []
+        # segments touches decodes en entier, puis la plage est decoupee
+        size = self._segs[0][1]
+        first = start // size
+        out: List[int] = []
+        for seg_start, _, off, seg_size in self._segs[first : (start + count - 1) // size + 1]:
+            with memoryview(self._data)[off : off + seg_size] as payload:
+                out += _decode(self.codec, payload)
+        off = start - self._segs[first][0]
+        return out[off : off + count]
+
+def is_segmented(path: str) -> bool:
+    return has_magic(path, SEG_MAGIC)
@@ -0,0 +1,231 @@
+﻿from __future__ import annotations
+import struct
+from bisect import bisect_left
+from collections import Counter
+from itertools import chain, compress
+from typing import List, Tuple
+
+from .access import BlobPacker, MappedBlobReader, has_magic
+from .core import (
+    read_bits, to_unsigned, from_unsigned, restore, new_words, words_to_bytes, BitReader,
+    BitWriter, FLAG_ZIGZAG, INT64_MIN, INT64_MAX
+)
+from .query import popcount, _FLAGS
+
+MAGIC = b"BPpf"
+VERSION = 1
+# magic, version, n, taille de bloc, flags, base, nb de mots de donnees
+HEADER_FMT = "<4sBQIBqQ"
+HEADER_SIZE = struct.calcsize(HEADER_FMT)
+# par bloc : mot de debut, b (bits bas), largeur des bits hauts, nb d'exceptions
+DIR_FMT = "<IBBB"
+DIR_SIZE = struct.calcsize(DIR_FMT)
+
+BLOCK = 128
+POS_BITS = 7            # une position dans un bloc de 128
+BITMAP_BITS = BLOCK     # une exception = un bit a 1 ; rang par popcount
+
+
+# b divise 8 : un octet donne directement 8 // b valeurs bas
+_BYTE_TABLES = {b: [tuple(x >> s & ((1 << b) - 1) for s in range(0, 8, b)) for x in range(256)]
+                for b in (1, 2, 4)}
+
+
+def _unpack_lows(data, start: int, count: int, b: int) -> List[int]:
+    # start est aligne sur un mot : decodage par table d'octets quand c'est possible
+    lo = start >> 3
+    raw = data[lo : lo + ((count * b + 7) >> 3)]
+    table = _BYTE_TABLES.get(b)
+    if table is not None:
+        out = list(chain.from_iterable(map(table.__getitem__, raw)))
+        del out[count:]
+        return out
+    if b == 8:
+        return list(raw)
+    big = int.from_bytes(raw, "little")
+    mask = (1 << b) - 1
+    return [big >> s & mask for s in range(0, count * b, b)]
+
+
+def _uses_bitmap(nexc: int) -> bool:
+    # liste de positions tant qu'elle coute moins que le bitmap du bloc
+    return nexc * POS_BITS > BITMAP_BITS
+
+
+def _choose_b(block: List[int]) -> Tuple[int, int, int]:
+    """(b, largeur des bits hauts, nb d'exceptions) le moins couteux pour ce bloc."""
+    counts = Counter(map(int.bit_length, block))
+    K = max(1, max(counts))
+    hist = [0] * (K + 1)
+    for bl, c in counts.items():
+        hist[max(1, bl)] += c
+    best = None
+    over = 0    # valeurs qui demandent plus de b bits
+    for b in range(K, 0, -1):
+        exc_cost = 0 if not over else min(BITMAP_BITS, POS_BITS * over) + over * (K - b)
+        cost = len(block) * b + exc_cost
+        if best is None or cost < best[0]:
+            best = (cost, b, K - b if over else 0, over)
+        over += hist[b]
+    return best[1:]
+
+
+def _reference(vals: List[int], zigzag) -> Tuple[int, bool]:
+    # zigzag : None = seulement si des valeurs sont negatives
+    if zigzag:
+        return 0, True
+    if not vals:
+        return 0, False
+    lo = min(vals)
+    if lo < 0:
+        if zigzag is None or lo < INT64_MIN:
+            return 0, True
+        return lo, False
+    # retirer un min > 0 ne peut qu'etroitiser chaque valeur
+    return (lo, False) if lo <= INT64_MAX else (0, False)
+
+
+def compress_pfor(ints: List[int], zigzag=None) -> bytes:
+    """Chaque bloc de 128 valeurs : bits bas sur b bits, exceptions a part (positions + bits hauts)."""
+    base, zigzag, directory, data = pfor_sections(ints, zigzag)
+    head = struct.pack(HEADER_FMT, MAGIC, VERSION, len(ints), BLOCK,
+                       FLAG_ZIGZAG if zigzag else 0, base, len(data))
+    return head + directory + words_to_bytes(data)
+
+
+def pfor_sections(ints: List[int], zigzag=None):
+    """(base, zigzag, repertoire des blocs, mots de donnees) : le binaire PFOR sans en-tete."""
+    base, zigzag = _reference(ints, zigzag)
+    vals = to_unsigned(ints, base, zigzag)
+    data = new_words()
+    directory = bytearray()
+    for start in range(0, len(vals), BLOCK):
+        block = vals[start : start + BLOCK]
+        b, hb, nexc = _choose_b(block)
+        writer = BitWriter()
+        if nexc:
+            mask = (1 << b) - 1
+            positions = [p for p, v in enumerate(block) if v >> b]
+            writer.write_many([v & mask for v in block], b)
+            if _uses_bitmap(nexc):
+                writer.write(sum(1 << p for p in positions), BITMAP_BITS)
+            else:
+                writer.write_many(positions, POS_BITS)
+            writer.write_many([block[p] >> b for p in positions], hb)
+        else:
+            writer.write_many(block, b)
+        directory += struct.pack(DIR_FMT, len(data), b, hb, nexc)
+        data += writer.words()
+    return base, zigzag, bytes(directory), data
+
+
+class PforReader(MappedBlobReader):
+    """Lecteur PFOR sur place : repertoire des blocs + rang des exceptions, get en O(1)."""
+
+    codec = "pfor"
+
+    def __init__(self, blob):
+        if len(blob) < HEADER_SIZE:
+            raise ValueError("Blob too short or corrupted")
+        magic, version, n, block, flags, base, wlen = struct.unpack_from(HEADER_FMT, blob)
+        if magic != MAGIC:
+            raise ValueError("Bad magic")
+        if version != VERSION:
+            raise ValueError(f"Bad version: {version}")
+        if block == 0 or block > BLOCK:
+            raise ValueError("Corrupted PFOR header")
+        nblocks = -(-n // block)
+        end = HEADER_SIZE + nblocks * DIR_SIZE
+        if len(blob) < end + 4 * wlen:
+            raise ValueError("Truncated PFOR blob")
+        self.blob = blob
+        self.n, self.block_size, self.base, self.zigzag = n, block, base, bool(flags & FLAG_ZIGZAG)
+        self._view = memoryview(blob)
+        self._dir = self._view[HEADER_SIZE:end]
+        self._data = self._view[end : end + 4 * wlen]
+
+    @classmethod
+    def from_sections(cls, n: int, block: int, base: int, zigzag: bool, directory,
+                      data) -> "PforReader":
+        """Lecteur sur le repertoire et les donnees deja separes (cf. container.py), sans en-tete BPpf."""
+        if block == 0 or block > BLOCK or len(directory) < -(-n // block) * DIR_SIZE:
+            raise ValueError("Corrupted PFOR sections")
+        self = cls.__new__(cls)
+        self.blob = None
+        self.n, self.block_size, self.base, self.zigzag = n, block, base, zigzag
+        self._view = memoryview(b"")
+        self._dir, self._data = memoryview(directory), memoryview(data)
+        return self
+
+    def get(self, i: int) -> int:
+        if not 0 <= i < self.n:
+            raise IndexError("index out of range")
+        bi, r = divmod(i, self.block_size)
+        woff, b, hb, nexc = struct.unpack_from(DIR_FMT, self._dir, bi * DIR_SIZE)
+        start = 32 * woff
+        v = read_bits(self._data, start + r * b, b)
+        if nexc:
+            pos = start + min(self.block_size, self.n - bi * self.block_size) * b
+            if _uses_bitmap(nexc):
+                bitmap = read_bits(self._data, pos, BITMAP_BITS)
+                if bitmap >> r & 1:
+                    rank = popcount(bitmap & ((1 << r) - 1))
+                    v |= read_bits(self._data, pos + BITMAP_BITS + rank * hb, hb) << b
+            else:
+                # au plus 18 positions triees
+                positions = BitReader(self._data, pos).read_many(nexc, POS_BITS)
+                rank = bisect_left(positions, r)
+                if rank < nexc and positions[rank] == r:
+                    v |= read_bits(self._data, pos + nexc * POS_BITS + rank * hb, hb) << b
+        return restore(v, self.base, self.zigzag)
+
+    def _decode_block(self, start: int, b: int, hb: int, nexc: int, cnt: int) -> List[int]:
+        data = self._data
+        vals = _unpack_lows(data, start, cnt, b)
+        if not nexc:
+            return vals
+        pos = start + cnt * b
+        if _uses_bitmap(nexc):
+            bitmap = read_bits(data, pos, BITMAP_BITS)
+            flags = format(bitmap, f"0{BITMAP_BITS}b")[::-1].encode().translate(_FLAGS)
+            positions = list(compress(range(cnt), flags))
+            pos += BITMAP_BITS
+        else:
+            positions = BitReader(data, pos).read_many(nexc, POS_BITS)
+            pos += nexc * POS_BITS
+        # bits hauts lus d'un seul entier, deja decales de b
+        nbits = nexc * hb
+        big = read_bits(data, pos, nbits) << b
+        hmask = ((1 << hb) - 1) << b
+        for p, s in zip(positions, range(0, nbits, hb)):
+            vals[p] |= big >> s & hmask
+        return vals
+
+    def _decode_run(self, start: int, count: int) -> List[int]:
+        if count <= 0:
+            return []
+        size = self.block_size
+        b0 = start // size
+        b1 = (start + count - 1) // size + 1
+        out: List[int] = []
+        entries = struct.iter_unpack(DIR_FMT, self._dir[b0 * DIR_SIZE : b1 * DIR_SIZE])
+        for bi, (woff, b, hb, nexc) in enumerate(entries, b0):
+            out += self._decode_block(32 * woff, b, hb, nexc, min(size, self.n - bi * size))
+        off = start - b0 * size
+        return from_unsigned(out[off : off + count], self.base, self.zigzag)
+
+    def _views(self):
+        return [self._dir, self._data, self._view]
+
+
+class BitPackingPFOR(BlobPacker):
+
+    reader_cls = PforReader
+
+    @classmethod
+    def from_list(cls, ints: List[int], zigzag=None) -> "BitPackingPFOR":
+        return cls(compress_pfor(ints, zigzag))
+
+
+def is_pfor_file(path: str) -> bool:
+    return has_magic(path, MAGIC)
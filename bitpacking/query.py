@@ -0,0 +1,206 @@
+﻿from __future__ import annotations
+import operator
+from functools import lru_cache
+from itertools import compress
+from operator import index as as_index
+from typing import Callable, Iterator, List, Optional, Tuple
+
+from .core import read_bits, words_view
+
+# comparaisons de count_where et select : valeur <op> x
+OPS = {
+    "<": operator.lt, "<=": operator.le, ">": operator.gt, ">=": operator.ge,
+    "==": operator.eq, "!=": operator.ne,
+}
+# champs par paquet : un paquet = un seul entier Python, compare en entier (SWAR)
+CHUNK = 4096
+
+_FLAGS = bytes.maketrans(b"01", b"\x00\x01")
+
+try:
+    popcount = int.bit_count
+except AttributeError:  # Python < 3.10
+    def popcount(x: int) -> int:
+        return bin(x).count("1")
+
+
+def _bits(positions) -> int:
+    # entier avec un bit a 1 a chaque position
+    buf = bytearray((max(positions, default=0) >> 3) + 1)
+    for p in positions:
+        buf[p >> 3] |= 1 << (p & 7)
+    return int.from_bytes(buf, "little")
+
+
+class Grid:
+    """Masques d'un paquet de c champs de k bits : le champ i commence au bit
+    (i // per) * stride + (i % per) * k (per = 1, stride = k : champs contigus).
+
+    Les champs pairs et impairs sont traites separement : le bit juste au-dessus
+    d'un champ (sa garde) n'appartient alors a aucun autre champ de la classe.
+    """
+
+    def __init__(self, k: int, c: int, per: int = 1, stride: int = 0):
+        stride = stride or k
+        pos = [(i // per) * stride + (i % per) * k for i in range(c)]
+        self.k, self.c, self.per, self.stride = k, c, per, stride
+        self.span = pos[-1] + k
+        self.mask = (1 << k) - 1
+        self.low = _bits(pos)
+        self.low_a = _bits(pos[0::2])
+        self.low_b = self.low ^ self.low_a
+        self.field_a = self.low_a * self.mask
+        self.field_b = self.low_b * self.mask
+        self.guard_a = self.low_a << k
+        self.guard_b = self.low_b << k
+        self.guard = self.low << k
+
+
+@lru_cache(maxsize=32)
+def grid(k: int, c: int, per: int = 1, stride: int = 0) -> Grid:
+    return Grid(k, c, per, stride)
+
+
+def field_chunks(data, k: int, n: int, per: int = 1, stride: int = 0,
+                 first: int = 0) -> Iterator[Tuple[int, int, Grid]]:
+    """(indice du premier champ, entier du paquet, masques) ; data = octets LE des mots."""
+    stride = stride or k
+    # debut de paquet aligne sur un octet (contigus) ou sur un mot (per champs par mot)
+    step = CHUNK - CHUNK % per
+    for a in range(0, n, step):
+        g = grid(k, min(step, n - a), per, stride)
+        yield a, read_bits(data, first + (a // per) * stride, g.span), g
+
+
+def ge_flags(big: int, g: Grid, t: int) -> int:
+    """Gardes a 1 des champs >= t : (2**k + u) - t garde son bit k ssi u >= t."""
+    if t <= 0:
+        return g.guard
+    if t > g.mask:
+        return 0
+    ra = ((big & g.field_a) | g.guard_a) - t * g.low_a
+    rb = ((big & g.field_b) | g.guard_b) - t * g.low_b
+    return (ra & g.guard_a) | (rb & g.guard_b)
+
+
+def combine(op: str, t: int, ge: Callable[[int], int], everything: int) -> int:
+    # toutes les comparaisons a partir de "champ >= t" (ge(t + 1) est inclus dans ge(t))
+    if op == ">=":
+        return ge(t)
+    if op == ">":
+        return ge(t + 1)
+    if op == "<":
+        return everything ^ ge(t)
+    if op == "<=":
+        return everything ^ ge(t + 1)
+    eq = ge(t) ^ ge(t + 1)
+    return eq if op == "==" else everything ^ eq
+
+
+def flags(big: int, g: Grid, op: str, t: int) -> int:
+    return combine(op, t, lambda t: ge_flags(big, g, t), g.guard)
+
+
+def positions(marks: int, g: Grid, a: int = 0) -> List[int]:
+    """Indices (a partir de a) des champs dont la garde est a 1 dans marks."""
+    if not marks:
+        return []
+    k, per, stride = g.k, g.per, g.stride
+    bits = format(marks, "b")[::-1].encode().ljust(g.span + k + 1, b"0")
+    sel = bytearray(g.c)
+    for j in range(per):
+        # les gardes du j-ieme champ de chaque groupe sont espacees de stride
+        sel[j::per] = bits[(j + 1) * k :: stride][: len(range(j, g.c, per))]
+    return list(compress(range(a, a + g.c), sel.translate(_FLAGS)))
+
+
+def field_sum(big: int, cand: int, k: int) -> int:
+    # somme par plans de bits : popcount du bit b des champs candidats
+    return sum(popcount((big >> b) & cand) << b for b in range(k))
+
+
+def field_max(big: int, cand: int, k: int) -> Optional[int]:
+    # du bit fort au bit faible : on ne garde que les candidats qui ont le bit
+    if not cand:
+        return None
+    res = 0
+    for b in range(k - 1, -1, -1):
+        hit = (big >> b) & cand
+        if hit:
+            cand = hit
+            res |= 1 << b
+    return res
+
+
+def field_min(big: int, cand: int, k: int) -> Optional[int]:
+    # min(u) = complement du max des complements
+    res = field_max(~big, cand, k)
+    return None if res is None else ((1 << k) - 1) - res
+
+
+def check_op(op: str, x) -> int:
+    if op not in OPS:
+        raise ValueError(f"Unknown comparison: {op!r} (expected one of {', '.join(OPS)})")
+    return as_index(x)
+
+
+class QueryMixin:
+    """count_where, sum, min, max et select calcules sur les mots packes.
+
+    Le packer fournit _layout() -> (per, stride, premier bit). Les comparaisons
+    portent sur les valeurs stockees (v - base) ; en zigzag l'ordre n'est pas
+    conserve : on decode paquet par paquet.
+    """
+
+    def _chunks(self) -> Iterator[Tuple[int, int, Grid]]:
+        if self.n == 0 or self.k == 0:
+            return iter(())
+        per, stride, first = self._layout()
+        return field_chunks(words_view(self.words), self.k, self.n, per, stride, first)
+
+    def _decoded(self) -> Iterator[Tuple[int, List[int]]]:
+        for a in range(0, self.n, CHUNK):
+            yield a, self._decode_run(a, min(CHUNK, self.n - a))
+
+    def count_where(self, op: str, x: int) -> int:
+        """Nombre de valeurs v telles que v <op> x, sans decoder les valeurs."""
+        x = check_op(op, x)
+        if self.zigzag:
+            cmp = OPS[op]
+            return sum(sum(cmp(v, x) for v in vals) for _, vals in self._decoded())
+        t = x - self.base
+        return sum(popcount(flags(big, g, op, t)) for _, big, g in self._chunks())
+
+    def select(self, op: str, x: int) -> List[int]:
+        """Indices croissants des valeurs v telles que v <op> x."""
+        x = check_op(op, x)
+        out: List[int] = []
+        if self.zigzag:
+            cmp = OPS[op]
+            for a, vals in self._decoded():
+                out += [i for i, v in enumerate(vals, a) if cmp(v, x)]
+            return out
+        t = x - self.base
+        for a, big, g in self._chunks():
+            out += positions(flags(big, g, op, t), g, a)
+        return out
+
+    def sum(self) -> int:
+        if self.zigzag:
+            return sum(sum(vals) for _, vals in self._decoded())
+        total = sum(field_sum(big, g.low, g.k) for _, big, g in self._chunks())
+        return total + self.n * self.base
+
+    def _extreme(self, pick, name: str) -> int:
+        if self.n == 0:
+            raise ValueError(f"{name}() of an empty array")
+        if self.zigzag:
+            return pick(pick(vals) for _, vals in self._decoded())
+        fn = field_max if pick is max else field_min
+        return pick(fn(big, g.low, g.k) for _, big, g in self._chunks()) + self.base
+
+    def min(self) -> int:
+        return self._extreme(min, "min")
+
+    def max(self) -> int:
+        return self._extreme(max, "max")
@@ -0,0 +1,147 @@
+﻿from __future__ import annotations
+import struct
+import sys
+from array import array
+from itertools import compress
+from typing import Iterator, List, Tuple
+
+from .core import read_bits, words_needed
+from .query import popcount, _FLAGS
+
+# repertoire de rang a deux niveaux : un rang absolu (64 bits) par superbloc,
+# un rang relatif au superbloc (16 bits) par bloc ; le reste par popcount
+BLOCK_BITS = 256
+SUPER_BITS = 1 << 16
+BLOCKS_PER_SUPER = SUPER_BITS // BLOCK_BITS
+# select : position d'un bit a 1 sur SAMPLE
+SAMPLE = 256
+
+
+def _table(view, typecode: str):
+    # entiers little-endian du fichier : vue typee sans copie, ou copie retournee
+    if sys.byteorder == "little":
+        return view.cast(typecode)
+    table = array(typecode, bytes(view))
+    table.byteswap()
+    return table
+
+
+def _pad4(size: int) -> int:
+    return (size + 3) & ~3
+
+
+def section_sizes(n: int, ones: int) -> Tuple[int, int, int, int]:
+    """Octets du bitvector, des superblocs, des blocs et des echantillons de select."""
+    return (4 * words_needed(n), 8 * -(-n // SUPER_BITS), _pad4(2 * -(-n // BLOCK_BITS)),
+            8 * -(-ones // SAMPLE))
+
+
+def build_rank_select(n: int, ones: List[int]) -> bytes:
+    """Bitvector de n bits (a 1 aux positions croissantes ones) suivi de ses index."""
+    bits_size, _, blocks_size, _ = section_sizes(n, len(ones))
+    bits = bytearray(bits_size)
+    for p in ones:
+        bits[p >> 3] |= 1 << (p & 7)
+    supers: List[int] = []
+    blocks: List[int] = []
+    rank = 0
+    for b in range(-(-n // BLOCK_BITS)):
+        if b % BLOCKS_PER_SUPER == 0:
+            supers.append(rank)
+        blocks.append(rank - supers[-1])
+        rank += popcount(int.from_bytes(bits[32 * b : 32 * b + 32], "little"))
+    directory = struct.pack(f"<{len(supers)}Q", *supers) + struct.pack(f"<{len(blocks)}H", *blocks)
+    directory = directory.ljust(len(directory) + blocks_size - 2 * len(blocks), b"\x00")
+    samples = ones[::SAMPLE]
+    return bytes(bits) + directory + struct.pack(f"<{len(samples)}Q", *samples)
+
+
+class RankSelect:
+    """Bitvector en lecture seule : rank1 en O(1), select1 par echantillons puis dichotomie."""
+
+    def __init__(self, buf, n: int, ones: int):
+        sizes = section_sizes(n, ones)
+        if len(buf) < sum(sizes):
+            raise ValueError("Truncated rank/select index")
+        self.n, self.ones = n, ones
+        view = memoryview(buf)
+        a = 0
+        self._bits, a = view[a : a + sizes[0]], a + sizes[0]
+        self._supers, a = _table(view[a : a + sizes[1]], "Q"), a + sizes[1]
+        self._blocks, a = _table(view[a : a + sizes[2]], "H"), a + sizes[2]
+        self._samples = _table(view[a : a + sizes[3]], "Q")
+        view.release()
+        self.nblocks = -(-n // BLOCK_BITS)
+
+    @property
+    def size(self) -> int:
+        return sum(section_sizes(self.n, self.ones))
+
+    def __getitem__(self, i: int) -> int:
+        return self._bits[i >> 3] >> (i & 7) & 1
+
+    def read(self, start: int, count: int) -> int:
+        """Bits [start, start + count) en un entier (bit 0 = position start)."""
+        return read_bits(self._bits, start, count)
+
+    def _block_rank(self, b: int) -> int:
+        # nombre de 1 avant le bloc b
+        return self._supers[b // BLOCKS_PER_SUPER] + self._blocks[b]
+
+    def rank1(self, i: int) -> int:
+        """Nombre de bits a 1 dans [0, i)."""
+        b = i // BLOCK_BITS
+        if b >= self.nblocks:
+            return self.ones
+        return self._block_rank(b) + popcount(read_bits(self._bits, b * BLOCK_BITS, i % BLOCK_BITS))
+
+    def rank_bit(self, i: int) -> Tuple[int, int]:
+        """(rank1(i), bit i) d'une seule lecture, pour 0 <= i < n."""
+        b, r = divmod(i, BLOCK_BITS)
+        x = read_bits(self._bits, i - r, r + 1)
+        bit = x >> r
+        return self._supers[b // BLOCKS_PER_SUPER] + self._blocks[b] + popcount(x) - bit, bit
+
+    def rank0(self, i: int) -> int:
+        return i - self.rank1(i)
+
+    def select1(self, j: int) -> int:
+        """Position du j-ieme bit a 1 (j compte a partir de 0)."""
+        if not 0 <= j < self.ones:
+            raise IndexError("select index out of range")
+        s = j // SAMPLE
+        lo = self._samples[s] // BLOCK_BITS
+        if (s + 1) * SAMPLE < self.ones:
+            hi = self._samples[s + 1] // BLOCK_BITS
+        else:
+            hi = self.nblocks - 1
+        # dernier bloc dont le rang de depart est <= j
+        while lo < hi:
+            mid = (lo + hi + 1) // 2
+            if self._block_rank(mid) <= j:
+                lo = mid
+            else:
+                hi = mid - 1
+        bits = read_bits(self._bits, lo * BLOCK_BITS, BLOCK_BITS)
+        for _ in range(j - self._block_rank(lo)):
+            bits &= bits - 1
+        return lo * BLOCK_BITS + (bits & -bits).bit_length() - 1
+
+    def iter_ones(self, j: int = 0) -> Iterator[int]:
+        """Positions croissantes des bits a 1, a partir du j-ieme."""
+        if j >= self.ones:
+            return
+        pos = self.select1(j)
+        step = 1 << 15
+        while pos < self.n:
+            width = min(step, self.n - pos)
+            big = read_bits(self._bits, pos, width)
+            if big:
+                flags = format(big, "b")[::-1].encode().translate(_FLAGS)
+                yield from compress(range(pos, pos + len(flags)), flags)
+            pos += width
+
+    def release(self) -> None:
+        for view in (self._bits, self._supers, self._blocks, self._samples):
+            if isinstance(view, memoryview):
+                view.release()
@@ -0,0 +1,155 @@
+﻿from __future__ import annotations
+import mmap
+import os
+import struct
+from typing import List
+
+from .access import BatchAccessMixin
+from .auto import READERS as BLOB_READERS
+from .cache import CachedReader
+from .container import ContainerReader, MAGIC as CONTAINER_MAGIC
+from .core import read_bits, from_unsigned, restore, BitReader
+from .factory import read_header, HEADER_SIZE
+from .noncrossing import start_bit_of
+from .vertical import read_vertical, words_for
+from .parallel import SegmentedReader, SEG_MAGIC
+from .stream import (
+    parse_stream_header, parse_frame, STREAM_MAGIC, HEAD_SIZE, FRAME_SIZES, INDEX_MAGIC,
+    INDEX_ENTRY_FMT, INDEX_ENTRY_SIZE, TRAILER_FMT, TRAILER_SIZE
+)
+
+
+def _map_file(path: str, min_size: int) -> mmap.mmap:
+    with open(path, "rb") as f:
+        size = os.fstat(f.fileno()).st_size
+        if size < min_size:
+            raise ValueError("File too short or corrupted")
+        return mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+
+class MappedReader(BatchAccessMixin):
+    """Acces direct a un fichier BPK1/BPK2 via mmap : get(i) ne lit qu'un ou deux mots."""
+
+    def __init__(self, path: str):
+        self._mm = _map_file(path, HEADER_SIZE)
+        size = len(self._mm)
+        try:
+            (self.mode, self.k, self.n, self.wlen, self.base, self.zigzag,
+             off) = read_header(self._mm)
+            if size < off + 4 * self.wlen:
+                raise ValueError("Truncated words section")
+            if self.mode == "vertical":
+                if self.wlen < words_for(self.n, self.k):
+                    raise ValueError("Words section too short for n values")
+            elif self.n and self._start_bit(self.n - 1) + self.k > 32 * self.wlen:
+                raise ValueError("Words section too short for n values")
+        except ValueError:
+            self._mm.close()
+            raise
+        self._words = memoryview(self._mm)[off : off + 4 * self.wlen]
+
+    def _start_bit(self, i: int) -> int:
+        if self.mode == "crossing":
+            return i * self.k
+        return start_bit_of(i, self.k)
+
+    def get(self, i: int) -> int:
+        if i < 0 or i >= self.n:
+            raise IndexError("index out of range")
+        if self.mode == "vertical":
+            return restore(read_vertical(self._words, i, self.k), self.base, self.zigzag)
+        return restore(read_bits(self._words, self._start_bit(i), self.k), self.base, self.zigzag)
+
+    def _decode_run(self, start: int, count: int) -> List[int]:
+        if self.mode != "crossing":
+            return super()._decode_run(start, count)
+        vals = BitReader(self._words, start * self.k).read_many(count, self.k)
+        return from_unsigned(vals, self.base, self.zigzag)
+
+    def close(self) -> None:
+        if self._mm.closed:
+            return
+        self._words.release()
+        self._mm.close()
+
+    def __enter__(self) -> "MappedReader":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+
+class BlockedReader(BatchAccessMixin):
+    """Acces direct a un fichier en blocs (BPS1) : l'index de fin donne le bloc de i."""
+
+    def __init__(self, path: str):
+        self._mm = _map_file(path, HEAD_SIZE + min(FRAME_SIZES.values()) + TRAILER_SIZE)
+        try:
+            self.mode, self.block_size, self.version = parse_stream_header(self._mm[:HEAD_SIZE])
+            index_off, self.nblocks, self.n, magic = struct.unpack_from(
+                TRAILER_FMT, self._mm, len(self._mm) - TRAILER_SIZE)
+            if magic != INDEX_MAGIC:
+                raise ValueError("Missing block index")
+            if index_off + self.nblocks * INDEX_ENTRY_SIZE != len(self._mm) - TRAILER_SIZE:
+                raise ValueError("Corrupted block index")
+            if self.nblocks != -(-self.n // self.block_size):
+                raise ValueError("Corrupted block index")
+        except (ValueError, struct.error):
+            self._mm.close()
+            raise
+        self._index_off = index_off
+        self._frame_size = FRAME_SIZES[self.version]
+
+    def block_info(self, b: int):
+        return struct.unpack_from(INDEX_ENTRY_FMT, self._mm, self._index_off + b * INDEX_ENTRY_SIZE)
+
+    def get(self, i: int) -> int:
+        if i < 0 or i >= self.n:
+            raise IndexError("index out of range")
+        b, j = divmod(i, self.block_size)
+        off, _ = self.block_info(b)
+        # la base du bloc est dans son frame, juste avant les mots
+        k, _, _, base, zigzag = parse_frame(self._mm, off, self.version)
+        start = j * k if self.mode == "crossing" else start_bit_of(j, k)
+        words = off + self._frame_size
+        value = read_bits(self._mm[words + (start >> 3) : words + ((start + k + 7) >> 3)], start & 7, k)
+        return restore(value, base, zigzag)
+
+    def close(self) -> None:
+        self._mm.close()
+
+    def __enter__(self) -> "BlockedReader":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+
+# signature -> lecteur : cls(binaire) en memoire, cls.open(chemin) via mmap ; BPS1 et BPK
+# (par defaut) ont leurs lecteurs de fichier ci-dessus
+READERS = {**BLOB_READERS, SEG_MAGIC: SegmentedReader, CONTAINER_MAGIC: ContainerReader}
+
+
+def open_reader(path: str, cache: int = 0):
+    """Lecteur sur place d'apres la signature ; cache > 0 : cache LRU de blocs de cette taille (octets)."""
+    reader = _open_reader(path)
+    return CachedReader(reader, cache) if cache > 0 else reader
+
+
+def _open_reader(path: str):
+    with open(path, "rb") as f:
+        magic = f.read(4)
+    if magic == STREAM_MAGIC:
+        return BlockedReader(path)
+    reader_cls = READERS.get(magic)
+    if reader_cls is not None:
+        return reader_cls.open(path)
+    return MappedReader(path)
+
+
+def reader_from_bytes(data):
+    """Lecteur sur un binaire deja en memoire (stdin, tube) ; BPK : loads_packed, BPS1 : decompress_stream."""
+    reader_cls = READERS.get(bytes(data[:4]))
+    if reader_cls is None:
+        raise ValueError("Bad magic: not an in-place readable binary")
+    return reader_cls(data)
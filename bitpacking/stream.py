@@ -0,0 +1,135 @@
+﻿from __future__ import annotations
+import struct
+from itertools import islice
+from typing import BinaryIO, Iterable, Iterator, List, Tuple
+
+from .access import has_magic
+from .core import words_to_bytes, words_from_bytes, Words, FLAG_ZIGZAG
+from .factory import CompressorFactory, MODE_CROSSING, MODE_NONCROSS
+
+STREAM_MAGIC = b"BPS1"
+STREAM_VERSION = 2
+DEFAULT_BLOCK_SIZE = 1 << 16
+
+HEAD_FMT = "<4sBBI"     # magic, version, mode, block_size
+FRAME_FMT = "<BIIBq"    # k, n, wlen, flags, base du bloc ; n == 0 marque la fin du flux
+FRAME_V1_FMT = "<BII"   # version 1 : pas de reference par bloc
+# pied de fichier : index des blocs (offset, k) puis trailer de taille fixe
+INDEX_MAGIC = b"BPSI"
+INDEX_ENTRY_FMT = "<QB"     # offset du frame, k du bloc
+TRAILER_FMT = "<QIQ4s"      # offset de l'index, nb de blocs, n total, magic
+HEAD_SIZE = struct.calcsize(HEAD_FMT)
+FRAME_SIZE = struct.calcsize(FRAME_FMT)
+_FRAME_FMTS = {1: FRAME_V1_FMT, 2: FRAME_FMT}
+FRAME_SIZES = {v: struct.calcsize(fmt) for v, fmt in _FRAME_FMTS.items()}
+INDEX_ENTRY_SIZE = struct.calcsize(INDEX_ENTRY_FMT)
+TRAILER_SIZE = struct.calcsize(TRAILER_FMT)
+
+_MODES = {"crossing": MODE_CROSSING, "non_crossing": MODE_NONCROSS}
+_MODE_NAMES = {v: k for k, v in _MODES.items()}
+
+
+def iter_blocks_of(ints: Iterable[int], block_size: int) -> Iterator[List[int]]:
+    it = iter(ints)
+    while True:
+        block = list(islice(it, block_size))
+        if not block:
+            return
+        yield block
+
+
+def write_blocks(out: BinaryIO, mode: str, block_size: int, packers: Iterable) -> Tuple[int, int]:
+    if mode not in _MODES:
+        raise ValueError(f"Unknown mode: {mode}")
+    if not 0 < block_size < (1 << 32):
+        raise ValueError("block_size must be in [1, 2**32)")
+    out.write(struct.pack(HEAD_FMT, STREAM_MAGIC, STREAM_VERSION, _MODES[mode], block_size))
+    pos = HEAD_SIZE
+    index = bytearray()
+    total = 0
+    nblocks = 0
+    for comp in packers:
+        index += struct.pack(INDEX_ENTRY_FMT, pos, comp.k)
+        body = words_to_bytes(comp.words)
+        out.write(struct.pack(FRAME_FMT, comp.k, comp.n, len(comp.words),
+                              FLAG_ZIGZAG if comp.zigzag else 0, comp.base))
+        out.write(body)
+        pos += FRAME_SIZE + len(body)
+        total += comp.n
+        nblocks += 1
+    out.write(struct.pack(FRAME_FMT, 0, 0, 0, 0, 0))
+    pos += FRAME_SIZE
+    out.write(index)
+    out.write(struct.pack(TRAILER_FMT, pos, nblocks, total, INDEX_MAGIC))
+    return total, nblocks
+
+
+def compress_stream(ints: Iterable[int], out: BinaryIO, mode: str = "crossing",
+                    block_size: int = DEFAULT_BLOCK_SIZE, zigzag: bool = False) -> Tuple[int, int]:
+    # un bloc a la fois : la memoire depend de block_size, pas de la taille du fichier
+    # chaque bloc choisit sa propre base
+    packers = (CompressorFactory.create_from_list(mode, block, zigzag)
+               for block in iter_blocks_of(ints, block_size))
+    return write_blocks(out, mode, block_size, packers)
+
+
+def _read_exact(f: BinaryIO, size: int) -> bytes:
+    data = f.read(size)
+    if len(data) != size:
+        raise ValueError("Truncated stream")
+    return data
+
+
+def parse_stream_header(head: bytes) -> Tuple[str, int, int]:
+    """(mode, block_size, version)."""
+    magic, version, mode, block_size = struct.unpack(HEAD_FMT, head)
+    if magic != STREAM_MAGIC:
+        raise ValueError("Bad magic/version")
+    if version not in _FRAME_FMTS:
+        raise ValueError(f"Bad version: {version}")
+    if mode not in _MODE_NAMES:
+        raise ValueError("Unknown mode code")
+    return _MODE_NAMES[mode], block_size, version
+
+
+def read_stream_header(f: BinaryIO) -> Tuple[str, int, int]:
+    return parse_stream_header(_read_exact(f, HEAD_SIZE))
+
+
+def parse_frame(data, offset: int = 0, version: int = STREAM_VERSION) -> Tuple[int, int, int, int, bool]:
+    """(k, n, wlen, base, zigzag) du frame a offset."""
+    fields = struct.unpack_from(_FRAME_FMTS[version], data, offset)
+    if version == 1:
+        return fields + (0, False)
+    k, n, wlen, flags, base = fields
+    return k, n, wlen, base, bool(flags & FLAG_ZIGZAG)
+
+
+def iter_frames_after_header(f: BinaryIO, version: int = STREAM_VERSION
+                             ) -> Iterator[Tuple[int, int, Words, int, bool]]:
+    while True:
+        k, n, wlen, base, zigzag = parse_frame(_read_exact(f, FRAME_SIZES[version]), 0, version)
+        if n == 0:
+            return
+        yield k, n, words_from_bytes(_read_exact(f, 4 * wlen)), base, zigzag
+
+
+def iter_frames(f: BinaryIO) -> Iterator[Tuple[int, int, Words, int, bool]]:
+    _, _, version = read_stream_header(f)
+    yield from iter_frames_after_header(f, version)
+
+
+def packer_from_frame(mode: str, k: int, n: int, words: Words, base: int = 0, zigzag: bool = False):
+    if mode == "crossing":
+        return CompressorFactory.from_packed_crossing(k, n, words, base, zigzag)
+    return CompressorFactory.from_packed_noncross(k, n, words, base, zigzag)
+
+
+def decompress_stream(f: BinaryIO) -> Iterator[int]:
+    mode, _, version = read_stream_header(f)
+    for frame in iter_frames_after_header(f, version):
+        yield from packer_from_frame(mode, *frame).to_list()
+
+
+def is_stream_file(path: str) -> bool:
+    return has_magic(path, STREAM_MAGIC)
@@ -0,0 +1,89 @@
+﻿from __future__ import annotations
+from math import gcd
+from typing import List
+
+from .core import (
+    words_needed, words_from_bytes, new_words, choose_reference, WORD_BITS, WORD_MASK, INT64_MAX
+)
+from .crossing import BitPackingCrossing
+
+try:
+    import numpy as np
+except ImportError:  # numpy est optionnel : on garde le chemin pur Python
+    np = None
+
+HAVE_NUMPY = np is not None
+
+# au-dela, une valeur peut toucher 3 mots : on laisse le chemin pur Python
+MAX_VECTOR_K = WORD_BITS
+
+
+def pack_crossing(vals, k: int):
+    n = len(vals)
+    nwords = words_needed(n * k)
+    # un mot de garde pour le debordement de la derniere valeur
+    out = np.zeros(nwords + 1, dtype=np.uint64)
+    period = WORD_BITS // gcd(k, WORD_BITS)
+
+    # toutes les valeurs d'une meme classe i % period ont le meme decalage
+    # dans leur mot, et deux valeurs d'une meme classe ne partagent jamais
+    # un mot : l'affectation vectorisee ne perd donc aucun bit
+    for r in range(min(period, n)):
+        sel = vals[r::period]
+        wi = (np.arange(r, n, period, dtype=np.int64) * k) >> 5
+        off = (r * k) % WORD_BITS
+        out[wi] |= (sel << np.uint64(off)) & np.uint64(WORD_MASK)
+        if off + k > WORD_BITS:
+            out[wi + 1] |= sel >> np.uint64(WORD_BITS - off)
+
+    return words_from_bytes(out[:nwords].astype("<u4").tobytes())
+
+
+def unpack_crossing(words, k: int, n: int):
+    w = np.zeros(len(words) + 1, dtype=np.uint64)
+    w[: len(words)] = np.frombuffer(words, dtype=np.uint32)
+    start = np.arange(n, dtype=np.int64) * k
+    wi = start >> 5
+    off = (start & 31).astype(np.uint64)
+    lo = w[wi] >> off
+    # off == 0 : w < 2**32 donc le decalage de 32 reste dans un uint64
+    hi = w[wi + 1] << (np.uint64(WORD_BITS) - off)
+    return (lo | hi) & np.uint64((1 << k) - 1)
+
+
+class BitPackingCrossingNumpy(BitPackingCrossing):
+
+    @classmethod
+    def from_list(cls, ints: List[int], zigzag: bool = False) -> "BitPackingCrossing":
+        n = len(ints)
+        if n == 0:
+            return cls(k=0, n=0, words=new_words())
+        arr = np.asarray(ints)
+        if arr.dtype.kind not in "iu" or zigzag:
+            # entiers trop grands pour un dtype natif, ou zigzag demande
+            return cls._from_list_python(ints, zigzag)
+        lo, hi = int(arr.min()), int(arr.max())
+        base, zigzag = choose_reference(lo, hi)
+        k = max(1, (hi - base).bit_length())
+        if k > MAX_VECTOR_K or zigzag:
+            return cls._from_list_python(ints, zigzag)
+        if base:
+            # hi - base < 2**32 : la soustraction reste dans le dtype
+            arr = arr - arr.dtype.type(base)
+        words = pack_crossing(arr.astype(np.uint64), k)
+        return cls(k=k, n=n, words=words, base=base)
+
+    @classmethod
+    def _from_list_python(cls, ints: List[int], zigzag: bool = False) -> "BitPackingCrossing":
+        if not isinstance(ints, list):
+            ints = np.asarray(ints).tolist()
+        bp = BitPackingCrossing.from_list(ints, zigzag)
+        return cls(k=bp.k, n=bp.n, words=bp.words, base=bp.base, zigzag=bp.zigzag)
+
+    def to_list(self) -> List[int]:
+        if self.k == 0 or self.k > MAX_VECTOR_K or self.zigzag or self.base + (1 << self.k) > INT64_MAX:
+            return super().to_list()
+        vals = unpack_crossing(self.words, self.k, self.n)
+        if self.base:
+            vals = vals.astype(np.int64) + self.base
+        return vals.tolist()
@@ -0,0 +1,186 @@
+﻿from __future__ import annotations
+from typing import List
+
+from .access import BatchAccessMixin
+from .core import (
+    new_words, as_words, words_view, words_from_bytes, choose_reference, to_unsigned,
+    from_unsigned, restore, BitReader, BitWriter, Words, WORD_BITS, WORD_MASK, INT64_MAX
+)
+from .vectorized import np, HAVE_NUMPY
+
+# bloc de 128 valeurs sur 4 voies de 32 bits (un registre de 128 bits) :
+# la valeur r du bloc va dans la voie r % 4, a la position r // 4 de cette voie,
+# et le mot w de la voie l est range a l'indice 4 * w + l du bloc (4 * k mots)
+BLOCK = 128
+LANES = 4
+PER_LANE = BLOCK // LANES
+
+
+def _lane_slots(k: int):
+    # (mot, decalage, deborde) des 32 valeurs d'une voie : la meme suite pour tous les blocs
+    return [((j * k) >> 5, (j * k) & 31, (j * k) & 31 > WORD_BITS - k) for j in range(PER_LANE)]
+
+
+def vertical_slot(i: int, k: int):
+    """(indice du mot, decalage) de la valeur i ; la suite eventuelle est au mot + 4."""
+    b, r = divmod(i, BLOCK)
+    bit = (r // LANES) * k
+    return b * LANES * k + LANES * (bit >> 5) + r % LANES, bit & 31
+
+
+def read_vertical(buf, i: int, k: int) -> int:
+    # buf : octets little-endian des mots (bytes, memoryview, mmap)
+    idx, off = vertical_slot(i, k)
+    v = int.from_bytes(buf[4 * idx : 4 * idx + 4], "little") >> off
+    if off > WORD_BITS - k:
+        idx += LANES
+        v |= int.from_bytes(buf[4 * idx : 4 * idx + 4], "little") << (WORD_BITS - off)
+    return v & ((1 << k) - 1)
+
+
+def words_for(n: int, k: int) -> int:
+    # le dernier bloc est complete par des zeros
+    return -(-n // BLOCK) * LANES * k
+
+
+def pack_vertical(vals: List[int], k: int) -> Words:
+    nblocks = -(-len(vals) // BLOCK)
+    out = new_words(nblocks * LANES * k)
+    for b in range(nblocks):
+        block = vals[b * BLOCK : (b + 1) * BLOCK]
+        base = b * LANES * k
+        for lane in range(LANES):
+            writer = BitWriter()
+            writer.write_many(block[lane::LANES], k)
+            lane_words = writer.words()
+            out[base + lane : base + lane + LANES * len(lane_words) : LANES] = lane_words
+    return out
+
+
+def unpack_vertical(words: Words, k: int, b0: int, b1: int) -> List[int]:
+    # blocs [b0, b1) en pur Python : une lecture groupee par voie
+    out: List[int] = []
+    for b in range(b0, b1):
+        base = b * LANES * k
+        lanes = [BitReader(words_view(words[base + lane : base + LANES * k : LANES])).read_many(PER_LANE, k)
+                 for lane in range(LANES)]
+        for row in zip(*lanes):
+            out += row
+    return out
+
+
+def pack_vertical_numpy(vals, k: int) -> Words:
+    nblocks = -(-len(vals) // BLOCK)
+    v = np.zeros(nblocks * BLOCK, dtype=np.uint64)
+    v[: len(vals)] = vals
+    v = v.reshape(nblocks, PER_LANE, LANES)
+    out = np.zeros((nblocks, k, LANES), dtype=np.uint64)
+    for j, (w, off, spill) in enumerate(_lane_slots(k)):
+        out[:, w, :] |= (v[:, j, :] << np.uint64(off)) & np.uint64(WORD_MASK)
+        if spill:
+            out[:, w + 1, :] |= v[:, j, :] >> np.uint64(WORD_BITS - off)
+    return words_from_bytes(out.astype("<u4").tobytes())
+
+
+def unpack_vertical_numpy(words, k: int, b0: int, b1: int):
+    # meme suite de decalages et de masques pour chaque bloc et chaque voie
+    w = np.frombuffer(words, dtype=np.uint32)[b0 * LANES * k : b1 * LANES * k]
+    w = w.reshape(b1 - b0, k, LANES)
+    out = np.empty((b1 - b0, PER_LANE, LANES), dtype=np.uint32)
+    mask = np.uint32((1 << k) - 1)
+    for j, (wi, off, spill) in enumerate(_lane_slots(k)):
+        lo = w[:, wi, :] >> np.uint32(off)
+        if spill:
+            # les bits au-dela de 32 tombent d'eux-memes dans un uint32
+            lo |= w[:, wi + 1, :] << np.uint32(WORD_BITS - off)
+        out[:, j, :] = lo & mask
+    return out.reshape(-1)
+
+
+class BitPackingVertical(BatchAccessMixin):
+
+    def __init__(self, k: int, n: int, words: Words, base: int = 0, zigzag: bool = False):
+        if not 0 <= k <= WORD_BITS:
+            raise ValueError("vertical layout needs 0 <= k <= 32")
+        if n < 0:
+            raise ValueError("n must be >= 0")
+        self.k = k
+        self.n = n
+        self.words = as_words(words)
+        self.base = base
+        self.zigzag = zigzag
+
+    @classmethod
+    def from_list(cls, ints: List[int], zigzag: bool = False) -> "BitPackingVertical":
+        n = len(ints)
+        if n == 0:
+            return cls(k=0, n=0, words=new_words())
+        if HAVE_NUMPY and isinstance(ints, np.ndarray):
+            return cls._from_array(ints, zigzag)
+        base, zigzag = choose_reference(min(ints), max(ints), zigzag)
+        vals = to_unsigned(ints, base, zigzag)
+        k = max(1, max(vals).bit_length())
+        if k > WORD_BITS:
+            raise ValueError("vertical layout needs values within 32 bits of the base")
+        if HAVE_NUMPY:
+            words = pack_vertical_numpy(np.asarray(vals, dtype=np.uint64), k)
+        else:
+            words = pack_vertical(vals, k)
+        return cls(k=k, n=n, words=words, base=base, zigzag=zigzag)
+
+    @classmethod
+    def _from_array(cls, arr, zigzag: bool = False) -> "BitPackingVertical":
+        # ndarray (entree binaire mmappee) : min, max et base sans int Python par valeur
+        if arr.dtype.kind not in "iu" or zigzag:
+            return cls.from_list(arr.tolist(), zigzag)
+        lo, hi = int(arr.min()), int(arr.max())
+        base, zigzag = choose_reference(lo, hi)
+        if zigzag:
+            return cls.from_list(arr.tolist(), zigzag)
+        k = max(1, (hi - base).bit_length())
+        if k > WORD_BITS:
+            raise ValueError("vertical layout needs values within 32 bits of the base")
+        if base:
+            # max - base < 2**32 : la soustraction reste dans le dtype
+            arr = arr - arr.dtype.type(base)
+        return cls(k=k, n=len(arr), words=pack_vertical_numpy(arr.astype(np.uint64), k), base=base)
+
+    def get(self, i: int) -> int:
+        if i < 0 or i >= self.n:
+            raise IndexError("index out of range")
+        k = self.k
+        idx, off = vertical_slot(i, k)
+        v = self.words[idx] >> off
+        if off > WORD_BITS - k:
+            # la suite de la valeur est dans le mot suivant de la meme voie
+            v |= self.words[idx + LANES] << (WORD_BITS - off)
+        return restore(v & ((1 << k) - 1), self.base, self.zigzag)
+
+    def _decode_run(self, start: int, count: int) -> List[int]:
+        if count <= 0:
+            return []
+        b0 = start // BLOCK
+        b1 = (start + count - 1) // BLOCK + 1
+        off = start - b0 * BLOCK
+        if HAVE_NUMPY:
+            vals = unpack_vertical_numpy(self.words, self.k, b0, b1)[off : off + count].tolist()
+        else:
+            vals = unpack_vertical(self.words, self.k, b0, b1)[off : off + count]
+        return from_unsigned(vals, self.base, self.zigzag)
+
+    def to_array(self):
+        """Tableau NumPy de toutes les valeurs, sans passer par des int Python."""
+        if self.k == 0:
+            return np.zeros(0, dtype=np.int64)
+        vals = unpack_vertical_numpy(self.words, self.k, 0, -(-self.n // BLOCK))[: self.n]
+        if self.zigzag:
+            vals = vals.astype(np.int64)
+            return ((vals >> 1) ^ -(vals & 1)) + self.base
+        if self.base:
+            if self.base + (1 << self.k) > INT64_MAX:
+                raise OverflowError("values do not fit in int64")
+            return vals.astype(np.int64) + self.base
+        return vals
+
+    def to_list(self) -> List[int]:
+        return self._decode_run(0, self.n)
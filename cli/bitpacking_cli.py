@@ -1,31 +1,78 @@
-﻿import click
-import re
-from typing import List
+﻿import asyncio
+import click
+import io
+import os
+import sys
+from typing import Iterable
 
 from bitpacking.factory import (
-    CompressorFactory, save_binary, load_binary
+    CompressorFactory, dumps_binary, loads_packed
 )
+from bitpacking.auto import compress_auto, choose_codec, codec_of
+from bitpacking.container import ContainerReader, pack_container
 from bitpacking.crossing import BitPackingCrossing
-from bitpacking.noncrossing import BitPackingNonCrossing
+from bitpacking.vertical import BitPackingVertical
+from bitpacking.reader import open_reader, reader_from_bytes, READERS
+from bitpacking.blocked import DEFAULT_BLOCK_SIZE as BLOCKED_BLOCK_SIZE
+from bitpacking.parallel import compress_parallel, decompress_parallel, SEG_MAGIC, CODECS as SEG_CODECS
+from bitpacking.stream import (
+    compress_stream, decompress_stream, STREAM_MAGIC, DEFAULT_BLOCK_SIZE
+)
+from cli import lookup_server
+from cli.ints_io import FORMATS, read_ints, iter_ints, write_ints, as_list, packer_input
 
 
-def _read_ints_text(path: str) -> List[int]:
-    ints: List[int] = []
-   
-    with open(path, "r", encoding="utf-8-sig") as f:
-        for line in f:
-            
-            tokens = re.split(r"[,\s;]+", line.strip())
-            for tok in tokens:
-                if tok == "":
-                    continue
-                ints.append(int(tok))
-    return ints
+def _read_input(path: str, fmt: str):
+    try:
+        return read_ints(path, fmt)
+    except (OSError, ValueError) as e:
+        raise click.ClickException(str(e))
+
+
+def _write_output(path: str, data: bytes) -> None:
+    # "-" : binaire sur stdout
+    if path == "-":
+        sys.stdout.buffer.write(data)
+        sys.stdout.buffer.flush()
+        return
+    with open(path, "wb") as f:
+        f.write(data)
+
+
+def _read_binary(path: str):
+    """Octets de stdin ("-") ou d'un fichier non regulier (tube) ; None pour un fichier ordinaire."""
+    if path == "-":
+        return sys.stdin.buffer.read()
+    try:
+        if os.path.isfile(path):
+            return None
+        with open(path, "rb") as f:
+            return f.read()
+    except OSError as e:
+        raise click.ClickException(str(e))
+
+
+def _file_magic(path: str) -> bytes:
+    with open(path, "rb") as f:
+        return f.read(4)
+
+
+def _write_values(path: str, ints: Iterable[int], fmt: str) -> int:
+    try:
+        return write_ints(path, ints, fmt)
+    except ValueError as e:
+        raise click.ClickException(str(e))
 
 
-def _write_ints_text(path: str, ints: List[int]) -> None:
-    with open(path, "w", encoding="utf-8") as f:
-        f.write(" ".join(str(x) for x in ints))
+def _report(output: str, msg: str) -> None:
+    # stdout porte les donnees quand la sortie est "-" : le bilan passe sur stderr
+    click.echo(msg, err=output == "-")
+
+
+def _reference_note(comp) -> str:
+    if comp.zigzag:
+        return ", zigzag"
+    return f", base={comp.base}" if comp.base else ""
 
 
 @click.group()
@@ -35,36 +82,171 @@ def cli():
 
 
 @cli.command()
-@click.option("--input", "-i", required=True, help="Input file (plaintext integers)")
-@click.option("--output", "-o", required=True, help="Output binary file (.bin)")
+@click.option("--input", "-i", required=True,
+              help="Input integers: text, raw .u32/.u64 or .npy ('-' = stdin)")
+@click.option("--output", "-o", required=True, help="Output binary file (.bin, '-' = stdout)")
+@click.option("--input-format", default="auto", show_default=True, type=click.Choice(FORMATS),
+              help="Input format (auto: from the extension, text otherwise)")
 @click.option("--mode", "-m", default="crossing",
-              type=click.Choice(["crossing", "non_crossing"]),
-              help="Compression mode")
-def compress(input, output, mode):
+              type=click.Choice(["crossing", "non_crossing", "blocked", "delta", "delta2", "vertical",
+                                 "auto"]),
+              help="Compression mode (auto: codec picked by sampling)")
+@click.option("--stream", is_flag=True,
+              help="Pack fixed-size blocks as they are read (bounded memory)")
+@click.option("--block-size", default=None, type=int,
+              help="Values per block with --stream (65536) or -m blocked (1024)")
+@click.option("--jobs", "-j", default=1, show_default=True, type=int,
+              help="Worker processes; > 1 packs independent segments in parallel")
+@click.option("--speed-weight", default=0.0, show_default=True, type=click.FloatRange(0.0, 1.0),
+              help="With -m auto: 0 = smallest file, 1 = fastest decode")
+@click.option("--container", is_flag=True,
+              help="Write a BPC1 container (64-bit counts, CRC32C per section); "
+                   "not with --stream (use -m blocked); overflow, PFOR and rank overflow: "
+                   "overflow_cli --container")
+@click.option("--block-crc", is_flag=True, help="With --container: also one CRC32C per 64 KiB block")
+def compress(input, output, input_format, mode, stream, block_size, jobs, speed_weight, container,
+             block_crc):
    
-    ints = _read_ints_text(input)
-    comp = CompressorFactory.create_from_list(mode, ints)
-    save_binary(output, mode, comp.k, comp.n, comp.words)
-    click.echo(f"OK: {comp.n} integers -> {len(comp.words)} words (k={comp.k}, mode={mode})")
+    if container:
+        if stream:
+            raise click.ClickException("--container is not supported with --stream (use -m blocked)")
+        if jobs > 1 and mode not in SEG_CODECS:
+            raise click.ClickException(f"--container --jobs is not supported with -m {mode}")
+        ints = _read_input(input, input_format)
+        options = {}
+        if jobs > 1:
+            # segments en parallele, chacun avec son codec (auto : choisi par segment) ;
+            # la vue binaire n'est convertie que segment par segment
+            codec = "segmented"
+            options = dict(inner=mode, jobs=jobs, speed_weight=speed_weight)
+        elif mode == "blocked":
+            ints = as_list(ints)
+            codec = mode
+            options = dict(block_size=block_size or BLOCKED_BLOCK_SIZE)
+        else:
+            ints = as_list(ints)
+            codec = choose_codec(ints, speed_weight) if mode == "auto" else mode
+        try:
+            data = pack_container(codec, ints, block_crc, **options)
+        except ValueError as e:
+            raise click.ClickException(str(e))
+        _write_output(output, data)
+        _report(output, f"OK: {len(ints)} integers -> {len(data)} bytes (container, codec={codec})")
+        return
+    if mode == "auto":
+        if stream:
+            raise click.ClickException("--stream is not supported with -m auto")
+        # --block-size ou --jobs : un codec par segment, sinon un seul pour le fichier
+        ints = as_list(_read_input(input, input_format))
+        data = compress_auto(ints, speed_weight, block_size, jobs)
+        _write_output(output, data)
+        _report(output, f"OK: {len(ints)} integers -> {len(data)} bytes (mode=auto, codec={codec_of(data)})")
+        return
+    delta = mode in ("delta", "delta2")
+    if (delta or mode == "vertical") and (stream or jobs > 1):
+        raise click.ClickException(f"--stream and --jobs are not supported with -m {mode}")
+    if jobs > 1:
+        if stream or mode == "blocked":
+            raise click.ClickException("--jobs is not supported with --stream or -m blocked")
+        ints = _read_input(input, input_format)
+        try:
+            data = compress_parallel(ints, mode, jobs)
+        except ValueError as e:
+            raise click.ClickException(str(e))
+        _write_output(output, data)
+        _report(output, f"OK: {len(ints)} integers -> {len(data)} bytes (mode={mode}, jobs={jobs})")
+        return
+    if stream or mode == "blocked":
+        # blocked = blocs crossing avec chacun leur k, index de blocs en fin de fichier
+        inner = "crossing" if mode == "blocked" else mode
+        if block_size is None:
+            block_size = BLOCKED_BLOCK_SIZE if mode == "blocked" else DEFAULT_BLOCK_SIZE
+        try:
+            if output == "-":
+                n, nblocks = compress_stream(iter_ints(input, input_format), sys.stdout.buffer, inner,
+                                             block_size)
+            else:
+                with open(output, "wb") as f:
+                    n, nblocks = compress_stream(iter_ints(input, input_format), f, inner, block_size)
+        except ValueError as e:
+            raise click.ClickException(str(e))
+        _report(output, f"OK: {n} integers -> {nblocks} blocks (mode={mode}, block_size={block_size})")
+        return
+    # crossing / vertical : la vue binaire est packee sans passer par des int Python
+    ints = packer_input(_read_input(input, input_format), mode)
+    try:
+        comp = CompressorFactory.create_from_list(mode, ints)
+    except ValueError as e:
+        raise click.ClickException(str(e))
+    if delta:
+        # residus packes en crossing, checkpoint absolu tous les comp.interval
+        _write_output(output, comp.blob)
+        _report(output, f"OK: {comp.n} integers -> {len(comp.blob)} bytes (mode={mode}, "
+                   f"checkpoint every {comp.interval})")
+        return
+    _write_output(output, dumps_binary(mode, comp.k, comp.n, comp.words, comp.base, comp.zigzag))
+    _report(output, f"OK: {comp.n} integers -> {len(comp.words)} words (k={comp.k}, mode={mode}"
+               f"{_reference_note(comp)})")
 
 
 @cli.command()
 @click.option("--input", "-i", required=True, help="Input binary file (.bin)")
-@click.option("--output", "-o", required=True, help="Output plaintext file")
-def decompress(input, output):
+@click.option("--output", "-o", required=True,
+              help="Output integers: text, raw .u32/.u64 or .npy ('-' = stdout)")
+@click.option("--output-format", default="auto", show_default=True, type=click.Choice(FORMATS),
+              help="Output format (auto: from the extension, text otherwise)")
+@click.option("--jobs", "-j", default=1, show_default=True, type=int,
+              help="Worker processes for segmented (--jobs) files")
+def decompress(input, output, output_format, jobs):
     
-    mode, k, n, words = load_binary(input)
-    if mode == "crossing":
-        comp = CompressorFactory.from_packed_crossing(k, n, words)
-    elif mode == "non_crossing":
-        comp = CompressorFactory.from_packed_noncross(k, n, words)
+    # "-" ou tube (/dev/stdin) : lu une seule fois, aiguillage sur la signature du buffer
+    data = _read_binary(input)
+    magic = bytes(data[:4]) if data is not None else _file_magic(input)
+    if magic == SEG_MAGIC:
+        if data is None:
+            with open(input, "rb") as f:
+                data = f.read()
+        ints = decompress_parallel(data, jobs)
+        _write_values(output, ints, output_format)
+        _report(output, f"OK: decompressed {len(ints)} integers (segmented, jobs={jobs})")
+        return
+    if magic in READERS:
+        # un seul aiguillage pour les lecteurs sur place (fichier mmappe ou octets de stdin)
+        try:
+            reader = open_reader(input) if data is None else reader_from_bytes(data)
+            with reader:
+                if isinstance(reader, ContainerReader):
+                    reader.verify()
+                ints = reader.to_list()
+        except ValueError as e:
+            raise click.ClickException(str(e))
+        _write_values(output, ints, output_format)
+        kind = "container, " if isinstance(reader, ContainerReader) else ""
+        _report(output, f"OK: decompressed {len(ints)} integers ({kind}codec={reader.codec})")
+        return
+    if magic == STREAM_MAGIC:
+        # fichier : lu par frames, memoire bornee
+        with (open(input, "rb") if data is None else io.BytesIO(data)) as f:
+            n = _write_values(output, decompress_stream(f), output_format)
+        _report(output, f"OK: decompressed {n} integers (stream)")
+        return
+    if data is None:
+        with open(input, "rb") as f:
+            data = f.read()
+    try:
+        comp = loads_packed(data)
+    except ValueError as e:
+        raise click.ClickException(str(e))
+    if isinstance(comp, BitPackingVertical):
+        mode = "vertical"
     else:
-        raise click.ClickException(f"Unknown mode in file: {mode}")
+        mode = "crossing" if isinstance(comp, BitPackingCrossing) else "non_crossing"
     ints = comp.to_list()
-    if len(ints) != n:
+    if len(ints) != comp.n:
         raise click.ClickException("Decompressed length mismatch")
-    _write_ints_text(output, ints)
-    click.echo(f"OK: decompressed {n} integers (reconstructed mode: k={k}, mode={mode})")
+    _write_values(output, ints, output_format)
+    _report(output, f"OK: decompressed {comp.n} integers (reconstructed mode: k={comp.k}, mode={mode}"
+               f"{_reference_note(comp)})")
 
 
 @cli.command()
@@ -72,20 +254,56 @@ def decompress(input, output):
 @click.option("--index", "-n", "index", required=True, type=int, help="Index to retrieve (0-based)")
 def get(input, index):
     
-    mode, k, n, words = load_binary(input)
-    if index < 0 or index >= n:
-        raise click.ClickException("Index out of range")
-
-    if mode == "crossing":
-        comp = CompressorFactory.from_packed_crossing(k, n, words)
-    elif mode == "non_crossing":
-        comp = CompressorFactory.from_packed_noncross(k, n, words)
-    else:
-        raise click.ClickException(f"Unknown mode in file: {mode}")
-
-    val = comp.get(index)
+    if input == "-" or not os.path.isfile(input):
+        raise click.ClickException("get needs a regular file (it is read in place via mmap)")
+    try:
+        reader = open_reader(input)
+    except ValueError as e:
+        raise click.ClickException(str(e))
+    with reader:
+        if index < 0 or index >= reader.n:
+            raise click.ClickException("Index out of range")
+        val = reader.get(index)
     click.echo(str(val))
 
 
+@cli.command()
+@click.option("--input", "-i", required=True, help="Container file (.bin)")
+def verify(input):
+    """Check the CRC32C of a container without decompressing it"""
+    try:
+        reader = ContainerReader.open(input)
+    except ValueError as e:
+        raise click.ClickException(str(e))
+    with reader:
+        bad = reader.corrupt_blocks()
+    if bad:
+        where = ", ".join(f"section {s} block {b}" for s, b in bad)
+        raise click.ClickException(f"Corrupted: {where}")
+    click.echo(f"OK: {reader.n} integers, all checksums match (codec={reader.codec})")
+
+
+@cli.command()
+@click.option("--input", "-i", required=True, help="Compressed file served by index")
+@click.option("--host", default="127.0.0.1", show_default=True)
+@click.option("--port", default=8000, show_default=True, type=int)
+@click.option("--unix", "unix", default=None, help="Listen on this Unix socket instead of TCP")
+@click.option("--backend", default="mmap", show_default=True, type=click.Choice(["mmap", "executor"]),
+              help="executor : lookups run in a thread (slow storage)")
+@click.option("--cache", default=0, show_default=True, type=int,
+              help="Bytes of decoded blocks kept in an LRU cache (0 = off)")
+def serve(input, host, port, unix, backend, cache):
+    """Serve GET /get?i=..., /get_many?i=... and /info over HTTP"""
+    def ready(server):
+        where = unix or "http://%s:%d" % server.sockets[0].getsockname()[:2]
+        click.echo(f"Serving {input} on {where}", err=True)
+    try:
+        asyncio.run(lookup_server.serve(input, host, port, unix, backend, cache, ready))
+    except (OSError, ValueError) as e:
+        raise click.ClickException(str(e))
+    except KeyboardInterrupt:
+        pass
+
+
 if __name__ == "__main__":
     cli()
@@ -0,0 +1,203 @@
+﻿from __future__ import annotations
+import ast
+import mmap
+import os
+import struct
+import sys
+from array import array
+from typing import Iterable, Iterator, List, Tuple
+
+from bitpacking.stream import iter_blocks_of, DEFAULT_BLOCK_SIZE
+from bitpacking.vectorized import np, HAVE_NUMPY
+
+# formats d'entree / sortie des CLI ; "-" = stdin / stdout
+FORMATS = ["auto", "text", "u32", "u64", "npy"]
+EXTENSIONS = {".u32": "u32", ".u64": "u64", ".npy": "npy"}
+RAW_TYPECODES = {"u32": "I", "u64": "Q"}
+# packers qui prennent un ndarray tel quel (min, max et packing vectorises)
+ARRAY_MODES = ("crossing", "vertical")
+
+NPY_MAGIC = b"\x93NUMPY"
+# dtype .npy -> code memoryview / array
+NPY_TYPECODES = {"u1": "B", "u2": "H", "u4": "I", "u8": "Q", "i1": "b", "i2": "h", "i4": "i", "i8": "q"}
+
+# separateurs du texte : virgule et point-virgule deviennent des espaces
+_SEPARATORS = bytes.maketrans(b",;", b"  ")
+TEXT_CHUNK = 1 << 20
+
+
+def resolve_format(path: str, fmt: str = "auto") -> str:
+    if fmt != "auto":
+        return fmt
+    return EXTENSIONS.get(os.path.splitext(path)[1].lower(), "text")
+
+
+def _read_all(path: str) -> bytes:
+    if path == "-":
+        return sys.stdin.buffer.read()
+    with open(path, "rb") as f:
+        return f.read()
+
+
+def _map(path: str):
+    # fichier : mmap en lecture seule ; stdin : lu en entier
+    if path == "-":
+        return sys.stdin.buffer.read()
+    with open(path, "rb") as f:
+        if os.fstat(f.fileno()).st_size == 0:
+            return b""
+        return mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+
+def _to_ints(tokens: List[bytes]) -> List[int]:
+    try:
+        return list(map(int, tokens))
+    except ValueError as e:
+        raise ValueError(f"Invalid integer in text input: {e}") from None
+
+
+def parse_text(data: bytes) -> List[int]:
+    """Entiers separes par des blancs, virgules ou points-virgules, en un seul passage."""
+    if data[:3] == b"\xef\xbb\xbf":
+        data = data[3:]
+    return _to_ints(data.translate(_SEPARATORS).split())
+
+
+def _npy_layout(buf) -> Tuple[str, int, int]:
+    """(code du dtype, nb de valeurs, offset des donnees) d'un .npy 1-D little-endian."""
+    if bytes(buf[:6]) != NPY_MAGIC:
+        raise ValueError("Not a .npy file")
+    major = buf[6]
+    if major == 1:
+        (hlen,), off = struct.unpack_from("<H", buf, 8), 10
+    else:
+        (hlen,), off = struct.unpack_from("<I", buf, 8), 12
+    header = ast.literal_eval(bytes(buf[off : off + hlen]).decode("latin1"))
+    descr, shape = header["descr"], header["shape"]
+    if header["fortran_order"] or len(shape) != 1:
+        raise ValueError(".npy input must be a 1-D array")
+    if descr[0] not in "<|" or descr[1:] not in NPY_TYPECODES:
+        raise ValueError(f"Unsupported .npy dtype: {descr}")
+    return NPY_TYPECODES[descr[1:]], shape[0], off + hlen
+
+
+def _binary_view(buf, typecode: str, offset: int = 0, count: int = -1):
+    # sans copie : ndarray si NumPy est la, sinon memoryview typee (little-endian natif)
+    size = array(typecode).itemsize
+    if count < 0:
+        if (len(buf) - offset) % size:
+            raise ValueError(f"Binary input size is not a multiple of {size} bytes")
+        count = (len(buf) - offset) // size
+    if len(buf) < offset + count * size:
+        raise ValueError("Truncated binary input")
+    if HAVE_NUMPY:
+        return np.frombuffer(buf, dtype=np.dtype(typecode).newbyteorder("<"), count=count, offset=offset)
+    if sys.byteorder != "little":
+        vals = array(typecode, bytes(buf[offset : offset + count * size]))
+        vals.byteswap()
+        return vals
+    return memoryview(buf)[offset : offset + count * size].cast(typecode)
+
+
+def read_ints(path: str, fmt: str = "auto"):
+    """Texte : List[int]. Binaire (u32, u64, npy) : vue sans copie sur le fichier mmappe."""
+    fmt = resolve_format(path, fmt)
+    if fmt == "text":
+        return parse_text(_read_all(path))
+    buf = _map(path)
+    if fmt == "npy":
+        typecode, count, off = _npy_layout(buf)
+        return _binary_view(buf, typecode, off, count)
+    return _binary_view(buf, RAW_TYPECODES[fmt])
+
+
+def as_list(vals) -> List[int]:
+    # une vue binaire devient une liste d'int en un appel C
+    return vals if isinstance(vals, list) else vals.tolist()
+
+
+def packer_input(vals, mode: str):
+    """La vue binaire va directement aux packers NumPy ; sinon une List[int]."""
+    if HAVE_NUMPY and mode in ARRAY_MODES and isinstance(vals, np.ndarray):
+        return vals
+    return as_list(vals)
+
+
+def iter_ints(path: str, fmt: str = "auto", block: int = DEFAULT_BLOCK_SIZE) -> Iterator[int]:
+    """Lecture par paquets (memoire bornee), pour --stream."""
+    fmt = resolve_format(path, fmt)
+    if fmt != "text":
+        vals = read_ints(path, fmt)
+        for a in range(0, len(vals), block):
+            yield from vals[a : a + block].tolist()
+        return
+    f = sys.stdin.buffer if path == "-" else open(path, "rb")
+    try:
+        rest = b""
+        first = True
+        while True:
+            chunk = f.read(TEXT_CHUNK)
+            if not chunk:
+                break
+            if first and chunk[:3] == b"\xef\xbb\xbf":
+                chunk = chunk[3:]
+            first = False
+            data = (rest + chunk).translate(_SEPARATORS)
+            tokens = data.split()
+            # le dernier jeton peut etre coupe : il attend le paquet suivant
+            rest = tokens.pop() if tokens and not data[-1:].isspace() else b""
+            yield from _to_ints(tokens)
+        yield from _to_ints([rest] if rest else [])
+    finally:
+        if f is not sys.stdin.buffer:
+            f.close()
+
+
+def _npy_header(descr: str, n: int) -> bytes:
+    header = f"{{'descr': '{descr}', 'fortran_order': False, 'shape': ({n},), }}"
+    # en-tete v1.0 complete par des espaces jusqu'a un multiple de 64 octets
+    pad = -(len(NPY_MAGIC) + 4 + len(header) + 1) % 64
+    header = header + " " * pad + "\n"
+    return NPY_MAGIC + b"\x01\x00" + struct.pack("<H", len(header)) + header.encode("latin1")
+
+
+def _open_out(path: str):
+    if path == "-":
+        return sys.stdout.buffer, False
+    return open(path, "wb"), True
+
+
+def write_ints(path: str, ints: Iterable[int], fmt: str = "auto") -> int:
+    """Ecrit les entiers (texte sur une ligne, u32, u64 ou npy) ; renvoie leur nombre."""
+    fmt = resolve_format(path, fmt)
+    head = b""
+    typecode = RAW_TYPECODES.get(fmt)
+    if fmt == "npy":
+        # l'en-tete donne n : on materialise ; u8 par defaut, i8 des qu'une valeur est negative
+        ints = as_list(ints) if hasattr(ints, "tolist") else list(ints)
+        signed = bool(ints) and min(ints) < 0
+        typecode = "q" if signed else "Q"
+        head = _npy_header("<i8" if signed else "<u8", len(ints))
+    f, owned = _open_out(path)
+    count = 0
+    try:
+        f.write(head)
+        # ecriture par paquets pour ne jamais construire toute la sortie en memoire
+        for chunk in iter_blocks_of(ints, DEFAULT_BLOCK_SIZE):
+            if typecode is None:
+                f.write(((" " if count else "") + " ".join(map(str, chunk))).encode("utf-8"))
+            else:
+                try:
+                    packed = array(typecode, chunk)
+                except OverflowError:
+                    raise ValueError(f"Values do not fit in {fmt} output") from None
+                if sys.byteorder != "little":
+                    packed.byteswap()
+                f.write(packed.tobytes())
+            count += len(chunk)
+    finally:
+        if owned:
+            f.close()
+        else:
+            f.flush()
+    return count
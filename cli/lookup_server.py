@@ -0,0 +1,97 @@
+﻿from __future__ import annotations
+import asyncio
+import json
+from typing import List, Optional, Tuple
+from urllib.parse import parse_qs, urlsplit
+
+from bitpacking.aio import AsyncReader
+
+# GET /get?i=3, GET /get_many?i=1,5,9 (ou i=1&i=5), GET /info ; reponses JSON
+MAX_LINE = 1 << 16
+REASONS = {200: "OK", 400: "Bad Request", 404: "Not Found", 405: "Method Not Allowed"}
+
+
+def _indices(query: str) -> List[int]:
+    values = parse_qs(query).get("i")
+    if not values:
+        raise ValueError("missing parameter: i")
+    try:
+        return [int(tok) for v in values for tok in v.split(",") if tok]
+    except ValueError:
+        raise ValueError("i must be integers") from None
+
+
+async def _answer(areader: AsyncReader, method: str, target: str) -> Tuple[int, object]:
+    if method != "GET":
+        return 405, {"error": "only GET is supported"}
+    url = urlsplit(target)
+    if url.path == "/info":
+        return 200, {"n": areader.n, "requests": areader.requests, "batches": areader.batches}
+    if url.path not in ("/get", "/get_many"):
+        return 404, {"error": f"unknown path: {url.path}"}
+    try:
+        idx = _indices(url.query)
+        if url.path == "/get":
+            if len(idx) != 1:
+                raise ValueError("/get takes a single index")
+            return 200, await areader.get(idx[0])
+        return 200, await areader.get_many(idx)
+    except (ValueError, IndexError) as e:
+        return 400, {"error": str(e)}
+
+
+async def _handle(areader: AsyncReader, reader: asyncio.StreamReader,
+                  writer: asyncio.StreamWriter) -> None:
+    # HTTP/1.1 minimal : connexion gardee tant que le client ne demande pas close
+    try:
+        while True:
+            line = await reader.readline()
+            if not line:
+                break
+            headers = {}
+            while True:
+                h = await reader.readline()
+                if h in (b"\r\n", b"\n", b""):
+                    break
+                name, _, value = h.decode("latin1").partition(":")
+                headers[name.strip().lower()] = value.strip().lower()
+            parts = line.decode("latin1").split()
+            if len(parts) != 3:
+                status, payload = 400, {"error": "malformed request line"}
+                keep = False
+            else:
+                status, payload = await _answer(areader, parts[0], parts[1])
+                keep = parts[2] == "HTTP/1.1" and headers.get("connection") != "close"
+            body = json.dumps(payload).encode() + b"\n"
+            writer.write(
+                f"HTTP/1.1 {status} {REASONS[status]}\r\nContent-Type: application/json\r\n"
+                f"Content-Length: {len(body)}\r\nConnection: {'keep-alive' if keep else 'close'}\r\n\r\n"
+                .encode("latin1") + body
+            )
+            await writer.drain()
+            if not keep:
+                break
+    except (ConnectionError, asyncio.LimitOverrunError, ValueError):
+        pass
+    finally:
+        writer.close()
+
+
+async def start_server(areader: AsyncReader, host: str = "127.0.0.1", port: int = 8000,
+                       unix: Optional[str] = None) -> asyncio.AbstractServer:
+    """Serveur de lecture sur TCP (host, port) ou sur une socket Unix (unix = chemin)."""
+    def handler(r, w):
+        return _handle(areader, r, w)
+    if unix is not None:
+        return await asyncio.start_unix_server(handler, unix, limit=MAX_LINE)
+    return await asyncio.start_server(handler, host, port, limit=MAX_LINE)
+
+
+async def serve(path: str, host: str = "127.0.0.1", port: int = 8000, unix: Optional[str] = None,
+                backend: str = "mmap", cache: int = 0, ready=None) -> None:
+    async with await AsyncReader.open(path, backend, cache=cache) as areader:
+        server = await start_server(areader, host, port, unix)
+        if ready is not None:
+            ready(server)
+        async with server:
+            await server.serve_forever()
@@ -1,66 +1,138 @@
-﻿import click, re
-from typing import List
+﻿import click, sys
 from bitpacking.overflow import BitPackerOverflow
-from pathlib import Path
+from bitpacking.delta import compress_delta, ORDERS
+from bitpacking.pfor import compress_pfor
+from bitpacking.overflow_rank import compress_overflow_rank
+from bitpacking.container import ContainerReader, pack_container
+from bitpacking.parallel import compress_parallel, decompress_parallel, SEG_MAGIC
+from bitpacking.reader import open_reader, reader_from_bytes
+from cli.ints_io import FORMATS, read_ints, write_ints, as_list
 
-def _read_ints_text(path: str) -> List[int]:
-    ints: List[int] = []
-   
-    with open(path, "r", encoding="utf-8-sig", errors="ignore") as f:
-        for line in f:
-            for tok in re.split(r"[,\s;]+", line.strip()):
-                if tok:
-                    ints.append(int(tok))
-    return ints
+def _read_input(path: str, fmt: str):
+    # texte : List[int] ; binaire : vue mmappee, convertie par l'appelant si besoin
+    try:
+        return read_ints(path, fmt)
+    except (OSError, ValueError) as e:
+        raise click.ClickException(str(e))
 
-def _write_ints_one_line(path: str, vals: List[int]) -> None:
-    with open(path, "w", encoding="utf-8") as f:
-        f.write(" ".join(str(x) for x in vals))
+def _report(output_path: str, msg: str) -> None:
+    # sortie "-" : les donnees vont sur stdout, le bilan sur stderr
+    click.echo(msg, err=output_path == "-")
 
 @click.group()
 def cli():
     """Overflow BitPacking CLI (indépendant du CLI existant)."""
 
 @cli.command()
-@click.option("--input",  "input_path",  required=True, type=click.Path(exists=True))
-@click.option("--output", "output_path", required=True, type=click.Path())
-def compress(input_path: str, output_path: str):
+@click.option("--input",  "input_path",  required=True, type=click.Path(exists=True, allow_dash=True),
+              help="Entiers en texte, .u32/.u64 brut ou .npy ('-' = stdin)")
+@click.option("--output", "output_path", required=True, type=click.Path(allow_dash=True))
+@click.option("--input-format", default="auto", show_default=True, type=click.Choice(FORMATS),
+              help="Format d'entrée (auto : d'après l'extension, texte sinon)")
+@click.option("--jobs", "-j", default=1, show_default=True, type=int,
+              help="Processus ; > 1 compresse des segments indépendants en parallèle")
+@click.option("--delta", type=click.Choice(list(ORDERS)), default=None,
+              help="Compresse les deltas (ou deltas de deltas) en overflow, avec checkpoints")
+@click.option("--pfor", is_flag=True, default=False,
+              help="Exceptions par bloc de 128 (PFOR) au lieu d'une zone overflow globale")
+@click.option("--rank", is_flag=True, default=False,
+              help="Slots de k' bits sans flag, exceptions trouvées par un index rank/select")
+@click.option("--container", is_flag=True, default=False,
+              help="Conteneur BPC1 (overflow, --pfor, --rank ou --jobs) : n sur 64 bits, "
+                   "CRC32C par section ; pas avec --delta")
+@click.option("--block-crc", is_flag=True, default=False,
+              help="Avec --container : un CRC32C par bloc de 64 Kio en plus")
+def compress(input_path: str, output_path: str, input_format: str, jobs: int, delta: str, pfor: bool,
+             rank: bool, container: bool, block_crc: bool):
     """Compresse en mode OVERFLOW et écrit un binaire."""
-    vals = _read_ints_text(input_path)
-    packer = BitPackerOverflow()
-    blob = packer.compress(vals)
-    with open(output_path, "wb") as f:
-        f.write(blob)
-    click.echo(f"OK: {len(vals)} integers -> overflow binary ({len(blob)} bytes)")
+    vals = _read_input(input_path, input_format)
+    if jobs <= 1:
+        # overflow, PFOR et rank packent en Python : une liste d'int, construite en un appel C ;
+        # avec --jobs, la vue passe telle quelle et n'est convertie que segment par segment
+        vals = as_list(vals)
+    if pfor and (delta or jobs > 1):
+        raise click.ClickException("--pfor n'est pas supporté avec --delta ou --jobs")
+    if rank and (pfor or delta or jobs > 1):
+        raise click.ClickException("--rank n'est pas supporté avec --pfor, --delta ou --jobs")
+    if container and delta:
+        # les deltas du conteneur sont en crossing, pas en overflow
+        raise click.ClickException("--container n'est pas supporté avec --delta")
+    if container and jobs > 1:
+        try:
+            blob = pack_container("segmented", vals, block_crc, inner="overflow", jobs=jobs)
+        except ValueError as e:
+            raise click.ClickException(str(e))
+    elif container:
+        blob = pack_container("pfor" if pfor else "overflow_rank" if rank else "overflow", vals,
+                              block_crc)
+    elif pfor:
+        blob = compress_pfor(vals)
+    elif rank:
+        blob = compress_overflow_rank(vals)
+    elif delta:
+        if jobs > 1:
+            raise click.ClickException("--jobs n'est pas supporté avec --delta")
+        blob = compress_delta(vals, ORDERS[delta], inner="overflow")
+    elif jobs > 1:
+        try:
+            blob = compress_parallel(vals, "overflow", jobs)
+        except ValueError as e:
+            raise click.ClickException(str(e))
+    else:
+        packer = BitPackerOverflow()
+        blob = packer.compress(vals)
+    if output_path == "-":
+        sys.stdout.buffer.write(blob)
+        sys.stdout.buffer.flush()
+    else:
+        with open(output_path, "wb") as f:
+            f.write(blob)
+    _report(output_path, f"OK: {len(vals)} integers -> overflow binary ({len(blob)} bytes)")
 
 @cli.command()
-@click.option("--input",  "input_path",  required=True, type=click.Path(exists=True))
-@click.option("--output", "output_path", required=True, type=click.Path())
-def decompress(input_path: str, output_path: str):
-    """Décompresse un binaire OVERFLOW et écrit un txt (une ligne)."""
-    with open(input_path, "rb") as f:
-        blob = f.read()
-    packer = BitPackerOverflow()
-    out = packer.decompress(blob)
-    _write_ints_one_line(output_path, out)
-    click.echo(f"OK: decompressed {len(out)} integers (overflow)")
+@click.option("--input",  "input_path",  required=True, type=click.Path(exists=True, allow_dash=True))
+@click.option("--output", "output_path", required=True, type=click.Path(allow_dash=True),
+              help="Entiers en texte, .u32/.u64 brut ou .npy ('-' = stdout)")
+@click.option("--output-format", default="auto", show_default=True, type=click.Choice(FORMATS),
+              help="Format de sortie (auto : d'après l'extension, texte sinon)")
+@click.option("--jobs", "-j", default=1, show_default=True, type=int,
+              help="Processus pour un binaire segmenté (--jobs)")
+def decompress(input_path: str, output_path: str, output_format: str, jobs: int):
+    """Décompresse un binaire OVERFLOW et écrit les entiers (txt sur une ligne par défaut)."""
+    if input_path == "-":
+        blob = sys.stdin.buffer.read()
+    else:
+        with open(input_path, "rb") as f:
+            blob = f.read()
+    try:
+        if blob[:4] == SEG_MAGIC:
+            out = decompress_parallel(blob, jobs)
+        else:
+            with reader_from_bytes(blob) as reader:
+                if isinstance(reader, ContainerReader):
+                    reader.verify()
+                out = reader.to_list()
+    except ValueError as e:
+        raise click.ClickException(str(e))
+    try:
+        write_ints(output_path, out, output_format)
+    except ValueError as e:
+        raise click.ClickException(str(e))
+    _report(output_path, f"OK: decompressed {len(out)} integers (overflow)")
 @cli.command()
 @click.option("--input", "input", required=True)
 @click.option("--index", "index", required=True, type=int)
 def get(input, index):
     """Renvoie la valeur à l'indice i directement depuis le fichier overflow."""
-    from pathlib import Path
-    from bitpacking.overflow import BitPackerOverflow
-
-    # Lire le fichier binaire
-    blob = Path(input).read_bytes()
-
-    # Créer une instance du packer et lui assigner le blob
-    packer = BitPackerOverflow()
-    packer.blob = blob  
-
-    
-    val = packer.get(index)
+    # mmap : seul l'en-tete et les octets du slot sont lus
+    try:
+        reader = open_reader(input)
+    except ValueError as e:
+        raise click.ClickException(str(e))
+    with reader:
+        if not (0 <= index < reader.n):
+            raise click.ClickException("Index out of range")
+        val = reader.get(index)
 
     print(val)
 
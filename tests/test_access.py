@@ -0,0 +1,63 @@
+﻿import random
+import pytest
+from bitpacking.crossing import BitPackingCrossing
+from bitpacking.noncrossing import BitPackingNonCrossing
+from bitpacking.overflow import BitPackingOverflow
+from bitpacking.blocked import BitPackingBlocked
+
+NUMS = [random.Random(5).choice([0, 1, 7, 300, 4095, 70000]) for _ in range(500)]
+PACKERS = [
+    BitPackingCrossing.from_list,
+    BitPackingNonCrossing.from_list,
+    BitPackingOverflow.from_list,
+    lambda xs: BitPackingBlocked.from_list(xs, block_size=64),
+]
+
+
+@pytest.mark.parametrize("build", PACKERS)
+def test_slices(build):
+    bp = build(NUMS)
+    assert len(bp) == len(NUMS)
+    assert bp[:] == NUMS
+    assert bp[10:200] == NUMS[10:200]
+    assert bp[3:400:7] == NUMS[3:400:7]
+    assert bp[450:10:-3] == NUMS[450:10:-3]
+    assert bp[::100] == NUMS[::100]
+    assert bp[-1] == NUMS[-1]
+    assert bp[499:1000] == NUMS[499:]
+
+@pytest.mark.parametrize("build", PACKERS)
+def test_get_many_gathers(build):
+    bp = build(NUMS)
+    idx = [5, 6, 6, 9, 30, 31, 499, 0, 250, 251, 260]
+    assert bp.get_many(idx) == [NUMS[i] for i in idx]
+    assert bp.get_many(range(100, 130)) == NUMS[100:130]
+    assert bp.get_many([]) == []
+    with pytest.raises(IndexError):
+        bp.get_many([3, 4, 500])
+    with pytest.raises(IndexError):
+        bp[500]
+
+
+@pytest.mark.parametrize("codec", ["overflow", "pfor", "delta2", "overflow_rank", "segmented", "container"])
+def test_mapped_readers_release_views_on_close(tmp_path, codec):
+    from bitpacking.auto import encode
+    from bitpacking.container import pack_container
+    from bitpacking.overflow_rank import compress_overflow_rank
+    from bitpacking.parallel import compress_parallel
+    from bitpacking.reader import open_reader
+    if codec == "overflow_rank":
+        blob = compress_overflow_rank(NUMS)
+    elif codec == "segmented":
+        blob = compress_parallel(NUMS, "overflow", 1, segment_size=100)
+    elif codec == "container":
+        blob = pack_container("delta2", NUMS)
+    else:
+        blob = encode(codec, NUMS)
+    path = tmp_path / "x.bin"
+    path.write_bytes(blob)
+    with open_reader(str(path)) as r:
+        assert r.to_list() == NUMS and r[7] == NUMS[7]
+    # vues liberees : le mmap est ferme sans BufferError, un second close ne fait rien
+    assert r._mm.closed
+    r.close()
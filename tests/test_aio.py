@@ -0,0 +1,116 @@
+﻿import asyncio
+import json
+import random
+import sys
+import pytest
+from bitpacking.aio import AsyncReader
+from bitpacking.crossing import BitPackingCrossing
+from bitpacking.factory import save_binary
+from bitpacking.overflow import BitPackingOverflow
+from cli.lookup_server import start_server
+
+
+def _files(tmp_path, nums):
+    bpk = tmp_path / "c.bin"
+    bp = BitPackingCrossing.from_list(nums)
+    save_binary(str(bpk), "crossing", bp.k, bp.n, bp.words, bp.base, bp.zigzag)
+    ovf = tmp_path / "o.bin"
+    ovf.write_bytes(BitPackingOverflow.from_list(nums).blob)
+    return [str(bpk), str(ovf)]
+
+
+@pytest.mark.parametrize("backend", ["mmap", "executor"])
+def test_concurrent_gets_are_coalesced(tmp_path, backend):
+    rng = random.Random(1)
+    nums = [rng.randrange(1 << 20) for _ in range(5000)]
+    idx = [rng.randrange(5000) for _ in range(300)]
+
+    async def main(path):
+        async with await AsyncReader.open(path, backend) as r:
+            vals = await asyncio.gather(*(r.get(i) for i in idx))
+            many = await r.get_many(range(100, 200, 3))
+            return vals, many, r.requests, r.batches
+
+    for path in _files(tmp_path, nums):
+        vals, many, requests, batches = asyncio.run(main(path))
+        assert vals == [nums[i] for i in idx]
+        assert many == nums[100:200:3]
+        assert requests == 301
+        # mmap : lecture immediate ; executor : demandes fusionnees
+        assert batches == 301 if backend == "mmap" else batches <= 3
+
+def test_index_errors_only_fail_their_request(tmp_path):
+    nums = list(range(1000))
+
+    async def main(path):
+        async with await AsyncReader.open(path) as r:
+            with pytest.raises(IndexError):
+                await r.get(1000)
+            return await r.get_many([0, 999, 5]), await r.get_many([])
+
+    assert asyncio.run(main(_files(tmp_path, nums)[1])) == ([0, 999, 5], [])
+
+def test_unknown_backend():
+    with pytest.raises(ValueError):
+        AsyncReader(BitPackingOverflow.from_list([1]), "threads")
+
+
+async def _http(port, target, connection="close"):
+    reader, writer = await asyncio.open_connection("127.0.0.1", port)
+    writer.write(f"GET {target} HTTP/1.1\r\nHost: x\r\nConnection: {connection}\r\n\r\n".encode())
+    status = int((await reader.readline()).split()[1])
+    length = 0
+    while True:
+        line = await reader.readline()
+        if line == b"\r\n":
+            break
+        if line.lower().startswith(b"content-length:"):
+            length = int(line.split(b":")[1])
+    body = json.loads(await reader.readexactly(length))
+    writer.close()
+    return status, body
+
+
+def test_http_lookup_server(tmp_path):
+    rng = random.Random(2)
+    nums = [rng.randrange(1 << 30) for _ in range(2000)]
+
+    async def main(path):
+        async with await AsyncReader.open(path) as r:
+            server = await start_server(r, "127.0.0.1", 0)
+            port = server.sockets[0].getsockname()[1]
+            async with server:
+                gets = await asyncio.gather(*(_http(port, f"/get?i={i}") for i in range(0, 2000, 97)))
+                many = await _http(port, "/get_many?i=5,6,7&i=1999")
+                bad = await _http(port, "/get?i=2000")
+                missing = await _http(port, "/nope")
+                info = await _http(port, "/info")
+            return gets, many, bad, missing, info
+
+    for path in _files(tmp_path, nums):
+        gets, many, bad, missing, info = asyncio.run(main(path))
+        assert gets == [(200, nums[i]) for i in range(0, 2000, 97)]
+        assert many == (200, [nums[5], nums[6], nums[7], nums[1999]])
+        assert bad[0] == 400 and missing[0] == 404
+        assert info[1]["n"] == 2000
+
+@pytest.mark.skipif(sys.platform == "win32", reason="Unix sockets")
+def test_unix_socket_keep_alive(tmp_path):
+    nums = list(range(300))
+    sock = str(tmp_path / "s")
+
+    async def main(path):
+        async with await AsyncReader.open(path) as r:
+            async with await start_server(r, unix=sock):
+                reader, writer = await asyncio.open_unix_connection(sock)
+                out = []
+                # deux requetes sur la meme connexion
+                for i in (7, 250):
+                    writer.write(f"GET /get?i={i} HTTP/1.1\r\n\r\n".encode())
+                    while (await reader.readline()) != b"\r\n":
+                        pass
+                    out.append(json.loads(await reader.readline()))
+                writer.close()
+                return out
+
+    assert asyncio.run(main(_files(tmp_path, nums)[0])) == [7, 250]
@@ -0,0 +1,70 @@
+﻿import random
+import pytest
+from bitpacking.auto import (
+    BitPackingAuto, choose_codec, codec_of, compress_auto, encode, estimate_sizes, score_codecs, CODECS
+)
+from bitpacking.factory import CompressorFactory
+from bitpacking.parallel import SegmentedReader
+from bitpacking.reader import open_reader
+
+
+def _data(name, n, seed=0):
+    rng = random.Random(seed)
+    if name == "sorted":
+        return list(range(n))
+    if name == "mixed":
+        return [rng.choice([0, 1, 2, 3, 1024, 2048, 4095]) for _ in range(n)]
+    return [rng.randint(0, 4095) for _ in range(n)]
+
+
+def test_small_input_sizes_are_exact():
+    nums = _data("mixed", 5000)
+    sizes = estimate_sizes(nums)
+    assert sizes == {c: len(encode(c, nums)) for c in CODECS}
+
+def test_large_input_estimates_are_close():
+    nums = _data("mixed", 200_000)
+    for codec, size in estimate_sizes(nums).items():
+        assert abs(size - len(encode(codec, nums))) < 0.05 * size
+
+@pytest.mark.parametrize("name, codec", [("sorted", "delta"), ("mixed", "overflow_rank"), ("uniform", "crossing")])
+def test_picks_smallest_codec(name, codec):
+    assert choose_codec(_data(name, 50_000)) == codec
+
+def test_speed_weight_trades_size_for_decode_cost():
+    nums = _data("mixed", 50_000)
+    assert choose_codec(nums, 0.0) == "overflow_rank"
+    fastest = choose_codec(nums, 1.0)
+    assert fastest in ("vertical", "non_crossing")
+    assert [s for s in score_codecs(nums, 1.0) if s[1] == fastest][0][0] == 1.0
+    with pytest.raises(ValueError):
+        score_codecs(nums, 1.5)
+
+def test_header_records_codec_and_dispatches(tmp_path):
+    for name in ("sorted", "mixed", "uniform"):
+        nums = _data(name, 30_000, 1)
+        bp = CompressorFactory.create_from_list("auto", nums)
+        assert codec_of(bp.blob) == bp.codec == choose_codec(nums)
+        assert bp.to_list() == nums
+        path = tmp_path / f"{name}.bin"
+        bp.save(str(path))
+        with open_reader(str(path)) as r:
+            assert [r.get(i) for i in range(0, 30_000, 997)] == nums[::997]
+
+def test_per_block_choice():
+    # une moitie triee, une moitie melangee : chaque segment garde son codec
+    nums = _data("sorted", 20_000) + _data("mixed", 20_000)
+    blob = compress_auto(nums, block_size=20_000)
+    assert codec_of(blob) == "auto"
+    bp = BitPackingAuto(blob)
+    assert bp.to_list() == nums
+    assert bp[19_990:20_010] == nums[19_990:20_010]
+    with SegmentedReader(blob) as r:
+        assert r.get(5) == 5 and r.get(39_999) == nums[-1]
+    assert len(blob) < len(encode("pfor", nums))
+
+def test_negative_and_empty():
+    rng = random.Random(2)
+    nums = [rng.randint(-1000, 1000) for _ in range(3000)]
+    assert BitPackingAuto.from_list(nums).to_list() == nums
+    assert BitPackingAuto.from_list([]).to_list() == []
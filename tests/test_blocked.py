@@ -0,0 +1,52 @@
+﻿import pytest
+from bitpacking.blocked import BitPackingBlocked
+from bitpacking.factory import CompressorFactory
+from bitpacking.reader import BlockedReader, open_reader
+
+
+def _data():
+    # un seul outlier : seul son bloc paie 30 bits
+    return [i % 7 for i in range(1000)] + [1 << 29] + [3] * 300
+
+def test_per_block_k():
+    nums = _data()
+    bp = BitPackingBlocked.from_list(nums, block_size=256)
+    # les derniers blocs ne contiennent que 3 : base 3, un seul bit
+    assert bp.ks == [3, 3, 3, 30, 1, 1]
+    assert bp.to_list() == nums
+    assert [bp.get(i) for i in (0, 255, 256, 1000, 1300)] == [nums[i] for i in (0, 255, 256, 1000, 1300)]
+
+def test_factory_mode():
+    bp = CompressorFactory.create_from_list("blocked", _data())
+    assert isinstance(bp, BitPackingBlocked)
+
+@pytest.mark.parametrize("mode", ["crossing", "non_crossing"])
+def test_save_load_and_indexed_get(tmp_path, mode):
+    nums = _data()
+    bp = BitPackingBlocked.from_list(nums, block_size=100, mode=mode)
+    path = str(tmp_path / "b.bin")
+    bp.save(path)
+    assert BitPackingBlocked.load(path).to_list() == nums
+    with open_reader(path) as r:
+        assert isinstance(r, BlockedReader)
+        assert r.n == len(nums) and r.nblocks == 14
+        assert [r.get(i) for i in range(r.n)] == nums
+        with pytest.raises(IndexError):
+            r.get(r.n)
+
+def test_missing_index_rejected(tmp_path):
+    path = tmp_path / "b.bin"
+    BitPackingBlocked.from_list(_data()).save(str(path))
+    path.write_bytes(path.read_bytes()[:-1])
+    with pytest.raises(ValueError):
+        BlockedReader(str(path))
+
+def test_per_block_base(tmp_path):
+    # chaque bloc a sa base : une serie lente coute peu de bits par bloc
+    nums = [10 ** 9 + 3 * i for i in range(500)] + [-(i % 11) for i in range(300)]
+    bp = BitPackingBlocked.from_list(nums, block_size=100)
+    assert bp.ks == [9] * 5 + [4] * 3
+    path = str(tmp_path / "b.bin")
+    bp.save(path)
+    with open_reader(path) as r:
+        assert [r.get(i) for i in range(0, r.n, 13)] == nums[::13]
@@ -0,0 +1,77 @@
+﻿import random
+import pytest
+from bitpacking.cache import CachedReader, BLOCK, SCAN_BLOCKS
+from bitpacking.crossing import BitPackingCrossing
+from bitpacking.overflow import BitPackingOverflow
+from bitpacking.pfor import BitPackingPFOR
+from bitpacking.reader import open_reader
+
+
+@pytest.mark.parametrize("cls", [BitPackingCrossing, BitPackingOverflow, BitPackingPFOR])
+def test_same_values_as_the_packer(cls):
+    rng = random.Random(1)
+    nums = [rng.randrange(1 << 12) if rng.random() > 0.01 else rng.randrange(1 << 40) for _ in range(3000)]
+    c = CachedReader(cls.from_list(nums), budget=1 << 20)
+    idx = [rng.randrange(3000) for _ in range(2000)]
+    assert [c.get(i) for i in idx] == [nums[i] for i in idx]
+    assert c.get_many(idx) == [nums[i] for i in idx]
+    assert c[250:1400:3] == nums[250:1400:3]
+    assert c[-1] == nums[-1] and len(c) == 3000
+    assert c.to_list() == nums
+    with pytest.raises(IndexError):
+        c.get(3000)
+
+def test_hit_and_miss_counters():
+    nums = list(range(10 * BLOCK))
+    c = CachedReader(BitPackingCrossing.from_list(nums))
+    assert c.get(5) == 5 and (c.hits, c.misses) == (0, 1)
+    assert c.get(BLOCK - 1) == BLOCK - 1 and (c.hits, c.misses) == (1, 1)
+    assert c.get(BLOCK) == BLOCK and (c.hits, c.misses) == (1, 2)
+    assert c.get_many(range(3, 2 * BLOCK, 7)) == list(range(3, 2 * BLOCK, 7))
+    assert (c.hits, c.misses) == (3, 2)
+    assert c.hit_rate == 0.6
+    assert c.stats()["blocks"] == 2
+
+def test_budget_evicts_least_recently_used():
+    nums = list(range(10 * BLOCK))
+    one = CachedReader(BitPackingCrossing.from_list(nums))
+    one.get(0)
+    c = CachedReader(BitPackingCrossing.from_list(nums), budget=2 * one.size)
+    c.get(0)
+    c.get(BLOCK)
+    c.get(0)               # le bloc 0 redevient le plus recent
+    c.get(2 * BLOCK)       # evince le bloc 1
+    assert c.evictions == 1 and c.size <= c.budget
+    c.get(1)
+    c.get(BLOCK + 1)
+    assert (c.hits, c.misses) == (2, 4)
+
+def test_large_values_and_tiny_budget():
+    nums = [(1 << 63) + i for i in range(600)] + [-(1 << 70), 1 << 70]
+    c = CachedReader(BitPackingOverflow.from_list(nums), budget=1)
+    assert [c.get(i) for i in range(len(nums))] == nums
+    assert c.size == 0 and c.stats()["blocks"] == 0
+
+def test_long_scans_bypass_the_cache():
+    nums = list(range(20 * BLOCK))
+    c = CachedReader(BitPackingCrossing.from_list(nums))
+    assert c[0 : (SCAN_BLOCKS + 2) * BLOCK] == nums[: (SCAN_BLOCKS + 2) * BLOCK]
+    assert c.misses == 0 and c.size == 0
+
+def test_invalidate_after_append():
+    bp = BitPackingCrossing.from_list([1, 2, 3])
+    c = CachedReader(bp)
+    assert c[0:3] == [1, 2, 3]
+    bp.append(4)
+    bp[0] = 7
+    c.invalidate()
+    assert c[0:4] == [7, 2, 3, 4]
+
+def test_open_reader_with_cache(tmp_path):
+    nums = list(range(5000))
+    path = tmp_path / "o.bin"
+    path.write_bytes(BitPackingOverflow.from_list(nums).blob)
+    with open_reader(str(path), cache=1 << 16) as r:
+        assert isinstance(r, CachedReader)
+        assert [r.get(i) for i in (10, 11, 4999, 12)] == [10, 11, 4999, 12]
+        assert r.hits == 2
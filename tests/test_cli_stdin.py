@@ -0,0 +1,53 @@
+﻿import random
+import pytest
+from click.testing import CliRunner
+from cli.bitpacking_cli import cli
+from cli.ints_io import read_ints, as_list
+
+
+def _nums():
+    rng = random.Random(4)
+    return [rng.randrange(1 << 12) if rng.random() > 0.02 else rng.randrange(1 << 30) for _ in range(3000)]
+
+
+COMPRESS = [
+    ["-m", "crossing"],
+    ["-m", "non_crossing"],
+    ["-m", "vertical"],
+    ["-m", "delta"],
+    ["-m", "auto"],
+    ["-m", "crossing", "--jobs", "2"],
+    ["-m", "crossing", "--stream", "--block-size", "500"],
+    ["-m", "crossing", "--container"],
+]
+
+
+@pytest.mark.parametrize("args", COMPRESS, ids=lambda a: "-".join(x.strip("-") for x in a))
+def test_decompress_reads_every_format_from_stdin(tmp_path, args):
+    nums = _nums()
+    src, packed, out = tmp_path / "in.txt", tmp_path / "p.bin", tmp_path / "out.txt"
+    src.write_text(" ".join(map(str, nums)))
+    runner = CliRunner()
+    res = runner.invoke(cli, ["compress", "-i", str(src), "-o", str(packed)] + args)
+    assert res.exit_code == 0, res.output
+    res = runner.invoke(cli, ["decompress", "-i", "-", "-o", str(out)], input=packed.read_bytes())
+    assert res.exit_code == 0, res.output
+    assert as_list(read_ints(str(out))) == nums
+
+
+def test_decompress_overflow_family_from_stdin(tmp_path):
+    from bitpacking.overflow import BitPackingOverflow
+    from bitpacking.overflow_rank import compress_overflow_rank
+    from bitpacking.pfor import compress_pfor
+    nums = _nums()
+    out = tmp_path / "out.txt"
+    for blob in (BitPackingOverflow.from_list(nums).blob, compress_pfor(nums), compress_overflow_rank(nums)):
+        res = CliRunner().invoke(cli, ["decompress", "-i", "-", "-o", str(out)], input=blob)
+        assert res.exit_code == 0, res.output
+        assert as_list(read_ints(str(out))) == nums
+
+
+def test_get_rejects_stdin():
+    res = CliRunner().invoke(cli, ["get", "-i", "-", "-n", "0"], input=b"BPK1")
+    assert res.exit_code != 0
+    assert "regular file" in res.output
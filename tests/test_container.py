@@ -0,0 +1,127 @@
+﻿import random
+import struct
+import pytest
+from bitpacking.checksum import crc32c, crc32c_py
+from bitpacking.container import (
+    ContainerReader, pack_container, register_codec, REGISTRY, HEADER_SIZE, FOOTER_SIZE
+)
+from bitpacking.reader import open_reader
+
+
+def test_crc32c_known_values():
+    assert crc32c_py(b"123456789") == 0xE3069283
+    assert crc32c(b"123456789") == 0xE3069283
+    data = bytes(range(256)) * 3
+    assert crc32c(data[100:], crc32c(data[:100])) == crc32c_py(data)
+
+@pytest.mark.parametrize("codec", sorted(REGISTRY))
+def test_roundtrip_every_codec(codec):
+    rng = random.Random(5)
+    for n in (0, 1, 129, 2000):
+        nums = [rng.choice([0, 1, 2, 3, 1024, 2048, 4095, -5]) for _ in range(n)]
+        with ContainerReader(pack_container(codec, nums), verify=True) as r:
+            assert r.codec == codec and r.n == n
+            assert r.to_list() == nums
+            assert [r.get(i) for i in range(0, n, 7)] == nums[::7]
+            assert r[5:900:3] == nums[5:900:3]
+
+@pytest.mark.parametrize("codec,options", [
+    ("blocked", {"block_size": 100}),
+    ("segmented", {"inner": "overflow", "segment_size": 700}),
+    ("segmented", {"inner": "auto", "segment_size": 500, "jobs": 2}),
+])
+def test_codec_options(codec, options):
+    nums = [i % 97 + (1 << 40) * (i % 331 == 0) - 3 * (i > 1500) for i in range(2000)]
+    with ContainerReader(pack_container(codec, nums, **options), verify=True) as r:
+        assert r.to_list() == nums
+        assert [r.get(i) for i in range(0, 2000, 13)] == nums[::13]
+        assert r[95:1405:2] == nums[95:1405:2]
+
+def test_block_checksums_locate_corruption():
+    blob = bytearray(pack_container("crossing", list(range(10_000)), block_crc=True, block_bytes=1024))
+    assert ContainerReader(bytes(blob)).corrupt_blocks() == []
+    # section 1 = les mots, juste apres les parametres (13 octets)
+    blob[HEADER_SIZE + 13 + 3 * 1024 + 5] ^= 1
+    r = ContainerReader(bytes(blob))
+    assert r.corrupt_blocks() == [(1, 3)]
+    with pytest.raises(ValueError, match="section 1"):
+        r.verify()
+    with pytest.raises(ValueError):
+        ContainerReader(bytes(blob), verify=True)
+
+def test_table_and_header_are_checked():
+    blob = pack_container("overflow", [1, 2, 3, 1 << 40])
+    n_off = 8
+    bad = blob[:n_off] + struct.pack("<Q", 5) + blob[n_off + 8 :]
+    with pytest.raises(ValueError, match="CRC"):
+        ContainerReader(bad)
+    with pytest.raises(ValueError, match="footer"):
+        ContainerReader(blob[:-1])
+    assert len(blob) > HEADER_SIZE + FOOTER_SIZE
+
+def test_lazy_reader_on_file(tmp_path):
+    nums = list(range(0, 300_000, 3))
+    path = tmp_path / "c.bin"
+    path.write_bytes(pack_container("auto", nums, block_crc=True))
+    with open_reader(str(path)) as r:
+        assert isinstance(r, ContainerReader) and r.codec == "delta"
+        assert r.get(99_999) == nums[-1]
+        assert r.corrupt_blocks(1) == []
+
+def test_registry_rejects_duplicate_ids():
+    with pytest.raises(ValueError):
+        register_codec("other", REGISTRY["pfor"][0], None, None)
+
+@pytest.mark.parametrize("codec", ["pfor", "delta", "delta2", "overflow_rank"])
+def test_params_live_in_section_zero(codec):
+    nums = [i * 3 + (1 << 30) * (i % 97 == 0) for i in range(5000)]
+    r = ContainerReader(pack_container(codec, nums))
+    # parametres en section 0, pas de binaire complet avec son propre en-tete
+    assert len(r._sections) > 2 and 0 < len(r._sections[0]) <= 64
+    # ni en-tete de codec ni n sur 32 bits dans les sections de donnees
+    magics = (b"BPpf", b"BPD1", b"BPrs", b"BPK1", b"BPK2", b"BPov")
+    assert all(bytes(sec[:4]) not in magics for sec in r._sections[1:])
+    assert r.to_list() == nums
+
+def test_legacy_blob_sections_still_open():
+    from bitpacking.auto import encode
+    from bitpacking.container import _open_delta, _open_pfor
+    nums = list(range(0, 30_000, 7))
+    for codec, open_ in [("pfor", _open_pfor), ("delta", _open_delta), ("delta2", _open_delta)]:
+        assert open_(len(nums), [b"", encode(codec, nums)]).to_list() == nums
+
+@pytest.mark.parametrize("flag", [[], ["--pfor"], ["--rank"], ["--jobs", "2"]])
+def test_overflow_cli_container(tmp_path, flag):
+    nums = [i % 50 + (1 << 30) * (i % 31 == 0) for i in range(3000)]
+    src, out = tmp_path / "in.txt", tmp_path / "out.bpc"
+    src.write_text(" ".join(map(str, nums)))
+    from click.testing import CliRunner
+    from cli.overflow_cli import cli
+    runner = CliRunner()
+    res = runner.invoke(cli, ["compress", "--input", str(src), "--output", str(out),
+                         "--container", "--block-crc"] + flag)
+    assert res.exit_code == 0, res.output
+    assert out.read_bytes()[:4] == b"BPC1"
+    res = runner.invoke(cli, ["get", "--input", str(out), "--index", "31"])
+    assert res.output.strip() == str(nums[31])
+    res = runner.invoke(cli, ["decompress", "--input", "-", "--output", "-"],
+                        input=out.read_bytes())
+    assert res.exit_code == 0 and list(map(int, res.stdout.split())) == nums
+
+@pytest.mark.parametrize("args,codec", [
+    (["-m", "blocked", "--block-size", "64"], "blocked"),
+    (["-m", "auto", "--jobs", "2"], "segmented"),
+])
+def test_bitpacking_cli_container_modes(tmp_path, args, codec):
+    nums = [i % 50 + (1 << 30) * (i % 31 == 0) for i in range(3000)]
+    src, out = tmp_path / "in.txt", tmp_path / "out.bpc"
+    src.write_text(" ".join(map(str, nums)))
+    from click.testing import CliRunner
+    from cli.bitpacking_cli import cli
+    runner = CliRunner()
+    res = runner.invoke(cli, ["compress", "-i", str(src), "-o", str(out), "--container"] + args)
+    assert res.exit_code == 0, res.output
+    with open_reader(str(out)) as r:
+        assert r.codec == codec and r.to_list() == nums
+    res = runner.invoke(cli, ["compress", "-i", str(src), "-o", str(out), "--container", "--stream"])
+    assert res.exit_code != 0
@@ -48,3 +48,89 @@ def test_invalid_value_raises():
     words = []
     with pytest.raises(ValueError):
         pack_bits(words, 0, value=8, width=3)  
+
+def test_words_bytes_little_endian():
+    from bitpacking.core import new_words, words_to_bytes, words_from_bytes
+    words = new_words(2)
+    pack_bits(words, 28, 0xABCDE, 20)
+    data = words_to_bytes(words)
+    assert data == (0xABCDE << 28).to_bytes(8, "little")
+    assert words_from_bytes(data) == words
+    assert words.itemsize == 4
+
+def test_bitwriter_matches_pack_bits():
+    import random
+    from bitpacking.core import BitWriter, new_words
+    rng = random.Random(3)
+    fields = [(rng.randrange(1 << w), w) for w in [rng.randint(0, 40) for _ in range(300)]]
+    ref = new_words()
+    writer = BitWriter()
+    pos = 0
+    for v, w in fields:
+        pack_bits(ref, pos, v, w)
+        writer.write(v, w)
+        pos += w
+    assert writer.bit_length == pos
+    assert writer.words() == ref
+
+def test_bitwriter_bulk_unaligned_and_reader():
+    from bitpacking.core import BitWriter, BitReader
+    vals = [(i * 2654435761) % (1 << 13) for i in range(100)]
+    writer = BitWriter()
+    writer.write(5, 3)
+    writer.write_many(vals, 13)
+    reader = BitReader(writer.words())
+    assert reader.read(3) == 5
+    assert reader.read_many(100, 13) == vals
+    assert reader.pos == 3 + 100 * 13
+    assert BitReader(writer.words(), 3 + 13 * 40).read_many(5, 13) == vals[40:45]
+
+def test_zigzag_and_reference_choice():
+    from bitpacking.core import zigzag_encode, zigzag_decode, choose_reference
+    assert [zigzag_encode(v) for v in (0, -1, 1, -2, 2)] == [0, 1, 2, 3, 4]
+    for v in (0, 5, -5, (1 << 70), -(1 << 70)):
+        assert zigzag_decode(zigzag_encode(v)) == v
+    # base seulement si elle fait gagner des bits (BPK1 inchange sinon)
+    assert choose_reference(1, 2047) == (0, False)
+    assert choose_reference(1000, 1100) == (1000, False)
+    assert choose_reference(-3, 10) == (-3, False)
+    assert choose_reference(-(1 << 70), 1) == (0, True)
+
+def _field_by_field(words, start, count, k):
+    # chemin generique de reference
+    return [unpack_bits(words, start + i * k, k) for i in range(count)]
+
+@pytest.mark.parametrize("k", range(1, 33))
+def test_group_decoders_match_generic(k):
+    import random
+    from bitpacking.core import BitWriter, group_decoder
+    rng = random.Random(k)
+    vals = [rng.randrange(1 << k) for _ in range(96)] + [(1 << k) - 1] * 32
+    writer = BitWriter()
+    writer.write_many(vals, k)
+    words = writer.words()
+    decode = group_decoder(k)
+    assert group_decoder(k) is decode
+    for g in range(4):
+        assert list(decode(*words[g * k : (g + 1) * k])) == _field_by_field(words, g * 32 * k, 32, k)
+
+@pytest.mark.parametrize("k", [1, 3, 7, 13, 24, 25, 32, 33])
+def test_read_many_unaligned_runs(k):
+    import random
+    from bitpacking.core import BitWriter, BitReader
+    rng = random.Random(k)
+    vals = [rng.randrange(1 << k) for _ in range(500)]
+    writer = BitWriter()
+    writer.write(1, 5)
+    writer.write_many(vals, k)
+    words = writer.words()
+    for start, count in [(0, 500), (1, 499), (37, 200), (64, 65), (3, 20)]:
+        reader = BitReader(words, 5 + start * k)
+        assert reader.read_many(count, k) == vals[start : start + count]
+        assert reader.read_many(count, k) == _field_by_field(words, 5 + (start + count) * k, count, k)
+
+def test_unpack_bits_past_the_end_reads_zeros():
+    words = [0xFFFFFFFF, 0x1]
+    assert unpack_bits(words, 30, 4) == 0b0111
+    assert unpack_bits(words, 60, 10) == 0
+    assert unpack_bits(words, 16, 60) == (0x1FFFFFFFF >> 16)
@@ -1,12 +1,11 @@
-﻿import pytest
-from bitpacking.crossing import BitPackingCrossing
+﻿from bitpacking.crossing import BitPackingCrossing
 from bitpacking.core import WORD_BITS
 
 def test_empty_list():
     bp = BitPackingCrossing.from_list([])
     assert bp.k == 0
     assert bp.n == 0
-    assert bp.words == []
+    assert len(bp.words) == 0
     # to_list vide
     assert bp.to_list() == []
 
@@ -32,6 +31,34 @@ def test_crossing_boundary_behavior():
     assert bp.k == k
     assert bp.to_list() == nums
 
-def test_negative_not_supported():
-    with pytest.raises(ValueError):
-        BitPackingCrossing.from_list([1, -2, 3])
+def test_negative_values_use_base():
+    nums = [1, -2, 3, -7, 0]
+    bp = BitPackingCrossing.from_list(nums)
+    # etendue 10 : 4 bits, base = min
+    assert (bp.k, bp.base, bp.zigzag) == (4, -7, False)
+    assert bp.to_list() == nums
+    assert [bp.get(i) for i in range(5)] == nums
+
+def test_frame_of_reference_saves_bits():
+    nums = list(range(1_000_000, 1_000_101))
+    bp = BitPackingCrossing.from_list(nums)
+    assert (bp.k, bp.base) == (7, 1_000_000)
+    assert bp.to_list() == nums
+    assert bp[50] == 1_000_050
+    zz = BitPackingCrossing.from_list([0, -1, 1, -64, 63], zigzag=True)
+    assert (zz.k, zz.base, zz.zigzag) == (7, 0, True)
+    assert zz.to_list() == [0, -1, 1, -64, 63]
+
+def test_words_are_compact(tmp_path):
+    from array import array
+    from bitpacking.factory import save_binary, load_binary
+    nums = list(range(1000))
+    bp = BitPackingCrossing.from_list(nums)
+    assert isinstance(bp.words, array)
+    assert bp.words.itemsize * len(bp.words) == 4 * 313
+    path = str(tmp_path / "x.bin")
+    save_binary(path, "crossing", bp.k, bp.n, bp.words)
+    mode, k, n, words = load_binary(path)
+    assert (mode, k, n) == ("crossing", bp.k, bp.n)
+    assert isinstance(words, list) and words == list(bp.words)
+    assert BitPackingCrossing(k, n, words).to_list() == nums
@@ -0,0 +1,47 @@
+﻿import random
+import pytest
+from bitpacking.delta import BitPackingDelta, DeltaReader, compress_delta
+from bitpacking.factory import CompressorFactory
+from bitpacking.reader import open_reader
+
+
+@pytest.mark.parametrize("order", [1, 2])
+@pytest.mark.parametrize("inner", ["crossing", "overflow"])
+def test_roundtrip_and_random_access(order, inner):
+    rng = random.Random(order)
+    for n in (0, 1, 2, 15, 16, 17, 300):
+        nums = [rng.randint(-50, 50) for _ in range(n)]
+        bp = BitPackingDelta.from_list(nums, order=order, interval=16, inner=inner)
+        assert bp.to_list() == nums
+        assert [bp.get(i) for i in range(n)] == nums
+        assert bp[5:200:3] == nums[5:200:3]
+
+def test_sorted_column_is_small():
+    nums = list(range(100_000))
+    bp = CompressorFactory.create_from_list("delta", nums)
+    # 1 bit par ecart + la table des checkpoints
+    assert 8 * len(bp.blob) / len(nums) < 1.2
+    assert bp.get(99_999) == 99_999
+
+def test_delta_of_delta_on_growing_steps():
+    # pas qui grandissent regulierement : delta2 ne garde que des 2
+    nums = [1_700_000_000 + i * i for i in range(5000)]
+    one = CompressorFactory.create_from_list("delta", nums)
+    two = CompressorFactory.create_from_list("delta2", nums)
+    assert two.to_list() == nums
+    assert 3 * len(two.blob) < len(one.blob)
+
+def test_reader_on_file(tmp_path):
+    nums = sorted(random.Random(3).randrange(1 << 40) for _ in range(3000))
+    path = tmp_path / "d.bin"
+    path.write_bytes(compress_delta(nums, order=1, interval=64))
+    with open_reader(str(path)) as r:
+        assert isinstance(r, DeltaReader)
+        assert [r.get(i) for i in range(0, 3000, 7)] == nums[::7]
+        with pytest.raises(IndexError):
+            r.get(3000)
+
+def test_truncated_blob_rejected():
+    blob = compress_delta(list(range(500)))
+    with pytest.raises(ValueError):
+        DeltaReader(blob[:-3])
@@ -0,0 +1,93 @@
+﻿import random
+import pytest
+from cli import ints_io
+from cli.ints_io import read_ints, iter_ints, write_ints, parse_text, as_list, packer_input
+from bitpacking.factory import CompressorFactory
+
+
+def test_parse_text_separators_and_bom():
+    data = "\ufeff1, 2;3\n\n 4\t-5 ,6".encode("utf-8")
+    assert parse_text(data) == [1, 2, 3, 4, -5, 6]
+    assert parse_text(b"") == []
+    with pytest.raises(ValueError):
+        parse_text(b"1 x 3")
+
+
+@pytest.mark.parametrize("fmt", ["text", "u32", "u64", "npy"])
+def test_roundtrip_formats(tmp_path, fmt):
+    rng = random.Random(3)
+    ints = [rng.randrange(1 << 32) for _ in range(1000)]
+    path = str(tmp_path / f"vals.{fmt}")
+    assert write_ints(path, ints, fmt) == len(ints)
+    assert as_list(read_ints(path, fmt)) == ints
+
+
+def test_extension_picks_format(tmp_path):
+    ints = [0, 1, 2**40, 7]
+    path = str(tmp_path / "vals.u64")
+    write_ints(path, ints)
+    assert (tmp_path / "vals.u64").stat().st_size == 8 * len(ints)
+    assert as_list(read_ints(path)) == ints
+
+
+def test_npy_signed_and_numpy_files(tmp_path):
+    np = pytest.importorskip("numpy")
+    path = str(tmp_path / "s.npy")
+    write_ints(path, [-3, 0, 5])
+    assert np.load(path).dtype == np.int64
+    assert np.load(path).tolist() == [-3, 0, 5]
+    np.save(str(tmp_path / "u.npy"), np.arange(10, dtype=np.uint16))
+    assert as_list(read_ints(str(tmp_path / "u.npy"))) == list(range(10))
+    np.save(str(tmp_path / "m.npy"), np.zeros((2, 2), dtype=np.uint32))
+    with pytest.raises(ValueError):
+        read_ints(str(tmp_path / "m.npy"))
+
+
+def test_raw_input_errors(tmp_path):
+    path = tmp_path / "bad.u32"
+    path.write_bytes(b"\x01\x02\x03")
+    with pytest.raises(ValueError):
+        read_ints(str(path))
+    with pytest.raises(ValueError):
+        write_ints(str(tmp_path / "neg.u32"), [1, -1])
+
+
+def test_iter_ints_chunk_boundaries(tmp_path, monkeypatch):
+    # des paquets de 7 octets coupent les nombres au milieu
+    monkeypatch.setattr(ints_io, "TEXT_CHUNK", 7)
+    rng = random.Random(4)
+    ints = [rng.randrange(-10**6, 10**6) for _ in range(500)]
+    path = tmp_path / "vals.txt"
+    path.write_text("\ufeff" + ",\n".join(map(str, ints)), encoding="utf-8")
+    assert list(iter_ints(str(path))) == ints
+    raw = str(tmp_path / "vals.u64")
+    write_ints(raw, [abs(v) for v in ints])
+    assert list(iter_ints(raw, block=64)) == [abs(v) for v in ints]
+
+
+@pytest.mark.parametrize("mode", ["crossing", "vertical"])
+def test_binary_view_packs_like_list(tmp_path, mode):
+    np = pytest.importorskip("numpy")
+    rng = random.Random(6)
+    ints = [1000 + rng.randrange(1 << 20) for _ in range(3000)]
+    path = str(tmp_path / "vals.u32")
+    write_ints(path, ints)
+    vals = packer_input(read_ints(path), mode)
+    assert isinstance(vals, np.ndarray)
+    comp = CompressorFactory.create_from_list(mode, vals)
+    ref = CompressorFactory.create_from_list(mode, ints)
+    assert (comp.k, comp.base, list(comp.words)) == (ref.k, ref.base, list(ref.words))
+    assert comp.to_list() == ints
+
+
+@pytest.mark.parametrize("fmt", ["u32", "npy"])
+def test_binary_view_goes_to_parallel_segments(tmp_path, fmt):
+    from bitpacking.parallel import compress_parallel
+    if fmt == "npy":
+        pytest.importorskip("numpy")
+    ints = [i % 300 + (1 << 25) * (i % 97 == 0) for i in range(5000)]
+    path = str(tmp_path / f"vals.{fmt}")
+    write_ints(path, ints)
+    for jobs in (1, 2):
+        assert (compress_parallel(read_ints(path), "overflow", jobs, segment_size=700)
+                == compress_parallel(ints, "overflow", jobs, segment_size=700))
@@ -0,0 +1,99 @@
+﻿import random
+import pytest
+from bitpacking.crossing import BitPackingCrossing
+from bitpacking.noncrossing import BitPackingNonCrossing
+from bitpacking.factory import CompressorFactory, dumps_binary, loads_packed
+
+CLASSES = [BitPackingCrossing, BitPackingNonCrossing]
+
+
+def _fresh(cls, ints):
+    # meme etat que si le tableau avait ete construit d'un coup
+    ref = cls.from_list(ints)
+    return ref.k, ref.n, ref.base, ref.zigzag
+
+
+@pytest.mark.parametrize("cls", CLASSES)
+def test_append_from_empty(cls):
+    rng = random.Random(1)
+    bp = cls.from_list([])
+    ints = []
+    for _ in range(700):
+        v = rng.randrange(100, 1000)
+        bp.append(v)
+        ints.append(v)
+    assert bp.to_list() == ints
+    assert bp[:] == ints and bp.get(699) == ints[-1]
+    # elargi avec une marge d'au plus k // 4 bits
+    k = cls.from_list(ints).k
+    assert k <= bp.k <= k + max(1, k // 4)
+
+
+@pytest.mark.parametrize("cls", CLASSES)
+@pytest.mark.parametrize("k", [1, 3, 7, 13, 31, 32, 33, 40])
+def test_extend_in_place_keeps_layout(cls, k):
+    rng = random.Random(k)
+    ints = [rng.randrange(1 << k) for _ in range(101)] + [(1 << k) - 1, 0]
+    bp = cls.from_list(ints[:5])
+    for a in range(5, len(ints), 17):
+        bp.extend(ints[a : a + 17])
+        assert bp.to_list() == ints[: a + 17]
+    ref = cls.from_list(ints)
+    if bp.k == ref.k and bp.base == ref.base:
+        assert list(bp.words) == list(ref.words)
+
+
+@pytest.mark.parametrize("cls", CLASSES)
+def test_widening_repack(cls):
+    bp = cls.from_list([1, 2, 3])
+    k0 = bp.k
+    bp.append(1 << 40)
+    assert bp.k > k0
+    assert bp.to_list() == [1, 2, 3, 1 << 40]
+    assert (bp.k, bp.n, bp.base, bp.zigzag) == _fresh(cls, bp.to_list())
+    # une seule valeur sous la base : nouvelle reference
+    bp = cls.from_list([1000, 1001, 1002])
+    bp.extend([1003, -5, 7])
+    assert bp.to_list() == [1000, 1001, 1002, 1003, -5, 7]
+    assert (bp.k, bp.n, bp.base, bp.zigzag) == _fresh(cls, bp.to_list())
+
+
+@pytest.mark.parametrize("cls", CLASSES)
+def test_rising_appends_repack_geometrically(cls, monkeypatch):
+    # valeurs qui gagnent un bit toutes les 8 ajouts : 60 re-packings a la largeur exacte
+    repacks = []
+    repack = cls._repack
+    monkeypatch.setattr(cls, "_repack", lambda self, ints: (repacks.append(len(ints)), repack(self, ints)))
+    bp = cls.from_list([1])
+    ints = [1]
+    for i in range(8, 8 * 61):
+        bp.append(1 << (i // 8))
+        ints.append(1 << (i // 8))
+    assert bp.to_list() == ints
+    assert len(repacks) <= 18
+
+
+@pytest.mark.parametrize("cls", CLASSES)
+def test_setitem(cls):
+    rng = random.Random(9)
+    ints = [rng.randrange(-50, 50) for _ in range(300)]
+    bp = cls.from_list(ints)
+    for _ in range(200):
+        i = rng.randrange(-300, 300)
+        v = rng.choice([rng.randrange(-50, 50), rng.randrange(-10**6, 10**6)])
+        bp[i] = v
+        ints[i] = v
+    assert bp.to_list() == ints
+    with pytest.raises(IndexError):
+        bp[300] = 1
+    with pytest.raises(TypeError):
+        bp[1:3] = [1, 2]
+
+
+@pytest.mark.parametrize("mode", ["crossing", "non_crossing"])
+def test_updated_array_saves(mode):
+    bp = CompressorFactory.create_from_list(mode, [5, 6, 7])
+    bp.extend(range(8, 200))
+    bp[0] = -1
+    blob = dumps_binary(mode, bp.k, bp.n, bp.words, bp.base, bp.zigzag)
+    assert loads_packed(blob).to_list() == [-1, 6, 7] + list(range(8, 200))
@@ -0,0 +1,24 @@
+﻿from bitpacking.noncrossing import BitPackingNonCrossing
+from bitpacking.factory import CompressorFactory
+
+def test_roundtrip_12bits():
+    nums = [1, 5, 8, 15, 31, 255, 1023, 4095, 7]
+    bp = BitPackingNonCrossing.from_list(nums)
+    assert bp.k == 12
+    # 2 valeurs de 12 bits par mot
+    assert len(bp.words) == 5
+    assert bp.to_list() == nums
+
+def test_start_bits_is_lazy_view():
+    bp = BitPackingNonCrossing.from_list([4095, 0, 4095, 0, 4095])
+    assert len(bp.start_bits) == 5
+    assert list(bp.start_bits) == [0, 12, 32, 44, 64]
+    assert bp.start_bits[-1] == 64
+    assert bp.start_bits[1:3] == [12, 32]
+    assert "start_bits" not in vars(bp)
+
+def test_from_packed_noncross_roundtrip():
+    nums = [3, 1 << 40, 17, 0]
+    bp = BitPackingNonCrossing.from_list(nums)
+    again = CompressorFactory.from_packed_noncross(bp.k, bp.n, bp.words)
+    assert again.to_list() == nums
@@ -18,3 +18,79 @@ def test_get_index_individual():
     bp = BitPackingOverflow.from_list(nums)
     for i, v in enumerate(nums):
         assert bp.get(i) == v
+
+def _choose_kprime_bruteforce(vals):
+    # ancienne version O(n*K), gardee comme reference
+    import math
+    K = max(1, max(vals).bit_length())
+    best_cost, best = None, None
+    for kprime in range(1, K + 1):
+        over_vals = [v for v in vals if v >= 1 << kprime]
+        if not over_vals:
+            idx_bits, k_over = 0, 1
+        else:
+            idx_bits = max(1, math.ceil(math.log2(len(over_vals))))
+            k_over = max(1, max(over_vals).bit_length())
+        slot_w = 1 + max(kprime, idx_bits)
+        cost = len(vals) * slot_w + len(over_vals) * k_over
+        if best_cost is None or cost < best_cost:
+            best_cost, best = cost, (kprime, idx_bits, slot_w, k_over)
+    return best
+
+def test_histogram_choice_matches_bruteforce():
+    import random
+    from bitpacking.overflow import _choose_kprime
+    rng = random.Random(7)
+    for _ in range(200):
+        n = rng.randint(1, 60)
+        vals = [rng.choice([0, 1, 3, 17, 1024, 4095, 1 << rng.randint(0, 40)]) for _ in range(n)]
+        assert _choose_kprime(vals) == _choose_kprime_bruteforce(vals)
+
+def test_analysis_cached_on_instance():
+    nums = [1, 2, 3, 1024, 4, 5, 2048]
+    bp = BitPackingOverflow.from_list(nums)
+    assert (bp.kprime, bp.m) == (3, 2)
+    assert BitPackingOverflow.from_list([]).m == 0
+
+def test_reader_get_and_get_many(tmp_path):
+    from bitpacking.overflow import BitPackerOverflow, OverflowReader
+    nums = [1, 2, 3, 1024, 4, 5, 2048, 0, 4095]
+    blob = BitPackerOverflow().compress(nums)
+    r = OverflowReader(blob)
+    assert [r.get(i) for i in range(len(nums))] == nums
+    assert r.get_many([8, 3, 3, 0]) == [4095, 1024, 1024, 1]
+    path = tmp_path / "x.ovf"
+    path.write_bytes(blob)
+    with OverflowReader.open(str(path)) as mr:
+        assert mr.get_many(range(len(nums))) == nums
+
+def test_empty_blob_roundtrip():
+    from bitpacking.overflow import BitPackerOverflow, OverflowReader
+    blob = BitPackerOverflow().compress([])
+    assert BitPackerOverflow().decompress(blob) == []
+    assert len(OverflowReader(blob)) == 0
+
+def test_blob_layout_unchanged():
+    # blob produit par l'encodeur champ par champ d'origine
+    from bitpacking.overflow import BitPackerOverflow
+    expected = bytes.fromhex(
+        "42506f76010a0000000302040c02000000020000004216a803e5000000000480ff0f000000")
+    assert BitPackerOverflow().compress([1, 2, 3, 1024, 4, 5, 2048, 0, 4095, 7]) == expected
+
+def test_signed_and_offset_blobs():
+    from bitpacking.overflow import OverflowReader, BitPackerOverflow
+    # petites valeurs des deux signes + un outlier negatif : zigzag bat la base
+    mixed = [0, -1, 2, -3, 1, -2] * 50 + [-(1 << 30)]
+    bp = BitPackingOverflow.from_list(mixed)
+    assert (bp.zigzag, bp.base, bp.kprime) == (True, 0, 3)
+    assert bp.blob[4] == 2
+    assert bp.to_list() == mixed
+    # plage decalee : base = min
+    shifted = [1_000_000 + (i % 9) for i in range(200)] + [1 << 40]
+    bp = BitPackingOverflow.from_list(shifted)
+    assert (bp.zigzag, bp.base, bp.kprime) == (False, 1_000_000, 4)
+    assert bp.to_list() == shifted
+    with OverflowReader(bp.blob) as r:
+        assert r[200] == 1 << 40
+        assert r[10:20] == shifted[10:20]
+    assert BitPackerOverflow().get_blob(bp.blob, 5) == shifted[5]
@@ -0,0 +1,50 @@
+﻿import random
+import pytest
+from bitpacking.parallel import (
+    compress_parallel, decompress_parallel, parse_segments, SegmentedReader
+)
+
+
+def _data(n=5000):
+    rng = random.Random(11)
+    return [rng.choice([0, 3, 1024, 1 << 20, (1 << 40) + 1]) for _ in range(n)]
+
+@pytest.mark.parametrize("codec", ["crossing", "non_crossing", "overflow"])
+def test_pool_matches_inline(codec):
+    nums = _data()
+    inline = compress_parallel(nums, codec, jobs=1, segment_size=1200)
+    pooled = compress_parallel(nums, codec, jobs=2, segment_size=1200)
+    assert pooled == inline
+    mode, n, segs = parse_segments(pooled)
+    assert (mode, n, len(segs)) == (codec, len(nums), 5)
+    assert decompress_parallel(pooled, jobs=2) == nums
+    assert decompress_parallel(pooled, jobs=1) == nums
+
+def test_segmented_reader(tmp_path):
+    nums = _data(3000)
+    path = tmp_path / "x.seg"
+    path.write_bytes(compress_parallel(nums, "overflow", jobs=1, segment_size=700))
+    with SegmentedReader.open(str(path)) as r:
+        assert [r.get(i) for i in range(0, 3000, 7)] == nums[::7]
+        with pytest.raises(IndexError):
+            r.get(3000)
+
+def test_values_out_of_uint64_rejected():
+    with pytest.raises(ValueError):
+        compress_parallel([1 << 64] * 10, "crossing", jobs=2, segment_size=3)
+
+@pytest.mark.parametrize("codec", ["crossing", "overflow"])
+def test_negative_values(codec):
+    nums = [(-1) ** i * (i % 1000) for i in range(4000)]
+    data = compress_parallel(nums, codec, jobs=2, segment_size=1000)
+    assert decompress_parallel(data, jobs=2) == nums
+    assert decompress_parallel(data, jobs=1) == nums
+
+@pytest.mark.parametrize("codec", ["crossing", "overflow"])
+def test_signed_segment_next_to_values_above_int64(codec):
+    # ni "q" ni "Q" ne tiennent les deux segments : retour aux listes Python
+    s = 500
+    nums = [-1] * s + [1 << 63] * s
+    data = compress_parallel(nums, codec, jobs=2, segment_size=s)
+    assert decompress_parallel(data, jobs=2) == nums
+    assert decompress_parallel(data, jobs=1) == nums
@@ -0,0 +1,52 @@
+﻿import random
+import pytest
+from bitpacking.overflow import BitPackingOverflow
+from bitpacking.pfor import BitPackingPFOR, PforReader, compress_pfor, _uses_bitmap
+from bitpacking.reader import open_reader
+
+
+def _gens(rng):
+    return [
+        lambda: rng.randrange(16),
+        lambda: rng.choice([0, 1, 2, 3, 1024, 2048, 4095]),
+        lambda: rng.randrange(256) if rng.random() > 0.02 else rng.randrange(1 << 40),
+        lambda: rng.randint(-100, 100),
+    ]
+
+
+@pytest.mark.parametrize("n", [0, 1, 127, 128, 129, 1000])
+def test_roundtrip_and_random_access(n):
+    rng = random.Random(n)
+    for gen in _gens(rng):
+        nums = [gen() for _ in range(n)]
+        bp = BitPackingPFOR.from_list(nums)
+        assert bp.to_list() == nums
+        assert [bp.get(i) for i in range(n)] == nums
+        assert bp[3:700:4] == nums[3:700:4]
+
+def test_bitmap_and_position_list_blocks():
+    # bloc 0 : 2 exceptions (liste de positions), bloc 1 : 64 exceptions (bitmap)
+    nums = [1] * 128 + [1, 1 << 20] * 64
+    nums[5] = nums[77] = 1 << 30
+    r = PforReader(compress_pfor(nums))
+    assert r.to_list() == nums
+    assert [r.get(i) for i in range(len(nums))] == nums
+    assert not _uses_bitmap(2) and _uses_bitmap(64)
+
+def test_smaller_than_overflow_on_mixed_values():
+    rng = random.Random(7)
+    nums = [rng.choice([0, 1, 2, 3, 1024, 2048, 4095]) for _ in range(20_000)]
+    pfor = BitPackingPFOR.from_list(nums)
+    assert len(pfor.blob) < 0.7 * len(BitPackingOverflow.from_list(nums).blob)
+
+def test_reader_on_file(tmp_path):
+    rng = random.Random(3)
+    nums = [rng.randrange(1 << 12) for _ in range(3000)]
+    nums[100] = -5
+    path = tmp_path / "p.bin"
+    BitPackingPFOR.from_list(nums).save(str(path))
+    with open_reader(str(path)) as r:
+        assert isinstance(r, PforReader)
+        assert [r.get(i) for i in range(0, 3000, 7)] == nums[::7]
+        assert r[90:110] == nums[90:110]
+    assert BitPackingPFOR.load(str(path)).to_list() == nums
@@ -0,0 +1,68 @@
+﻿import random
+import pytest
+from bitpacking.crossing import BitPackingCrossing
+from bitpacking.noncrossing import BitPackingNonCrossing
+from bitpacking.overflow import BitPackingOverflow
+from bitpacking.query import OPS, CHUNK
+from bitpacking.container import ContainerReader, pack_container
+
+PACKERS = [BitPackingCrossing.from_list, BitPackingNonCrossing.from_list, BitPackingOverflow.from_list]
+
+
+def _check(bp, ints, thresholds):
+    assert bp.sum() == sum(ints)
+    assert bp.min() == min(ints)
+    assert bp.max() == max(ints)
+    for op, cmp in OPS.items():
+        for x in thresholds:
+            expected = [i for i, v in enumerate(ints) if cmp(v, x)]
+            assert bp.select(op, x) == expected, (op, x)
+            assert bp.count_where(op, x) == len(expected), (op, x)
+
+
+@pytest.mark.parametrize("build", PACKERS)
+@pytest.mark.parametrize("k", [1, 3, 8, 13, 32, 33, 50])
+def test_operators_match_python(build, k):
+    rng = random.Random(k)
+    # plus d'un paquet, dernier paquet partiel
+    ints = [rng.randrange(1 << k) for _ in range(CHUNK + 333)]
+    picks = [rng.choice(ints) for _ in range(3)]
+    _check(build(ints), ints, [-1, 0, 1, (1 << k) - 1, 1 << k] + picks)
+
+
+@pytest.mark.parametrize("build", PACKERS)
+def test_operators_with_reference(build):
+    rng = random.Random(7)
+    ints = [rng.randrange(-5000, 5000) for _ in range(2500)]
+    _check(build(ints), ints, [-5001, -5000, -1, 0, 17, 4999, 5000])
+    # zigzag impose : l'ordre des valeurs stockees n'est pas conserve
+    zz = BitPackingCrossing.from_list(ints, zigzag=True)
+    _check(zz, ints, [-1, 0, 3])
+
+
+def test_overflow_sections():
+    rng = random.Random(8)
+    ints = [rng.randrange(256) if rng.random() < 0.95 else rng.randrange(1 << 40) for _ in range(6000)]
+    bp = BitPackingOverflow.from_list(ints)
+    _check(bp, ints, [0, 255, 256, 1 << 39, max(ints)])
+    with ContainerReader(pack_container("overflow", ints)) as reader:
+        assert reader._inner.count_where(">=", 256) == sum(v >= 256 for v in ints)
+
+
+def test_bad_calls():
+    bp = BitPackingCrossing.from_list([1, 2, 3])
+    with pytest.raises(ValueError):
+        bp.count_where("=>", 1)
+    with pytest.raises(TypeError):
+        bp.select(">", 1.5)
+    empty = BitPackingNonCrossing.from_list([])
+    assert empty.sum() == 0 and empty.count_where(">", 0) == 0 and empty.select("<", 9) == []
+    with pytest.raises(ValueError):
+        empty.max()
+
+
+def test_operators_after_append():
+    bp = BitPackingCrossing.from_list([5, 9])
+    bp.extend([7, 100, 3])
+    assert bp.select(">", 6) == [1, 2, 3]
+    assert (bp.sum(), bp.min(), bp.max()) == (124, 3, 100)
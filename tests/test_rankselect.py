@@ -0,0 +1,89 @@
+﻿import random
+import pytest
+from bitpacking.overflow import BitPackingOverflow
+from bitpacking.overflow_rank import BitPackingOverflowRank, RankOverflowReader, compress_overflow_rank
+from bitpacking.rankselect import RankSelect, build_rank_select, BLOCK_BITS, SUPER_BITS
+from bitpacking.reader import open_reader
+
+
+@pytest.mark.parametrize("n, p", [(0, 0.5), (1, 1.0), (300, 0.5), (5000, 0.01), (SUPER_BITS + 700, 0.003)])
+def test_rank_select_matches_brute_force(n, p):
+    rng = random.Random(n)
+    ones = [i for i in range(n) if rng.random() < p]
+    rs = RankSelect(build_rank_select(n, ones), n, len(ones))
+    bits = [0] * n
+    for i in ones:
+        bits[i] = 1
+    rank = 0
+    for i in range(n):
+        assert rs.rank1(i) == rank
+        assert rs.rank_bit(i) == (rank, bits[i])
+        rank += bits[i]
+    assert rs.rank1(n) == len(ones)
+    assert [rs.select1(j) for j in range(len(ones))] == ones
+    assert list(rs.iter_ones()) == ones
+    assert list(rs.iter_ones(len(ones) // 2)) == ones[len(ones) // 2:]
+    with pytest.raises(IndexError):
+        rs.select1(len(ones))
+
+def test_dense_blocks_and_block_boundaries():
+    n = 3 * BLOCK_BITS
+    ones = list(range(BLOCK_BITS - 1, 2 * BLOCK_BITS + 1))
+    rs = RankSelect(build_rank_select(n, ones), n, len(ones))
+    assert rs.rank1(BLOCK_BITS) == 1
+    assert rs.rank1(2 * BLOCK_BITS) == BLOCK_BITS + 1
+    assert rs.select1(BLOCK_BITS + 1) == 2 * BLOCK_BITS
+    assert rs.rank0(n) == n - len(ones)
+
+def _gens(rng):
+    return [
+        lambda: rng.randrange(16),
+        lambda: rng.randrange(256) if rng.random() > 0.02 else rng.randrange(1 << 40),
+        lambda: rng.randint(-100, 100) if rng.random() > 0.05 else rng.randint(-(1 << 50), 1 << 50),
+        lambda: 7,
+    ]
+
+
+@pytest.mark.parametrize("n", [0, 1, 255, 256, 257, 3000])
+def test_roundtrip_and_random_access(n):
+    rng = random.Random(n)
+    for gen in _gens(rng):
+        nums = [gen() for _ in range(n)]
+        bp = BitPackingOverflowRank.from_list(nums)
+        assert bp.to_list() == nums
+        assert [bp.get(i) for i in range(n)] == nums
+        assert bp[3:2000:5] == nums[3:2000:5]
+        assert bp.get_many([n - 1 - i for i in range(0, n, 3)]) == [nums[n - 1 - i] for i in range(0, n, 3)]
+
+def test_exceptions_in_order():
+    nums = [1] * 2000
+    for i in (0, 17, 256, 999, 1999):
+        nums[i] = (1 << 33) + i
+    r = RankOverflowReader(compress_overflow_rank(nums))
+    assert r.m == 5
+    assert list(r.exceptions()) == [(i, nums[i]) for i in (0, 17, 256, 999, 1999)]
+    assert list(r.exceptions(3)) == [(999, nums[999]), (1999, nums[1999])]
+
+def test_truncated_blob_rejected():
+    blob = compress_overflow_rank(list(range(1000)) + [1 << 40])
+    with pytest.raises(ValueError):
+        RankOverflowReader(blob[:-8])
+
+def test_smaller_than_overflow_when_the_index_is_wide():
+    # overflow : slot = flag + max(k', bits de l'indice) ; ici l'indice domine
+    rng = random.Random(5)
+    nums = [rng.randrange(16) if rng.random() < 0.97 else rng.randrange(1 << 32) for _ in range(20_000)]
+    rank = BitPackingOverflowRank.from_list(nums)
+    assert len(rank.blob) < 0.7 * len(BitPackingOverflow.from_list(nums).blob)
+
+def test_reader_on_file(tmp_path):
+    rng = random.Random(3)
+    nums = [rng.randrange(1 << 12) for _ in range(3000)]
+    nums[100] = -5
+    path = tmp_path / "r.bin"
+    BitPackingOverflowRank.from_list(nums).save(str(path))
+    with open_reader(str(path)) as r:
+        assert isinstance(r, RankOverflowReader)
+        assert [r.get(i) for i in range(0, 3000, 7)] == nums[::7]
+        assert r[90:110] == nums[90:110]
+    assert BitPackingOverflowRank.load(str(path)).to_list() == nums
@@ -0,0 +1,83 @@
+﻿import pytest
+from bitpacking.crossing import BitPackingCrossing
+from bitpacking.noncrossing import BitPackingNonCrossing, start_bit_of
+from bitpacking.factory import save_binary
+from bitpacking.reader import MappedReader
+
+
+@pytest.mark.parametrize("mode,cls", [("crossing", BitPackingCrossing), ("non_crossing", BitPackingNonCrossing)])
+def test_get_matches_packer(tmp_path, mode, cls):
+    nums = [1, 2, 3, 1024, 4, 5, 2048, 0, 4095, 77]
+    bp = cls.from_list(nums)
+    path = str(tmp_path / "data.bin")
+    save_binary(path, mode, bp.k, bp.n, bp.words)
+    with MappedReader(path) as r:
+        assert (r.mode, r.k, r.n) == (mode, bp.k, len(nums))
+        assert [r.get(i) for i in range(r.n)] == nums
+        with pytest.raises(IndexError):
+            r.get(len(nums))
+
+@pytest.mark.parametrize("k", [1, 5, 12, 31, 32, 33, 40, 64])
+def test_noncrossing_start_bit_closed_form(k):
+    # reference : l'ancienne boucle qui construisait start_bits
+    ref, pos = [], 0
+    for _ in range(9):
+        if pos % 32 + k > 32:
+            pos = (pos // 32 + 1) * 32
+        ref.append(pos)
+        pos += k
+    assert [start_bit_of(i, k) for i in range(9)] == ref
+
+def test_rejects_bad_files(tmp_path):
+    path = tmp_path / "bad.bin"
+    path.write_bytes(b"BPK")
+    with pytest.raises(ValueError):
+        MappedReader(str(path))
+    bp = BitPackingCrossing.from_list(list(range(100)))
+    save_binary(str(path), "crossing", bp.k, bp.n, bp.words)
+    path.write_bytes(path.read_bytes()[:-4])
+    with pytest.raises(ValueError):
+        MappedReader(str(path))
+
+@pytest.mark.parametrize("mode", ["crossing", "non_crossing"])
+def test_reference_header(tmp_path, mode):
+    from bitpacking.factory import (
+        CompressorFactory, load_binary, load_binary_ref, load_packed, MAGIC_REF
+    )
+    nums = [-5, 1000, 17, -5, 300] * 40
+    bp = CompressorFactory.create_from_list(mode, nums)
+    path = str(tmp_path / "ref.bin")
+    save_binary(path, mode, bp.k, bp.n, bp.words, bp.base, bp.zigzag)
+    with open(path, "rb") as f:
+        assert f.read(4) == MAGIC_REF
+    assert load_packed(path).to_list() == nums
+    with pytest.raises(ValueError, match="load"):
+        load_binary(path)
+    mode_, k, n, words, base, zigzag = load_binary_ref(path)
+    assert (mode_, base, zigzag) == (mode, bp.base, bp.zigzag)
+    assert (k, n, list(words)) == (bp.k, bp.n, list(bp.words))
+    with MappedReader(path) as r:
+        assert (r.base, r.k) == (-5, 10)
+        assert [r.get(i) for i in range(r.n)] == nums
+        assert r[3:40] == nums[3:40]
+
+
+def test_one_magic_table_for_files_and_bytes(tmp_path):
+    from bitpacking.auto import encode
+    from bitpacking.container import pack_container
+    from bitpacking.overflow_rank import compress_overflow_rank
+    from bitpacking.parallel import compress_parallel
+    from bitpacking.reader import READERS, open_reader, reader_from_bytes
+    nums = [i * 5 % 1000 for i in range(3000)]
+    blobs = [encode(c, nums) for c in ("overflow", "pfor", "delta", "delta2")]
+    blobs += [compress_overflow_rank(nums), compress_parallel(nums, "crossing", 1, segment_size=1000),
+              pack_container("pfor", nums)]
+    assert {b[:4] for b in blobs} == set(READERS)
+    for j, blob in enumerate(blobs):
+        path = tmp_path / f"{j}.bin"
+        path.write_bytes(blob)
+        with open_reader(str(path)) as a, reader_from_bytes(blob) as b:
+            assert type(a) is type(b)
+            assert a.to_list() == b.to_list() == nums
+    with pytest.raises(ValueError, match="magic"):
+        reader_from_bytes(encode("crossing", nums))
@@ -1,3 +1,31 @@
 ﻿def test_import_cli():
     import cli.bitpacking_cli as mod
     assert hasattr(mod, "cli")
+
+def test_benchmark_case_and_regression_gate():
+    import benchmark
+    r = benchmark.run_case("overflow", "melange", 300, seed=1, repeat=1, warmup=0)
+    data = benchmark.make_data("melange", 300, 1)
+    assert data == benchmark.make_data("melange", 300, 1)
+    assert r["bytes"] == len(benchmark.BitPackingOverflow.from_list(data).blob)
+    assert benchmark.compare([r], {"results": [r]}, 0.25) == ([], [])
+    smaller = dict(r, bytes=r["bytes"] - 1)
+    assert len(benchmark.compare([r], {"results": [smaller]}, 0.25)[0]) == 1
+    # debit : alerte seulement
+    faster = dict(r, get={"median": r["get"]["median"] * 10})
+    regressions, warnings = benchmark.compare([r], {"results": [faster]}, 0.25)
+    assert regressions == [] and len(warnings) == 1
+
+def test_sizes_match_committed_baseline():
+    # tailles deterministes : le binaire d'aucun cas ne grossit par rapport a bench/baseline.json
+    import json
+    import os
+    import benchmark
+    path = os.path.join(os.path.dirname(benchmark.__file__), benchmark.BASELINE)
+    with open(path, "r", encoding="utf-8") as f:
+        baseline = json.load(f)
+    seed = baseline["meta"]["seed"]
+    results = [benchmark.run_case(r["mode"], r["dist"], r["n"], seed, repeat=1, warmup=0)
+               for r in baseline["results"] if r["n"] == 1000]
+    assert len(results) == len(benchmark.MODES) * len(benchmark.DISTRIBUTIONS)
+    assert benchmark.compare(results, baseline, 1.0)[0] == []
@@ -0,0 +1,31 @@
+﻿import io
+import random
+import pytest
+from bitpacking.stream import compress_stream, decompress_stream, iter_frames
+
+
+@pytest.mark.parametrize("mode", ["crossing", "non_crossing"])
+def test_stream_roundtrip_per_block_k(mode):
+    nums = [random.randrange(16) for _ in range(250)] + [1 << 20] + list(range(100))
+    buf = io.BytesIO()
+    n, nblocks = compress_stream(iter(nums), buf, mode=mode, block_size=100)
+    assert (n, nblocks) == (len(nums), 4)
+    buf.seek(0)
+    ks = [k for k, *_ in iter_frames(buf)]
+    # dernier bloc 49..99 : base 49, 6 bits au lieu de 7
+    assert ks == [4, 4, 21, 6]
+    buf.seek(0)
+    assert list(decompress_stream(buf)) == nums
+
+def test_stream_empty_and_generator_input():
+    buf = io.BytesIO()
+    assert compress_stream((x for x in []), buf) == (0, 0)
+    buf.seek(0)
+    assert list(decompress_stream(buf)) == []
+
+def test_truncated_stream_raises():
+    buf = io.BytesIO()
+    compress_stream(range(1000), buf, block_size=300)
+    data = buf.getvalue()[:600]
+    with pytest.raises(ValueError):
+        list(decompress_stream(io.BytesIO(data)))
@@ -0,0 +1,44 @@
+﻿import random
+import pytest
+
+pytest.importorskip("numpy")
+
+from bitpacking.crossing import BitPackingCrossing
+from bitpacking.vectorized import BitPackingCrossingNumpy
+from bitpacking.factory import CompressorFactory
+
+
+@pytest.mark.parametrize("k", [1, 3, 7, 12, 16, 31, 32])
+def test_same_words_as_python_path(k):
+    rng = random.Random(k)
+    nums = [rng.randrange(1 << k) for _ in range(257)] + [(1 << k) - 1]
+    ref = BitPackingCrossing.from_list(nums)
+    bp = BitPackingCrossingNumpy.from_list(nums)
+    assert bp.k == ref.k
+    assert bp.words == ref.words
+    assert bp.to_list() == nums
+
+def test_unpack_python_words():
+    nums = [4095, 0, 2048, 7, 123, 4095, 1, 33]
+    ref = BitPackingCrossing.from_list(nums)
+    bp = BitPackingCrossingNumpy(k=ref.k, n=ref.n, words=ref.words)
+    assert bp.to_list() == nums
+
+def test_wide_values_fall_back():
+    nums = [1 << 40, 5, (1 << 70) + 3]
+    bp = BitPackingCrossingNumpy.from_list(nums)
+    assert bp.words == BitPackingCrossing.from_list(nums).words
+    assert bp.to_list() == nums
+
+def test_empty_and_reference():
+    assert BitPackingCrossingNumpy.from_list([]).to_list() == []
+    for nums in ([1, -2, 3], list(range(-(1 << 40), -(1 << 40) + 300)), [-1, 1 << 62]):
+        bp = BitPackingCrossingNumpy.from_list(nums)
+        ref = BitPackingCrossing.from_list(nums)
+        assert (bp.k, bp.base) == (ref.k, ref.base)
+        assert bp.words == ref.words
+        assert bp.to_list() == nums
+
+def test_factory_picks_numpy_engine():
+    bp = CompressorFactory.create_from_list("crossing", [1, 2, 3])
+    assert isinstance(bp, BitPackingCrossingNumpy)
@@ -0,0 +1,57 @@
+﻿import random
+import pytest
+import bitpacking.vertical as vertical
+from bitpacking.vertical import BitPackingVertical, BLOCK
+from bitpacking.core import unpack_bits
+from bitpacking.factory import CompressorFactory, save_binary, load_packed
+from bitpacking.reader import MappedReader
+
+
+def _nums(k, n, seed=0):
+    rng = random.Random(seed)
+    return [rng.randrange(1 << k) for _ in range(n)]
+
+@pytest.mark.parametrize("k", [1, 5, 12, 31, 32])
+def test_lane_layout(k):
+    nums = _nums(k, 2 * BLOCK + 9, k)
+    bp = BitPackingVertical.from_list(nums)
+    assert len(bp.words) == 3 * 4 * k
+    for i, v in enumerate(nums):
+        b, r = divmod(i, BLOCK)
+        # voie r % 4 = mots 4 * w + voie du bloc, valeur r // 4 de cette voie
+        lane = [bp.words[b * 4 * k + 4 * w + r % 4] for w in range(k)]
+        assert unpack_bits(lane, (r // 4) * k, k) == v
+    assert bp.to_list() == nums
+    assert [bp.get(i) for i in range(len(nums))] == nums
+    assert bp[100:300:3] == nums[100:300:3]
+
+@pytest.mark.parametrize("k", [3, 17, 32])
+def test_pure_python_path_matches(monkeypatch, k):
+    nums = _nums(k, 700, k)
+    expected = BitPackingVertical.from_list(nums)
+    monkeypatch.setattr(vertical, "HAVE_NUMPY", False)
+    bp = BitPackingVertical.from_list(nums)
+    assert bp.words == expected.words
+    assert bp.to_list() == nums
+
+def test_numpy_array_and_reference():
+    pytest.importorskip("numpy")
+    nums = [random.Random(2).randint(-5000, 5000) for _ in range(1000)]
+    for zigzag in (False, True):
+        bp = BitPackingVertical.from_list(nums, zigzag)
+        assert bp.to_array().tolist() == nums
+        assert bp.to_list() == nums
+
+def test_file_roundtrip(tmp_path):
+    nums = [1_000_000 + x for x in _nums(9, 500)]
+    bp = CompressorFactory.create_from_list("vertical", nums)
+    path = str(tmp_path / "v.bin")
+    save_binary(path, "vertical", bp.k, bp.n, bp.words, bp.base, bp.zigzag)
+    assert load_packed(path).to_list() == nums
+    with MappedReader(path) as r:
+        assert r.mode == "vertical"
+        assert [r.get(i) for i in range(r.n)] == nums
+
+def test_wide_values_rejected():
+    with pytest.raises(ValueError):
+        BitPackingVertical.from_list([0, 1 << 40])